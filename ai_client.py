@@ -0,0 +1,232 @@
+# ai_client.py
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from circuit_breaker import OPEN, HALF_OPEN, AdaptiveLimiter, AIUnavailableError, CircuitBreaker
+from config import Config
+
+
+class AIClient:
+    """عميل HTTP مشترك لواجهة DeepSeek.
+
+    يعيد استخدام الاتصالات عبر requests.Session مع مجمع اتصالات بحجم
+    قابل للضبط، ويوفر تنفيذًا متوازيًا محدودًا بعدد أقصى من الطلبات
+    المتزامنة. كل الطلبات تمر بقاطع دائرة وحد تزامن متكيف، فتُرفض فورًا
+    (AIUnavailableError) عندما تكون الخدمة متعطلة أو مثقلة.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool_size: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None):
+        self.base_url = (base_url or Config.DEEPSEEK_BASE_URL).rstrip('/')
+        self.pool_size = pool_size or Config.AI_POOL_SIZE
+        self.max_concurrency = max_concurrency or Config.AI_MAX_CONCURRENCY
+        self.connect_timeout = connect_timeout or Config.AI_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or Config.AI_READ_TIMEOUT
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.breaker = CircuitBreaker(
+            failure_threshold=Config.AI_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.AI_BREAKER_RESET_TIMEOUT
+        )
+        self.limiter = AdaptiveLimiter(
+            initial=self.max_concurrency,
+            min_limit=Config.AI_MIN_CONCURRENCY,
+            queue_timeout=Config.AI_QUEUE_TIMEOUT
+        )
+        self.slow_call_threshold = Config.AI_SLOW_CALL_THRESHOLD
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def chat(self, payload: Dict[str, Any], api_key: str, read_timeout: Optional[float] = None,
+             stream: bool = False, labels: Optional[Dict[str, str]] = None) -> requests.Response:
+        """إرسال طلب chat/completions وإرجاع الاستجابة بعد التحقق من حالتها.
+
+        labels (من metrics.ai_labels) تُستخدم لتسجيل زمن الطلب ونتيجته. الطلب
+        المتدفق الناجح يبقى حاجزًا مكانه في حد التزامن، ولا تُسجَّل نتيجته في
+        القاطع ولا زمنه حتى يستدعي المستهلك finish_call (يفعل ذلك chat_stream
+        عند انتهاء القراءة).
+        """
+        labels = labels or metrics.ai_labels('chat')
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream" if stream else "application/json"
+        }
+        try:
+            self.breaker.before_call()
+            try:
+                self.limiter.acquire()
+            except Exception:
+                self.breaker.release_probe()
+                raise
+        except AIUnavailableError:
+            metrics.AI_REQUESTS.inc(operation=labels['operation'], outcome='unavailable')
+            raise
+
+        healthy = False
+        outcome = 'error'
+        start = time.monotonic()
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                headers=headers,
+                timeout=(self.connect_timeout, read_timeout or self.read_timeout),
+                stream=stream
+            )
+            outcome = _outcome(response.status_code)
+            # أخطاء العميل (4xx) لا تعني تعطل الخدمة، بخلاف 5xx و 429 والبطء
+            healthy = (
+                response.status_code < 500 and response.status_code != 429
+                and time.monotonic() - start < self.slow_call_threshold
+            )
+        except requests.exceptions.Timeout:
+            outcome = 'timeout'
+            raise
+        except requests.exceptions.ConnectionError:
+            outcome = 'connection_error'
+            raise
+        finally:
+            if not stream or outcome != 'ok':
+                self.finish_call(healthy)
+                metrics.AI_REQUEST_SECONDS.observe(time.monotonic() - start, **labels)
+                metrics.AI_REQUESTS.inc(operation=labels['operation'], outcome=outcome)
+        if stream and response.status_code >= 400:
+            # جسم الخطأ في الطلب المتدفق لا يُقرأ، فيُغلق حتى يعود الاتصال إلى المجمع
+            response.close()
+        response.raise_for_status()
+        return response
+
+    def finish_call(self, healthy: bool) -> None:
+        """تسجيل نتيجة الطلب في القاطع وإرجاع مكانه إلى حد التزامن."""
+        if healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        self.limiter.release(healthy)
+
+    def status(self) -> Dict[str, Any]:
+        """حالة قاطع الدائرة وحد التزامن للمراقبة."""
+        return {'breaker': self.breaker.snapshot(), 'limiter': self.limiter.snapshot()}
+
+    def chat_stream(self, payload: Dict[str, Any], api_key: str, read_timeout: Optional[float] = None,
+                    labels: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """طلب chat/completions متدفق يُرجع أجزاء المحتوى فور وصولها.
+
+        مهلة القراءة هنا هي أقصى فترة بين جزأين متتاليين وليست زمن الرد كاملًا.
+        استهلاك الرموز يُقرأ من الجزء الأخير (stream_options.include_usage).
+        التدفق يحجز مكانه في حد التزامن حتى نهايته، ويُعد فشلًا في القاطع إن
+        انقطع أو تعذر تحليله أو تجاوز زمنه كاملًا حد البطء.
+        """
+        labels = labels or metrics.ai_labels('stream')
+        payload = dict(payload, stream=True, stream_options={'include_usage': True})
+        start = time.monotonic()
+        response = self.chat(payload, api_key, read_timeout=read_timeout, stream=True, labels=labels)
+        outcome = 'error'
+        try:
+            for line in response.iter_lines():
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                event = json.loads(data)
+                metrics.record_usage(labels, event.get('usage'))
+                choices = event.get('choices') or [{}]
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    yield content
+            outcome = 'ok'
+        except GeneratorExit:
+            # المستهلك اكتفى بما وصله وأغلق التدفق مبكرًا
+            outcome = 'closed'
+            raise
+        except requests.exceptions.RequestException as e:
+            outcome = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection_error'
+            raise
+        finally:
+            response.close()
+            elapsed = time.monotonic() - start
+            # إغلاق المستهلك للتدفق مبكرًا ليس عطلًا في الخدمة
+            self.finish_call(outcome in ('ok', 'closed') and elapsed < self.slow_call_threshold)
+            metrics.AI_REQUEST_SECONDS.observe(elapsed, **labels)
+            metrics.AI_REQUESTS.inc(operation=labels['operation'], outcome=outcome)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix='ai-client'
+                )
+            return self._executor
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """تنفيذ fn على كل عنصر بالتوازي مع الحفاظ على ترتيب النتائج."""
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self._get_executor().map(fn, items))
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+
+
+def _outcome(status_code: int) -> str:
+    """تصنيف رمز الحالة بعدد محدود من القيم حتى تبقى السلاسل الزمنية قليلة."""
+    if status_code < 400:
+        return 'ok'
+    if status_code == 429:
+        return 'http_429'
+    return 'http_5xx' if status_code >= 500 else 'http_4xx'
+
+
+def backoff_delay(attempt: int, base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """تأخير إعادة المحاولة: تراجع أسي مع عشوائية كاملة حتى لا تتزامن المحاولات."""
+    base = Config.AI_RETRY_BASE_DELAY if base is None else base
+    cap = Config.AI_RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _collect_client_metrics() -> None:
+    """تحديث مقاييس حالة القاطع وحد التزامن عند كل قراءة لـ /metrics."""
+    client = _client
+    if client is None:
+        return
+    state = client.breaker.state
+    metrics.AI_BREAKER_OPEN.set(1 if state == OPEN else 0.5 if state == HALF_OPEN else 0)
+    metrics.AI_CONCURRENCY_LIMIT.set(client.limiter.limit)
+    metrics.AI_IN_FLIGHT.set(client.limiter.in_flight)
+
+
+metrics.REGISTRY.add_collector(_collect_client_metrics)
+
+
+def get_ai_client() -> AIClient:
+    """العميل المشترك بين AIIntegration و DeepSeekAI (يُنشأ عند أول استخدام)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AIClient()
+        return _client
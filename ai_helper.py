@@ -4,11 +4,18 @@
 import json
 import logging
 import os
-import re
 import requests
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, Iterator, List, Optional
 from dotenv import load_dotenv
 
+import metrics
+from ai_client import backoff_delay, get_ai_client
+from circuit_breaker import AIUnavailableError
+from arabic_text import normalize_text
+from json_stream import ObjectStreamParser, salvage_objects
+from question_schema import validation_error
+
 # تهيئة نظام التسجيل
 logging.basicConfig(
     level=logging.INFO,
@@ -23,104 +30,114 @@ class DeepSeekAI:
         """تهيئة كائن الذكاء الاصطناعي مع التحقق من المفتاح"""
         self.logger = logging.getLogger(self.__class__.__name__)
         self.api_key = os.getenv('DEEPSEEK_API_KEY')
-        self.base_url = "https://api.deepseek.com/v1/chat/completions"
         self.max_retries = 3
+        # أقصى عدد من الأسئلة المقبولة يُذكر في طلب الإكمال لتجنب تكرارها
+        self.max_excluded = 20
         
         if not self.api_key:
             self.logger.critical("API key not found in .env file")
             raise ValueError("مفتاح API غير موجود في ملف البيئة")
 
-    def _extract_json(self, response: str) -> Optional[str]:
-        """
-        استخراج JSON من الاستجابة باستخدام التعابير النمطية
-        معالجة التنسيقات المختلفة:
-        1. ```json {...} ```
-        2. JSON داخل نص عادي
-        3. أخطاء تنسيق بسيطة
-        """
-        try:
-            # البحث عن كتل JSON باستخدام regex
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                return json_match.group().strip()
-            return None
-        except Exception as e:
-            self.logger.error(f"فشل استخراج JSON: {str(e)}")
-            return None
-
-    def _validate_question(self, question: Dict) -> bool:
+    def _validate_question(self, question: Dict, labels: Optional[Dict[str, str]] = None) -> bool:
         """التحقق من الهيكل الكامل للسؤال"""
-        required_structure = {
-            'question_text': str,
-            'option_a': str,
-            'option_b': str,
-            'option_c': str,
-            'option_d': str,
-            'correct_answer': lambda x: x in ['أ', 'ب', 'ج', 'د'],
-            'category': str,
-            'topic': str,
-            'difficulty': lambda x: x in ['سهل', 'متوسط', 'صعب']
-        }
-        
-        for key, validator in required_structure.items():
-            if key not in question:
-                self.logger.warning(f"المفتاح المفقود: {key}")
-                return False
-            if not isinstance(validator, type) and not callable(validator):
-                continue
-            try:
-                if not validator(question[key]):
-                    self.logger.warning(f"قيمة غير صالحة للمفتاح {key}: {question[key]}")
-                    return False
-            except Exception as e:
-                self.logger.error(f"خطأ في التحقق من {key}: {str(e)}")
-                return False
+        reason = validation_error(question)
+        if reason:
+            self.logger.warning(f"سؤال مرفوض ({reason})")
+            metrics.AI_VALIDATION_REJECTS.inc(reason=reason, **(labels or metrics.ai_labels('validate')))
+            return False
         return True
 
     def generate_questions(self, params: Dict[str, Any], count: int = 5) -> List[Dict[str, Any]]:
         """
         توليد أسئلة مع التحقق من الصحة وإعادة المحاولة التلقائية
+
+        تُحفظ الأسئلة الصالحة من كل رد حتى لو كان مقطوعًا، وتطلب إعادة
+        المحاولة النقص فقط مع استبعاد ما تم قبوله. قد تُعاد أسئلة أقل من
+        المطلوب إذا استُنفدت المحاولات أو كانت دائرة الخدمة مفتوحة.
         """
+        labels = metrics.ai_labels('generate', params)
+        accepted: List[Dict[str, Any]] = []
+        seen = set()
         for attempt in range(self.max_retries):
+            if attempt:
+                metrics.AI_RETRIES.inc(**labels)
+                time.sleep(backoff_delay(attempt - 1))
+
+            deficit = count - len(accepted)
+            prompt = self._build_prompt(params, deficit, exclude=[q['question_text'] for q in accepted])
             try:
-                prompt = self._build_prompt(params, count)
-                response = self._send_api_request(prompt)
-                
-                if not response:
-                    raise ValueError("استجابة فارغة من API")
-                
-                json_str = self._extract_json(response)
-                if not json_str:
-                    raise ValueError("لا يوجد JSON في الاستجابة")
-                
-                data = json.loads(json_str)
-                questions = data.get('questions', [])
-                
-                valid_questions = [q for q in questions if self._validate_question(q)]
-                
-                if len(valid_questions) >= count:
-                    return valid_questions[:count]
-                
-                self.logger.warning(f"المحاولة {attempt + 1}: تم الحصول على {len(valid_questions)} أسئلة صالحة فقط")
-
-            except (json.JSONDecodeError, KeyError) as e:
-                self.logger.error(f"خطأ في معالجة البيانات: {str(e)}")
-                if attempt == self.max_retries - 1:
-                    return []
+                response = self._send_api_request(prompt, labels)
+            except AIUnavailableError as e:
+                # الخدمة متعطلة: لا فائدة من الانتظار وإعادة المحاولة
+                self.logger.warning(f"تخطي التوليد: {str(e)}")
+                return accepted
+            if not response:
+                self.logger.warning(f"المحاولة {attempt + 1}: استجابة فارغة من API")
                 continue
-                
-            except Exception as e:
-                self.logger.exception(f"خطأ غير متوقع: {str(e)}")
-                return []
 
-        return []
+            questions, errors = salvage_objects(response)
+            if errors:
+                self.logger.warning(f"المحاولة {attempt + 1}: تعذر تحليل {errors} كائنات من الاستجابة")
+                metrics.AI_PARSE_FAILURES.inc(errors, kind='object', **labels)
+            if not questions:
+                metrics.AI_PARSE_FAILURES.inc(kind='no_objects', **labels)
+
+            before = len(accepted)
+            for question in questions:
+                if not self._validate_question(question, labels):
+                    continue
+                key = normalize_text(question['question_text'])
+                if key in seen:
+                    metrics.AI_VALIDATION_REJECTS.inc(reason='duplicate', **labels)
+                    continue
+                seen.add(key)
+                accepted.append(question)
+            metrics.AI_QUESTIONS_ACCEPTED.inc(len(accepted) - before, **labels)
+
+            if len(accepted) >= count:
+                return accepted[:count]
+
+            self.logger.warning(
+                f"المحاولة {attempt + 1}: تم الحصول على {len(accepted)} من {count} أسئلة صالحة"
+            )
 
-    def _build_prompt(self, params: Dict, count: int) -> str:
+        return accepted
+
+    def generate_many(self, params_list: List[Dict[str, Any]], count: int = 5) -> List[List[Dict[str, Any]]]:
+        """توليد أسئلة لعدة مواضيع بالتوازي مع الحفاظ على ترتيب المدخلات"""
+        return get_ai_client().map(lambda params: self.generate_questions(params, count), params_list)
+
+    def stream_questions(self, params: Dict[str, Any], count: int = 5) -> Iterator[Dict[str, Any]]:
+        """توليد متدفق يُرجع كل سؤال صالح فور اكتمال كائنه في الاستجابة"""
+        labels = metrics.ai_labels('stream', params)
+        parser = ObjectStreamParser()
+        payload = self._build_payload(self._build_prompt(params, count))
+        emitted = 0
+        try:
+            for chunk in get_ai_client().chat_stream(payload, self.api_key, labels=labels):
+                for question in parser.feed(chunk):
+                    if not self._validate_question(question, labels):
+                        continue
+                    metrics.AI_QUESTIONS_ACCEPTED.inc(**labels)
+                    yield question
+                    emitted += 1
+                    if emitted >= count:
+                        return
+        finally:
+            if parser.errors:
+                self.logger.warning(f"تعذر تحليل {parser.errors} كائنات من الاستجابة المتدفقة")
+                metrics.AI_PARSE_FAILURES.inc(parser.errors, kind='object', **labels)
+
+    def _build_prompt(self, params: Dict, count: int, exclude: Optional[List[str]] = None) -> str:
         """بناء رسالة الطلب مع أمثلة التنسيق"""
+        avoid = ''
+        if exclude:
+            listed = "\n".join(f"        - {text}" for text in exclude[-self.max_excluded:])
+            avoid = f"\n        لا تكرر أيًا من الأسئلة التالية:\n{listed}\n"
         return f"""
         قم بإنشاء {count} أسئلة في {params.get('category', 'عام')} حول {params.get('topic', 'عام')}.
         مستوى الصعوبة: {params.get('difficulty', 'متوسط')}
-        
+        {avoid}
         التنسيق المطلوب:
         {{
             "questions": [
@@ -140,35 +157,35 @@ class DeepSeekAI:
         }}
         """
 
-    def _send_api_request(self, prompt: str) -> Optional[str]:
-        """إرسال طلب API مع إدارة الأخطاء"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
+    def _build_payload(self, prompt: str) -> Dict[str, Any]:
+        return {
             "model": "deepseek-chat",
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7,
             "max_tokens": 2000
         }
+
+    def _send_api_request(self, prompt: str, labels: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """إرسال طلب API مع إدارة الأخطاء"""
+        labels = labels or metrics.ai_labels('generate')
+        payload = self._build_payload(prompt)
         
         try:
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
+            response = get_ai_client().chat(payload, self.api_key, labels=labels)
             
             response_data = response.json()
+            metrics.record_usage(labels, response_data.get('usage'))
             if 'choices' not in response_data:
                 raise ValueError("استجابة API غير متوقعة")
-                
-            return response_data['choices'][0]['message']['content']
+
+            choice = response_data['choices'][0]
+            if choice.get('finish_reason') == 'length':
+                self.logger.warning("تم قطع الاستجابة عند حد max_tokens")
+            return choice['message']['content']
             
+        except AIUnavailableError:
+            raise
+
         except requests.exceptions.HTTPError as e:
             self.logger.error(f"خطأ HTTP {e.response.status_code}: {e.response.text}")
             return None
@@ -177,6 +194,14 @@ class DeepSeekAI:
             self.logger.error(f"خطأ اتصال: {str(e)}")
             return None
 
+        except (ValueError, KeyError, IndexError, AttributeError) as e:
+            self.logger.error(f"استجابة API غير صالحة: {str(e)}")
+            metrics.AI_PARSE_FAILURES.inc(kind='response', **labels)
+            return None
+
+# الكائن المشترك المستخدم في الواجهة البرمجية
+deepseek_ai = DeepSeekAI()
+
 if __name__ == "__main__":
     # اختبار التشغيل
     ai = DeepSeekAI()
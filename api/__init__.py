@@ -1,7 +1,11 @@
 from flask import Blueprint
 from .questions import questions_bp
 from .users import users_bp
+from .ai import ai_bp
+from .quiz import quiz_api_bp
 
 api_bp = Blueprint('api', __name__)
 api_bp.register_blueprint(questions_bp)
-api_bp.register_blueprint(users_bp)
\ No newline at end of file
+api_bp.register_blueprint(users_bp)
+api_bp.register_blueprint(ai_bp)
+api_bp.register_blueprint(quiz_api_bp)
\ No newline at end of file
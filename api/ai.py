@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required
+from ai_client import get_ai_client
+from query_budget import query_budget
+
+ai_bp = Blueprint('ai_api', __name__, url_prefix='/api/v1/ai')
+
+@ai_bp.route('/status', methods=['GET'])
+@query_budget(1)
+@login_required
+def ai_status():
+    """حالة قاطع الدائرة وحد التزامن المتكيف لخدمة الذكاء الاصطناعي"""
+    return jsonify({
+        'success': True,
+        'data': get_ai_client().status()
+    }), 200
@@ -1,29 +1,32 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
 from extensions import db
 from models import Question, QuizResult
 from ai_helper import deepseek_ai
 from config import MAX_QUESTIONS
+from generation_cache import get_or_generate
+from question_bank import fetch_from_bank, normalize_difficulty, question_to_dict, save_questions
+from ai_client import get_ai_client
+from circuit_breaker import AIUnavailableError, OPEN
+from query_budget import query_budget
+import json
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
 questions_bp = Blueprint('questions_api', __name__, url_prefix='/api/v1/questions')
 
-@questions_bp.route('/generate', methods=['POST'])
-@login_required
-def generate_ai_questions():
-    """توليد أسئلة باستخدام الذكاء الاصطناعي"""
-    data = request.get_json()
-    
+def _parse_generation_request(data):
+    """التحقق من طلب التوليد وإرجاع (المعاملات، العدد المطلوب، العدد النهائي) أو استجابة خطأ"""
     # التحقق من الحقول الإجبارية
     required_fields = ['subject', 'topic']
-    missing = [field for field in required_fields if field not in data]
+    missing = [field for field in required_fields if field not in (data or {})]
     if missing:
-        return jsonify({
+        return None, (jsonify({
             'success': False,
             'error': f'الحقول المطلوبة ناقصة: {", ".join(missing)}'
-        }), 400
+        }), 400)
     
     # معالجة عدد الأسئلة
     try:
@@ -32,33 +35,62 @@ def generate_ai_questions():
             raise ValueError("يجب أن يكون عدد الأسئلة أكبر من الصفر")
     except (TypeError, ValueError) as e:
         logger.warning(f"Invalid question count: {str(e)}")
-        return jsonify({
+        return None, (jsonify({
             'success': False,
             'error': 'عدد الأسئلة يجب أن يكون رقمًا صحيحًا موجبًا'
-        }), 400
+        }), 400)
     
+    params = {
+        'category': data['subject'],
+        'topic': data['topic'],
+        'difficulty': data.get('difficulty', 'medium')
+    }
     # تطبيق الحد الأقصى
-    final_count = min(requested_count, MAX_QUESTIONS)
+    return (params, requested_count, min(requested_count, MAX_QUESTIONS)), None
+
+
+@questions_bp.route('/generate', methods=['POST'])
+# الأسئلة المولدة تُدرج بجملة واحدة، لكن كل سؤال يشبه سؤالًا في البنك قد يُقرأ أصله بجملة
+@query_budget(MAX_QUESTIONS + 5)
+@login_required
+def generate_ai_questions():
+    """توليد أسئلة باستخدام الذكاء الاصطناعي"""
+    parsed, error = _parse_generation_request(request.get_json())
+    if error:
+        return error
+    params, requested_count, final_count = parsed
     
     try:
-        generated = deepseek_ai.generate_custom_questions(
-            params={
-                'category': data['subject'],
-                'topic': data['topic'],
-                'difficulty': data.get('difficulty', 'medium')
-            },
-            count=final_count
+        # البنك أولًا، ثم الذكاء الاصطناعي للنقص فقط
+        generated, sources = get_or_generate(
+            params=params,
+            count=final_count,
+            generate=deepseek_ai.generate_questions
         )
+
+        # الخدمة متعطلة ولا يوجد في البنك ما يكفي: رفض سريع بدل حجز العامل
+        breaker = get_ai_client().breaker
+        if not generated and breaker.state == OPEN:
+            return jsonify({
+                'success': False,
+                'error': 'خدمة توليد الأسئلة غير متاحة مؤقتًا، يرجى المحاولة لاحقًا'
+            }), 503, {'Retry-After': str(math.ceil(breaker.retry_after()))}
         
         response_data = {
             'success': True,
             'count': len(generated),
             'user_id': current_user.id,
             'requested': requested_count,
+            'sources': sources,
             'questions': generated
         }
         
-        if len(generated) < requested_count:
+        if len(generated) < final_count and breaker.state == OPEN:
+            response_data['warning'] = (
+                f'تم جلب {len(generated)} من أصل {requested_count} أسئلة من البنك '
+                f'لأن خدمة التوليد غير متاحة مؤقتًا'
+            )
+        elif len(generated) < requested_count:
             response_data['warning'] = (
                 f'تم توليد {len(generated)} من أصل {requested_count} أسئلة '
                 f'(الحد الأقصى المسموح: {MAX_QUESTIONS})'
@@ -81,8 +113,70 @@ def generate_ai_questions():
         }), 400
         
     except Exception as e:
+        db.session.rollback()
         logger.exception(f"Unexpected error: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'حدث خطأ غير متوقع، يرجى المحاولة لاحقًا'
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@questions_bp.route('/generate/stream', methods=['POST'])
+# الميزانية تشمل تجهيز الاستجابة فقط؛ جسم التدفق يُنفذ بعد خروج الدالة
+@query_budget(1)
+@login_required
+def stream_ai_questions():
+    """توليد متدفق (Server-Sent Events): يُرسل كل سؤال فور جاهزيته"""
+    parsed, error = _parse_generation_request(request.get_json())
+    if error:
+        return error
+    params, requested_count, final_count = parsed
+    bucket = dict(params, difficulty=normalize_difficulty(params['difficulty']))
+
+    def events():
+        sources = {'bank': 0, 'ai': 0}
+        sent_ids = set()
+        try:
+            # أسئلة البنك جاهزة فورًا، والذكاء الاصطناعي يكمل النقص فقط
+            for row in fetch_from_bank(bucket['category'], bucket['topic'], bucket['difficulty'], final_count):
+                sent_ids.add(row.id)
+                sources['bank'] += 1
+                yield _sse('question', question_to_dict(row))
+
+            shortfall = final_count - sources['bank']
+            if shortfall > 0:
+                for question in deepseek_ai.stream_questions(bucket, shortfall):
+                    saved, _ = save_questions([dict(question, **bucket)], source='ai')
+                    data = question_to_dict(saved[0])
+                    db.session.commit()
+                    if data['id'] in sent_ids:
+                        continue
+                    sent_ids.add(data['id'])
+                    sources['ai'] += 1
+                    yield _sse('question', data)
+        except AIUnavailableError as e:
+            logger.warning(f"Streaming generation skipped: {str(e)}")
+            yield _sse('error', {
+                'error': 'خدمة توليد الأسئلة غير متاحة مؤقتًا',
+                'retry_after': math.ceil(get_ai_client().breaker.retry_after())
+            })
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Streaming generation failed: {str(e)}")
+            yield _sse('error', {'error': 'تعذر إكمال توليد الأسئلة'})
+
+        yield _sse('done', {
+            'count': len(sent_ids),
+            'requested': requested_count,
+            'sources': sources
+        })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,113 @@
+from flask import Blueprint, jsonify, request, url_for
+from flask_login import login_required, current_user
+from extensions import db
+from quiz_service import AnswerRejected, read_quiz_token, submit_answer, submit_fast_quiz
+from question_schema import ANSWER_LETTERS
+from query_budget import query_budget
+import logging
+
+logger = logging.getLogger(__name__)
+
+quiz_api_bp = Blueprint('quiz_api', __name__, url_prefix='/api/v1/quiz')
+
+# رمز الحالة ورسالة الخطأ لكل سبب رفض في submit_answer
+_REJECTIONS = {
+    'not_found': (404, 'الاختبار أو السؤال غير موجود'),
+    'out_of_order': (409, 'يجب الإجابة عن الأسئلة بالترتيب'),
+    'conflict': (409, 'تمت الإجابة عن هذا السؤال بإجابة مختلفة'),
+    'busy': (503, 'الاختبار مشغول بطلبات متزامنة، يرجى إعادة المحاولة')
+}
+
+def _parse_answers(data):
+    """الإجابات بصيغة {معرف السؤال: الحرف} أو قائمة [{question_id, answer}]، أو None إن كانت غير صالحة"""
+    answers = (data or {}).get('answers')
+    if isinstance(answers, list):
+        answers = {item.get('question_id'): item.get('answer') for item in answers if isinstance(item, dict)}
+    if not isinstance(answers, dict):
+        return None
+    try:
+        return {int(question_id): answer for question_id, answer in answers.items() if isinstance(answer, str)}
+    except (TypeError, ValueError):
+        return None
+
+@quiz_api_bp.route('/<token>/answers', methods=['POST'])
+@query_budget(11)
+@login_required
+def submit_answers(token):
+    """تصحيح اختبار الوضع السريع كاملًا وحفظ التقدم والنتيجة في معاملة واحدة"""
+    claims = read_quiz_token(token)
+    if claims is None or claims[1] != current_user.id:
+        return jsonify({
+            'success': False,
+            'error': 'رمز الاختبار غير صالح أو منتهي الصلاحية'
+        }), 403
+
+    answers = _parse_answers(request.get_json(silent=True))
+    if answers is None:
+        return jsonify({
+            'success': False,
+            'error': 'صيغة الإجابات غير صالحة'
+        }), 400
+
+    try:
+        data = submit_fast_quiz(claims[0], current_user.id, answers)
+        data['results_url'] = url_for('quiz.view_results', result_id=data['result_id'])
+        return jsonify({
+            'success': True,
+            'data': data
+        }), 200
+
+    except AnswerRejected as e:
+        db.session.rollback()
+        if e.reason == 'not_found':
+            return jsonify({
+                'success': False,
+                'error': 'الاختبار غير موجود أو تم إرساله مسبقًا'
+            }), 404
+        return jsonify({
+            'success': False,
+            'error': 'تم إرسال إجابات هذا الاختبار مسبقًا'
+        }), 409
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error grading fast quiz: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'خطأ في الخادم'
+        }), 500
+
+@quiz_api_bp.route('/sessions/<session_token>/answers/<int:order>', methods=['PUT'])
+@query_budget(6)
+@login_required
+def put_answer(session_token, order):
+    """إجابة سؤال واحد بترتيبه في الاختبار؛ تكرار الطلب نفسه آمن ويعيد النتيجة المسجلة"""
+    answer = (request.get_json(silent=True) or {}).get('answer')
+    if answer not in ANSWER_LETTERS:
+        return jsonify({
+            'success': False,
+            'error': 'الإجابة يجب أن تكون أحد الأحرف: ' + '، '.join(ANSWER_LETTERS)
+        }), 400
+
+    try:
+        outcome = submit_answer(session_token, current_user.id, order, answer)
+        return jsonify({
+            'success': True,
+            'data': outcome.to_dict()
+        }), 200
+
+    except AnswerRejected as e:
+        db.session.rollback()
+        status, message = _REJECTIONS[e.reason]
+        body = {'success': False, 'error': message, 'reason': e.reason}
+        if e.expected_order is not None:
+            body['expected_order'] = e.expected_order
+        return jsonify(body), status
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording answer: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'خطأ في الخادم'
+        }), 500
@@ -1,14 +1,21 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from extensions import db
-from models import User
+from models import User, UserStats
+from user_stats import get_user_stats_many
+from weak_topics import get_weak_topics
+from query_budget import query_budget
 import logging
 
 logger = logging.getLogger(__name__)
 
 users_bp = Blueprint('users_api', __name__, url_prefix='/api/v1/users')
 
+# الحد الأقصى لعدد المستخدمين في طلب الإحصاءات المجمّع
+MAX_STATS_BATCH = 500
+
 @users_bp.route('/', methods=['GET'])
+@query_budget(3)
 @login_required
 def get_users():
     """الحصول على قائمة المستخدمين (للمشرفين فقط)"""
@@ -46,13 +53,15 @@ def get_users():
         }), 500
 
 @users_bp.route('/<int:user_id>/progress', methods=['GET'])
+@query_budget(2)
 @login_required
 def get_user_progress(user_id):
     """الحصول على تقدم مستخدم معين"""
     try:
         user = User.query.get_or_404(user_id)
-        
-        if not user.quiz_results:
+        stats = db.session.get(UserStats, user_id)
+
+        if not stats or not stats.total_quizzes:
             return jsonify({
                 'success': True,
                 'data': {
@@ -61,20 +70,11 @@ def get_user_progress(user_id):
                 }
             }), 200
 
-        total_quizzes = len(user.quiz_results)
-        average_score = sum(r.score for r in user.quiz_results) / total_quizzes
-        last_attempt = max(r.timestamp for r in user.quiz_results)
-        
         return jsonify({
             'success': True,
             'data': {
                 'user': user.to_dict(),
-                'stats': {
-                    'total_quizzes': total_quizzes,
-                    'average_score': round(average_score, 2),
-                    'last_attempt': last_attempt.isoformat(),
-                    'progress_level': User.calculate_progress_level(total_quizzes)
-                }
+                'stats': stats.to_dict()
             }
         }), 200
         
@@ -83,4 +83,81 @@ def get_user_progress(user_id):
         return jsonify({
             'success': False,
             'error': 'خطأ في الخادم'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@users_bp.route('/stats', methods=['GET'])
+@query_budget(2)
+@login_required
+def get_users_stats():
+    """إحصاءات عدة مستخدمين دفعة واحدة (للمشرفين فقط)"""
+    if not current_user.is_admin:
+        logger.warning(f"Unauthorized access attempt by user: {current_user.id}")
+        return jsonify({
+            'success': False,
+            'error': 'غير مصرح بالوصول'
+        }), 403
+
+    try:
+        user_ids = [int(uid) for uid in request.args.get('ids', '').split(',') if uid.strip()]
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'قائمة المعرفات غير صالحة'
+        }), 400
+    if len(user_ids) > MAX_STATS_BATCH:
+        return jsonify({
+            'success': False,
+            'error': f'الحد الأقصى {MAX_STATS_BATCH} مستخدم في الطلب الواحد'
+        }), 400
+
+    try:
+        stats = get_user_stats_many(user_ids)
+        return jsonify({
+            'success': True,
+            'data': {str(uid): stats.get(uid) for uid in user_ids}
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error fetching users stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'خطأ في الخادم'
+        }), 500
+
+@users_bp.route('/<int:user_id>/weak-topics', methods=['GET'])
+@query_budget(2)
+@login_required
+def get_user_weak_topics(user_id):
+    """المواضيع الأضعف لمستخدم معين (للمستخدم نفسه أو للمشرفين)"""
+    if user_id != current_user.id and not current_user.is_admin:
+        logger.warning(f"Unauthorized weak-topics access by user: {current_user.id}")
+        return jsonify({
+            'success': False,
+            'error': 'غير مصرح بالوصول'
+        }), 403
+
+    limit = request.args.get('limit', 10, type=int)
+    days = request.args.get('days', type=int)
+    if limit is None or limit < 1 or ('days' in request.args and (days is None or days < 1)):
+        return jsonify({
+            'success': False,
+            'error': 'معاملات غير صالحة'
+        }), 400
+
+    try:
+        topics = get_weak_topics(user_id, limit=limit, days=days)
+        return jsonify({
+            'success': True,
+            'data': {
+                'user_id': user_id,
+                'days': days,
+                'topics': [{'topic': topic, 'mistakes': count} for topic, count in topics]
+            }
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in weak topics {user_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'خطأ في الخادم'
+        }), 500
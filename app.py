@@ -9,23 +9,45 @@ app = Flask(__name__)
 app.config.from_object(Config)  # تحميل التكوين من Config
 
 # تهيئة الإضافات
-from extensions import db, login_manager
+from extensions import db, login_manager, migrate
+from instrumentation import instrumentation
+from user_cache import user_cache
+from passwords import password_hasher
+from session_store import active_sessions
+import query_budget
 
 db.init_app(app)
+migrate.init_app(app, db)
 login_manager.init_app(app)
+instrumentation.init_app(app)
+query_budget.init_app(app)
+user_cache.init_app(app)
+password_hasher.init_app(app)
+active_sessions.init_app(app)
 login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.query(User).get(user_id)
+    return user_cache.load(user_id)
 
 
 # تسجيل الـ Blueprints
 from routes import main_bp, auth_bp, quiz_bp
+from api import api_bp
 
 app.register_blueprint(main_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(quiz_bp)
+app.register_blueprint(api_bp)
+
+# أوامر سطر الأوامر
+from commands import leaderboard_cli, stats_cli, bank_cli, bench_cli, sessions_cli
+
+app.cli.add_command(leaderboard_cli)
+app.cli.add_command(stats_cli)
+app.cli.add_command(bank_cli)
+app.cli.add_command(bench_cli)
+app.cli.add_command(sessions_cli)
 
 if __name__ == '__main__':
     app.run(host=app.config['HOST'], port=app.config['PORT'], debug=app.config['DEBUG'])
@@ -0,0 +1,23 @@
+# arabic_text.py
+"""توحيد النصوص العربية قبل المقارنة والبصمات."""
+import re
+import unicodedata
+
+# التشكيل وعلامات القرآن والتطويل
+_DIACRITICS = re.compile(r'[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """إزالة التشكيل والتطويل وتوحيد أشكال الحروف وعلامات الترقيم والمسافات."""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = _DIACRITICS.sub('', text).translate(_LETTER_MAP).casefold()
+    text = _PUNCTUATION.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
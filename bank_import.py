@@ -0,0 +1,285 @@
+# bank_import.py
+import csv
+import json
+import logging
+import os
+import re
+import zipfile
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+from config import Config
+from db_utils import insert_missing
+from extensions import db
+from models import Question
+from near_duplicates import TopicIndex, near_duplicate_index, signature
+from question_bank import QUESTION_FIELDS, content_hash, normalize_difficulty
+from question_pool import question_pool
+from question_schema import ANSWER_LETTERS, validation_error
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv', 'docx')
+
+ANSWER_ALIASES = dict(zip('abcdABCD', ANSWER_LETTERS * 2))
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# بادئات أسطر ملف Word: سطر الحقل يبدأ بالاسم ثم ':' أو ')' أو '-'
+_DOCX_FIELDS = {
+    'المادة': 'category',
+    'الموضوع': 'topic',
+    'الصعوبة': 'difficulty',
+    'السؤال': 'question_text',
+    'الإجابة': 'correct_answer',
+    'الشرح': 'explanation',
+}
+_DOCX_OPTIONS = dict(zip(ANSWER_LETTERS, ('option_a', 'option_b', 'option_c', 'option_d')))
+_DOCX_LINE = re.compile(r'^\s*([^\s:)\-]+)\s*[:)\-]\s*(.*)$')
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    near_duplicates: int = 0
+    rejected: Counter = field(default_factory=Counter)
+
+    @property
+    def invalid(self) -> int:
+        return sum(self.rejected.values())
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'json':
+        extension = 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f"صيغة ملف غير مدعومة: {path}")
+    return extension
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """سؤال واحد في كل سطر؛ الأسطر الفارغة تُتجاهل."""
+    with open(path, encoding='utf-8-sig') as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def read_csv(path: str) -> Iterator[Dict]:
+    """ملف CSV بترويسة تطابق أسماء حقول السؤال."""
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        yield from csv.DictReader(handle)
+
+
+def _docx_paragraphs(path: str) -> Iterator[str]:
+    """نصوص فقرات المستند دون تحميل document.xml كاملًا في الذاكرة."""
+    with zipfile.ZipFile(path) as archive, archive.open('word/document.xml') as document:
+        parts = []
+        for event, element in iterparse(document, events=('end',)):
+            if element.tag == f'{_W}t':
+                parts.append(element.text or '')
+            elif element.tag == f'{_W}p':
+                yield ''.join(parts).strip()
+                parts = []
+                element.clear()
+
+
+def read_docx(path: str) -> Iterator[Dict]:
+    """قراءة أسئلة مكتوبة في Word بصيغة أسطر:
+
+        المادة: العلوم          (تسري على ما بعدها حتى تتغير)
+        الموضوع: الخلية
+        الصعوبة: متوسط
+        السؤال: ...
+        أ) ...
+        ب) ...
+        ج) ...
+        د) ...
+        الإجابة: ب
+        الشرح: ...              (اختياري)
+
+    يبدأ كل سطر 'السؤال' سؤالًا جديدًا.
+    """
+    context: Dict[str, str] = {}
+    current: Optional[Dict] = None
+    for text in _docx_paragraphs(path):
+        match = _DOCX_LINE.match(text)
+        if not match:
+            continue
+        label, value = match.group(1), match.group(2).strip()
+        key = _DOCX_FIELDS.get(label) or _DOCX_OPTIONS.get(label)
+        if key is None:
+            continue
+        if key in ('category', 'topic', 'difficulty'):
+            context[key] = value
+            continue
+        if key == 'question_text':
+            if current is not None:
+                yield current
+            current = dict(context)
+        if current is not None:
+            current[key] = value
+    if current is not None:
+        yield current
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'docx': read_docx}
+
+
+def read_questions(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    return READERS[fmt or detect_format(path)](path)
+
+
+_MAX_LENGTHS = {
+    name: column.type.length
+    for name, column in Question.__table__.columns.items()
+    if name in QUESTION_FIELDS and getattr(column.type, 'length', None)
+}
+
+
+def prepare_row(raw: Dict, defaults: Dict[str, str]):
+    """توحيد صف مستورد وإرجاع (الصف، سبب الرفض)."""
+    if not isinstance(raw, dict):
+        return None, 'invalid:row'
+    row = {}
+    for key in QUESTION_FIELDS:
+        value = raw.get(key)
+        if isinstance(value, str):
+            value = value.strip() or None
+        row[key] = value if value is not None else defaults.get(key)
+    answer = row.get('correct_answer')
+    row['correct_answer'] = ANSWER_ALIASES.get(answer, answer)
+    row['difficulty'] = normalize_difficulty(row.get('difficulty'))
+
+    reason = validation_error(row)
+    if reason:
+        return None, reason
+    for key, limit in _MAX_LENGTHS.items():
+        if row[key] is not None and len(row[key]) > limit:
+            return None, f'too_long:{key}'
+    return row, None
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RecentImports:
+    """فهرس شبه المكرر لاستيراد واحد يحتفظ ببصمات آخر window سؤالًا فقط.
+
+    يُطرد الأقدم عند امتلائه، فتبقى الذاكرة محدودة مهما كبر الملف.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._topics: Dict[Tuple[str, str], TopicIndex] = defaultdict(TopicIndex)
+        self._order = deque()
+        self._next_id = 0
+
+    def find(self, key: Tuple[str, str], sig, threshold: float):
+        index = self._topics.get(key)
+        return index.find(sig, threshold) if index else None
+
+    def add(self, key: Tuple[str, str], sig) -> None:
+        self._next_id += 1
+        self._topics[key].add(self._next_id, sig)
+        self._order.append((key, self._next_id))
+        while len(self._order) > self.window:
+            old_key, old_id = self._order.popleft()
+            index = self._topics[old_key]
+            index.remove(old_id)
+            if not index.signatures:
+                del self._topics[old_key]
+
+    def __len__(self):
+        return len(self._order)
+
+
+def import_questions(rows: Iterable[Dict], batch_size: int = 1000, source: str = 'import',
+                     defaults: Optional[Dict[str, str]] = None, window: Optional[int] = None) -> ImportStats:
+    """استيراد أسئلة على دفعات مع تجاهل المكرر حسب بصمة المحتوى وشبه المكرر.
+
+    كل دفعة تُقارن بالبنك باستعلام واحد ثم تُدرج بـ executemany وتُعتمد.
+    شبه المكرر يُفحص مقابل فهرس البنك المشترك دون الإضافة إليه، ومقابل
+    آخر window سؤالًا مستوردًا، فتبقى الذاكرة محدودة مهما كبر الملف.
+    """
+    stats = ImportStats()
+    defaults = defaults or {}
+    table = Question.__table__
+    recent = RecentImports(window or Config.IMPORT_NEAR_DUPLICATE_WINDOW)
+    threshold = near_duplicate_index.threshold
+    topics = set()
+    for chunk in _chunks(rows, batch_size):
+        batch = {}
+        for raw in chunk:
+            stats.read += 1
+            row, reason = prepare_row(raw, defaults)
+            if reason:
+                stats.rejected[reason] += 1
+                continue
+            digest = content_hash(row)
+            if digest in batch:
+                stats.duplicates += 1
+                continue
+            row['source'] = source
+            row['content_hash'] = digest
+            batch[digest] = row
+        if not batch:
+            continue
+
+        existing = {
+            digest for (digest,) in
+            db.session.query(Question.content_hash).filter(Question.content_hash.in_(list(batch)))
+        }
+        new_rows = []
+        for digest, row in batch.items():
+            if digest in existing:
+                stats.duplicates += 1
+                continue
+            sig = signature(row)
+            topic_key = (row['category'], row['topic'])
+            if near_duplicate_index.find(row, sig) or recent.find(topic_key, sig, threshold):
+                stats.near_duplicates += 1
+                continue
+            recent.add(topic_key, sig)
+            new_rows.append(row)
+        # بصمة أدرجها استيراد متزامن بعد الفحص تُعد مكررة بدل إفشال الدفعة
+        inserted = len(insert_missing(table, new_rows, ('content_hash',)))
+        db.session.commit()
+        stats.inserted += inserted
+        stats.duplicates += len(new_rows) - inserted
+        # الإدراج عبر Core لا يمر بأحداث ORM، فتُسقط الأقسام المتأثرة لتُحمَّل من جديد عند الطلب
+        for bucket in {(row['category'], row['topic'], row['difficulty']) for row in new_rows}:
+            question_pool.invalidate(*bucket)
+        topics.update((row['category'], row['topic']) for row in new_rows)
+
+    # فهرس شبه المكرر لا يُسقط إلا في النهاية حتى لا يُعاد تحميل الموضوع مع كل دفعة
+    for topic_key in topics:
+        near_duplicate_index.invalidate(*topic_key)
+    return stats
+
+
+def import_file(path: str, fmt: Optional[str] = None, batch_size: int = 1000,
+                source: str = 'import', defaults: Optional[Dict[str, str]] = None) -> ImportStats:
+    stats = import_questions(read_questions(path, fmt), batch_size=batch_size, source=source, defaults=defaults)
+    logger.info(
+        f"استيراد {path}: قُرئ {stats.read}، أُضيف {stats.inserted}، "
+        f"مكرر {stats.duplicates}، شبه مكرر {stats.near_duplicates}، مرفوض {stats.invalid}"
+    )
+    return stats
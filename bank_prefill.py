@@ -0,0 +1,169 @@
+# bank_prefill.py
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from extensions import db
+from hierarchy_index import leaf_paths
+from models import Question
+from question_bank import save_questions
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('سهل', 'متوسط', 'صعب')
+
+Generator = Callable[[Dict[str, str], int], List[Dict]]
+
+
+@dataclass
+class PrefillJob:
+    category: str
+    specialization: str
+    topic: str
+    difficulty: str
+    deficit: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.category}|{self.topic}|{self.difficulty}"
+
+
+def topic_buckets() -> List[Tuple[str, str, str]]:
+    """(المادة، التخصص، الموضوع) لكل ورقة في الشجرة؛ الموضوع هو مستوى تخزين الأسئلة."""
+    seen = {}
+    for path in leaf_paths():
+        if len(path) >= 3:
+            seen.setdefault((path[0], path[2]), path[1])
+    return [(category, specialization, topic) for (category, topic), specialization in seen.items()]
+
+
+def plan_prefill(target: int, difficulties=DIFFICULTIES) -> List[PrefillJob]:
+    """حساب العجز في كل قسم مقارنة بالعدد المستهدف باستعلام تجميع واحد."""
+    counts = {
+        (category, topic, difficulty): count
+        for category, topic, difficulty, count in db.session.query(
+            Question.category, Question.topic, Question.difficulty, db.func.count(Question.id)
+        ).group_by(Question.category, Question.topic, Question.difficulty)
+    }
+    jobs = []
+    for category, specialization, topic in topic_buckets():
+        for difficulty in difficulties:
+            deficit = target - counts.get((category, topic, difficulty), 0)
+            if deficit > 0:
+                jobs.append(PrefillJob(category, specialization, topic, difficulty, deficit))
+    return jobs
+
+
+class RateLimiter:
+    """محدد معدل من نوع دلو الرموز مشترك بين العمال."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class Checkpoint:
+    """ملف JSON بالأقسام المكتملة حتى يُستأنف الملء من حيث توقف."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                self.done = set(json.load(handle).get('done', []))
+
+    def mark(self, key: str) -> None:
+        self.done.add(key)
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'done': sorted(self.done)}, handle, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def run_prefill(generate: Generator, target: int = 50, workers: int = 4, rate: float = 0,
+                batch_size: int = 10, checkpoint_path: Optional[str] = None,
+                max_failures: int = 3, difficulties=DIFFICULTIES) -> Dict[str, int]:
+    """ملء عجز كل الأقسام بأسئلة مولدة.
+
+    العمال ينفذون طلبات التوليد فقط، بينما يحفظ الخيط الرئيسي النتائج
+    تباعًا حتى تبقى الكتابة في قاعدة البيانات من اتصال واحد. القسم الذي
+    يكتمل يُسجل في ملف نقطة الاستئناف.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    jobs = [job for job in plan_prefill(target, difficulties) if job.key not in checkpoint.done]
+    limiter = RateLimiter(rate, burst=workers)
+    stats = {'buckets': len(jobs), 'completed': 0, 'requests': 0, 'inserted': 0, 'failed': 0}
+    remaining = {job.key: job.deficit for job in jobs}
+    failures = {job.key: 0 for job in jobs}
+
+    def call(job: PrefillJob, count: int) -> List[Dict]:
+        limiter.acquire()
+        return generate({
+            'category': job.category,
+            'topic': job.topic,
+            'difficulty': job.difficulty
+        }, count)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bank-prefill') as pool:
+        pending = {}
+
+        def submit(job: PrefillJob) -> None:
+            pending[pool.submit(call, job, min(batch_size, remaining[job.key]))] = job
+            stats['requests'] += 1
+
+        for job in jobs:
+            submit(job)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    generated = future.result()
+                except Exception as e:
+                    logger.error(f"فشل توليد {job.key}: {str(e)}")
+                    generated = []
+
+                bucket = {'category': job.category, 'topic': job.topic, 'difficulty': job.difficulty}
+                _, inserted = save_questions([dict(q, **bucket) for q in generated], source='ai')
+                db.session.commit()
+                stats['inserted'] += inserted
+                remaining[job.key] -= inserted
+
+                if remaining[job.key] <= 0:
+                    checkpoint.mark(job.key)
+                    stats['completed'] += 1
+                    continue
+                if inserted == 0:
+                    failures[job.key] += 1
+                if failures[job.key] >= max_failures:
+                    logger.warning(f"تم التخلي عن {job.key} بعجز {remaining[job.key]}")
+                    stats['failed'] += 1
+                    continue
+                submit(job)
+
+    return stats
@@ -0,0 +1,59 @@
+# benchmarks/bench_ai_client.py
+"""قياس إنتاجية توليد الأسئلة: طلبات متتالية دون تجميع مقابل generate_many.
+
+    python -m benchmarks.bench_ai_client --topics 16 --latency 0.3
+"""
+import argparse
+import os
+import time
+
+import requests
+
+from benchmarks.stub_deepseek import StubDeepSeek
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--topics', type=int, default=16)
+    parser.add_argument('--count', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with StubDeepSeek(latency=args.latency) as stub:
+        # يجب ضبط البيئة قبل استيراد الإعدادات
+        os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+        os.environ['AI_MAX_CONCURRENCY'] = str(args.concurrency)
+        from ai_helper import DeepSeekAI
+
+        ai = DeepSeekAI()
+        params_list = [
+            {'category': 'العلوم', 'topic': f'موضوع {i}', 'difficulty': 'متوسط'}
+            for i in range(args.topics)
+        ]
+
+        # المسار القديم: requests.post لكل طلب بالتتابع
+        start = time.perf_counter()
+        for params in params_list:
+            requests.post(
+                f'{stub.base_url}/chat/completions',
+                json={'messages': [{'role': 'user', 'content': ai._build_prompt(params, args.count)}]},
+                timeout=30
+            ).json()
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = ai.generate_many(params_list, args.count)
+        pooled = time.perf_counter() - start
+
+    generated = sum(len(questions) for questions in results)
+    print(f'topics={args.topics} latency={args.latency}s concurrency={args.concurrency}')
+    print(f'sequential bare requests : {sequential:.2f}s  ({args.topics / sequential:.2f} req/s)')
+    print(f'pooled generate_many     : {pooled:.2f}s  ({args.topics / pooled:.2f} req/s, '
+          f'{generated} questions)')
+    print(f'speedup                  : {sequential / pooled:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
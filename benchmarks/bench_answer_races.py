@@ -0,0 +1,259 @@
+# benchmarks/bench_answer_races.py
+"""اختبار ضغط لتسجيل الإجابات تحت طلبات متزامنة ومكررة.
+
+لكل جلسة اختبار يرسل عدة عملاء متزامنين (كنقرات مزدوجة أو إعادة محاولات
+شبكة متقطعة) الإجابات نفسها بالترتيب نفسه في اللحظة نفسها، ثم يُتحقق من
+الثوابت في قاعدة البيانات أو مخزن الاختبارات النشطة (--store):
+
+- كل سؤال مُجاب مرة واحدة بالإجابة المرسلة، ومؤشر الجلسة عند نهايتها.
+- نتيجة الجلسة تساوي عدد الإجابات الصحيحة المسجلة، ونسختها عدد الأسئلة + 1
+  + عدد تفريغات التقدم الناجحة.
+- مجموع تقدم المستخدم (المفرغ والمعلق) يساوي عدد الأسئلة، فلا عد مزدوج.
+- طلب واحد فقط لكل (جلسة، ترتيب) سجّل الإجابة والبقية إعادة لنتيجته.
+
+خيوط --flushers تفرغ تقدم الجلسات المعلق أثناء الضغط كما يفعل بدء اختبار
+جديد، فتتعارض نسخة الجلسة مع طلبات الإجابة ويُختبر مسار إعادة المحاولة.
+
+رمز الخروج 1 عند أي خرق.
+
+    python -m benchmarks.bench_answer_races
+    python -m benchmarks.bench_answer_races --sessions 50 --clients 8 --questions 20
+    python -m benchmarks.bench_answer_races --via html
+    python -m benchmarks.bench_answer_races --store sqlite
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.common import load_app, percentile
+from benchmarks.bench_quiz_flow import FALLBACK_TEMPLATES, seed_bank
+
+# رموز الحالة التي يعيد العميل عندها المحاولة للترتيب نفسه
+RETRY_STATUSES = (503,)
+
+
+def expected_answer(session_index, order):
+    from question_schema import ANSWER_LETTERS
+    return ANSWER_LETTERS[(session_index * 7 + order * 3) % len(ANSWER_LETTERS)]
+
+
+def start_sessions(app, count, questions, selection):
+    """إنشاء مستخدم وجلسة اختبار لكل فهرس؛ يعيد [(معرف المستخدم، رمز الجلسة)]."""
+    from extensions import db
+    from models import User
+
+    with app.app_context():
+        users = [User(username=f'race{i}', email=f'race{i}@example.com', password_hash='')
+                 for i in range(count)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+    sessions = []
+    for user_id in user_ids:
+        client = client_for(app, user_id)
+        client.post('/selection', data=dict(selection, count=questions))
+        response = client.get('/start')
+        if not response.headers.get('Location', '').endswith('/question'):
+            raise RuntimeError(f"فشل بدء الاختبار: HTTP {response.status_code}")
+        with client.session_transaction() as flask_session:
+            sessions.append((user_id, flask_session['quiz_session']))
+    return sessions
+
+
+def client_for(app, user_id, token=None):
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['_user_id'] = str(user_id)
+        flask_session['_fresh'] = True
+        if token:
+            flask_session['quiz_session'] = token
+    return client
+
+
+def answer_all(client, via, token, session_index, questions, barrier, record):
+    """إرسال إجابات كل الأسئلة بالترتيب، مع إعادة المحاولة عند الانشغال."""
+    barrier.wait()
+    for order in range(questions):
+        answer = expected_answer(session_index, order)
+        while True:
+            started = time.perf_counter()
+            if via == 'api':
+                response = client.put(f'/api/v1/quiz/sessions/{token}/answers/{order}', json={'answer': answer})
+            else:
+                response = client.post('/question', data={'answer': answer, 'order': order})
+            record(session_index, order, response, (time.perf_counter() - started) * 1000)
+            if response.status_code not in RETRY_STATUSES:
+                break
+
+
+def flush_loop(app, sessions, stop, flushes):
+    """تفريغ تقدم الجلسات بالتناوب حتى stop، مع عد التفريغات الناجحة والمتعارضة."""
+    from sqlalchemy.orm.exc import StaleDataError
+    from extensions import db
+    from models import QuizSession
+    from progress_buffer import flush_progress
+
+    while not stop.is_set():
+        for index, (_, token) in enumerate(sessions):
+            with app.app_context():
+                quiz_session = QuizSession.query.filter_by(session_token=token).one()
+                flush_progress(quiz_session)
+                if not db.session.is_modified(quiz_session):
+                    continue
+                try:
+                    db.session.commit()
+                    flushes[index] += 1
+                except StaleDataError:
+                    db.session.rollback()
+                    flushes['stale'] += 1
+
+
+def check_invariants(app, sessions, questions, responses, via, flushes):
+    """قائمة بخروقات الثوابت بعد انتهاء كل الطلبات."""
+    from extensions import db
+    from models import QuizSession, QuizSessionQuestion, UserProgress
+    from progress_buffer import pending_progress
+    from session_store import active_sessions
+
+    problems = []
+    with app.app_context():
+        for index, (user_id, token) in enumerate(sessions):
+            # الإجابات المسجلة: الترتيب -> (الإجابة، صحيحة)
+            if active_sessions.enabled:
+                state = active_sessions.store.get(token)
+                recorded = {int(order): tuple(value) for order, value in state.answers.items()}
+                current_index, score, version = state.current_index, state.score, state.version
+                category = state.subject_path[0]
+            else:
+                quiz_session = QuizSession.query.filter_by(session_token=token).one()
+                rows = QuizSessionQuestion.query.filter_by(session_id=quiz_session.id).all()
+                recorded = {row.order: (row.user_answer, bool(row.is_correct))
+                            for row in rows if row.is_answered}
+                data = quiz_session.session_data
+                current_index, score, version = data['current_index'], data['score'], quiz_session.version
+                category = rows[0].question.category
+
+            wrong = [order for order in range(questions)
+                     if order not in recorded or recorded[order][0] != expected_answer(index, order)]
+            if wrong:
+                problems.append(f"جلسة {index}: أسئلة غير مسجلة كما أُرسلت {wrong}")
+            if current_index != questions:
+                problems.append(f"جلسة {index}: المؤشر {current_index} بدل {questions}")
+            correct = sum(is_correct for _, is_correct in recorded.values())
+            if score != correct:
+                problems.append(f"جلسة {index}: النتيجة {score} بدل {correct}")
+            # نسخة لكل إجابة مسجلة ولكل تفريغ ناجح
+            expected_version = questions + 1 + flushes[index]
+            if version != expected_version:
+                problems.append(f"جلسة {index}: النسخة {version} بدل {expected_version}")
+
+            flushed = db.session.query(
+                db.func.coalesce(db.func.sum(UserProgress.total_count), 0)
+            ).filter_by(user_id=user_id, category=category).scalar()
+            total = flushed + pending_progress(user_id, category)[1]
+            if total != questions:
+                problems.append(f"جلسة {index}: تقدم المستخدم {total} إجابة بدل {questions}")
+
+    if via == 'api':
+        for (index, order), bodies in sorted(responses.items()):
+            accepted = [body for body in bodies if not body['replayed']]
+            if len(accepted) != 1:
+                problems.append(f"جلسة {index} سؤال {order}: {len(accepted)} طلب سجّل الإجابة بدل 1")
+            if len({(body['answer'], body['is_correct']) for body in bodies}) > 1:
+                problems.append(f"جلسة {index} سؤال {order}: ردود مختلفة للطلب نفسه")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20, help='عدد جلسات الاختبار')
+    parser.add_argument('--clients', type=int, default=4, help='عملاء متزامنون يرسلون الإجابات نفسها لكل جلسة')
+    parser.add_argument('--questions', type=int, default=10, help='عدد الأسئلة في كل اختبار')
+    parser.add_argument('--via', choices=('api', 'html'), default='api',
+                        help='PUT على واجهة JSON أو POST لنموذج /question مع حقل order')
+    parser.add_argument('--flushers', type=int, default=1,
+                        help='خيوط تفريغ التقدم المتزامنة مع الإجابات (مع مخزن database فقط)')
+    parser.add_argument('--store', choices=('database', 'memory', 'sqlite'), default='database',
+                        help='مخزن الاختبارات النشطة')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-races-')
+    app = load_app('sqlite:///' + os.path.join(workdir, 'races.db'))
+    app.config['WTF_CSRF_ENABLED'] = False
+    from session_store import active_sessions
+    active_sessions.configure(args.store, path=os.path.join(workdir, 'active_sessions.db'))
+    if active_sessions.enabled:
+        # تقدم جلسات المخزن لا يُفرَّغ قبل إنهائها
+        args.flushers = 0
+    from jinja2 import ChoiceLoader, DictLoader
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(FALLBACK_TEMPLATES)])
+
+    from hierarchy_index import leaf_paths
+    from quiz_service import QUIZ_ANSWERS
+    path = leaf_paths(('العلوم',))[0]
+    selection = {'subject': path[0], 'specialization': path[1], 'topic': path[2],
+                 'sub_topic': path[3] if len(path) > 3 else '', 'difficulty': 'متوسط'}
+    seed_bank(app, max(1000, args.questions * 40), selection)
+    sessions = start_sessions(app, args.sessions, args.questions, selection)
+
+    statuses, latencies = Counter(), []
+    responses = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(session_index, order, response, elapsed):
+        body = response.get_json(silent=True) if args.via == 'api' else None
+        with lock:
+            statuses[response.status_code] += 1
+            latencies.append(elapsed)
+            if response.status_code == 200 and body:
+                responses[(session_index, order)].append(body['data'])
+
+    barrier = threading.Barrier(args.sessions * args.clients)
+    threads = [
+        threading.Thread(target=answer_all, args=(
+            client_for(app, user_id, token), args.via, token, index, args.questions, barrier, record))
+        for index, (user_id, token) in enumerate(sessions)
+        for _ in range(args.clients)
+    ]
+    stop = threading.Event()
+    flush_counts = [Counter() for _ in range(args.flushers)]
+    flushers = [threading.Thread(target=flush_loop, args=(app, sessions, stop, counts))
+                for counts in flush_counts]
+    started = time.perf_counter()
+    for thread in threads + flushers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in flushers:
+        thread.join()
+    flushes = sum(flush_counts, Counter())
+
+    total = sum(statuses.values())
+    print(f"{args.sessions} جلسة × {args.clients} عميل × {args.questions} سؤال عبر {args.via} ({args.store}): "
+          f"{total} طلب في {elapsed:.2f}s ({total / elapsed:.0f} طلب/ث)")
+    print(f"  p50 {percentile(latencies, 50):.1f}ms  p95 {percentile(latencies, 95):.1f}ms  "
+          f"p99 {percentile(latencies, 99):.1f}ms")
+    print('  حالات HTTP: ' + '  '.join(f'{status}={count}' for status, count in sorted(statuses.items())))
+    print('  نتائج الإجابة: ' + '  '.join(
+        f'{outcome}={int(QUIZ_ANSWERS.value(outcome=outcome))}'
+        for outcome in ('accepted', 'replayed', 'stale', 'busy', 'conflict', 'out_of_order')))
+    print(f"  تفريغات التقدم: ناجحة={sum(flushes.values()) - flushes['stale']}  متعارضة={flushes['stale']}")
+
+    problems = check_invariants(app, sessions, args.questions, responses, args.via, flushes)
+    if statuses.get(500):
+        problems.append(f"{statuses[500]} رد بخطأ خادم")
+    for problem in problems:
+        print(f"  خرق: {problem}")
+    print(f"  الثوابت: {'سليمة' if not problems else f'{len(problems)} خرق'}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_circuit_breaker.py
+"""محاكاة تعطل DeepSeek وقياس أثر قاطع الدائرة على زمن حجز العمال.
+
+ثلاث مراحل متتالية ضد الخادم التجريبي: تشغيل سليم، ثم بطء يتجاوز مهلة
+القراءة، ثم تعافٍ. كل عامل يطلب أسئلة باستمرار كما يفعل عامل الويب.
+
+    python -m benchmarks.bench_circuit_breaker --workers 16 --phase 6
+    python -m benchmarks.bench_circuit_breaker --no-breaker
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import summarize
+from benchmarks.stub_deepseek import StubDeepSeek
+
+
+def run_phase(ai, client, workers, duration):
+    samples, outcomes = [], {'ok': 0, 'empty': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    params = {'category': 'العلوم', 'topic': 'الخلية', 'difficulty': 'متوسط'}
+
+    def worker():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            questions = ai.generate_questions(params, 3)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                samples.append(elapsed)
+                outcomes['ok' if questions else 'empty'] += 1
+            if not questions:
+                time.sleep(0.05)  # عامل الويب ينتقل إلى طلب آخر
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, outcomes, client.status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--phase', type=float, default=6.0, help='مدة كل مرحلة بالثواني')
+    parser.add_argument('--no-breaker', action='store_true', help='تعطيل القاطع والحد المتكيف للمقارنة')
+    args = parser.parse_args()
+
+    with StubDeepSeek(latency=0.1) as stub:
+        # يجب ضبط البيئة قبل استيراد الإعدادات
+        os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+        os.environ.update({
+            'AI_READ_TIMEOUT': '1',
+            'AI_SLOW_CALL_THRESHOLD': '0.8',
+            'AI_BREAKER_RESET_TIMEOUT': '2',
+            'AI_MAX_CONCURRENCY': '8',
+            'AI_RETRY_BASE_DELAY': '0.1',
+        })
+        if args.no_breaker:
+            os.environ.update({
+                'AI_BREAKER_FAILURE_THRESHOLD': str(10 ** 9),
+                'AI_MIN_CONCURRENCY': '8',
+                'AI_QUEUE_TIMEOUT': '3600',
+            })
+        from ai_client import get_ai_client
+        from ai_helper import DeepSeekAI
+
+        ai, client = DeepSeekAI(), get_ai_client()
+        phases = (('healthy', 0.1), ('slow upstream', 3.0), ('recovered', 0.1))
+        print(f"workers={args.workers} phase={args.phase}s breaker={'off' if args.no_breaker else 'on'}")
+        for name, latency in phases:
+            stub.set_faults(latency=latency)
+            samples, outcomes, status = run_phase(ai, client, args.workers, args.phase)
+            stats = summarize(samples)
+            print(f"{name:14} calls={len(samples):5} ok={outcomes['ok']:5} empty={outcomes['empty']:5} "
+                  f"p50={stats['p50']:8.1f}ms p95={stats['p95']:8.1f}ms  "
+                  f"worker-seconds={sum(samples) / 1000:6.1f}  breaker={status['breaker']['state']} "
+                  f"limit={status['limiter']['limit']}")
+
+
+if __name__ == '__main__':
+    main()
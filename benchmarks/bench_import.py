@@ -0,0 +1,95 @@
+# benchmarks/bench_import.py
+"""قياس إنتاجية استيراد الأسئلة واستهلاك الذاكرة مقابل حجم الملف.
+
+يقارن الإدراج عبر ORM في معاملة واحدة (نهج sample_questions) بمستورد
+الدفعات الذي يتجاهل المكرر.
+
+    python -m benchmarks.bench_import --rows 10000 100000 --duplicate-rate 0.05
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import load_app
+
+ANSWERS = ['أ', 'ب', 'ج', 'د']
+
+
+def write_jsonl(path, rows, duplicate_rate, seed=7):
+    """ملف JSONL اصطناعي؛ نسبة duplicate_rate من الأسطر تكرار لسؤال سابق."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as handle:
+        for i in range(rows):
+            n = rng.randrange(i) if i and rng.random() < duplicate_rate else i
+            handle.write(json.dumps({
+                'question_text': f'سؤال مستورد رقم {n}',
+                'option_a': f'أول {n}', 'option_b': f'ثان {n}',
+                'option_c': f'ثالث {n}', 'option_d': f'رابع {n}',
+                'correct_answer': ANSWERS[n % 4],
+                'category': 'العلوم',
+                'topic': f'موضوع {n % 20}',
+                'difficulty': ['easy', 'medium', 'hard'][n % 3],
+            }, ensure_ascii=False) + '\n')
+
+
+def measure(fn, trace_memory):
+    """تنفيذ fn وإرجاع (النتيجة، الزمن، ذروة الذاكرة). تتبع الذاكرة يبطئ التنفيذ."""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = f'{tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f}'
+        tracemalloc.stop()
+    return result, elapsed, peak or '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.05)
+    parser.add_argument('--trace-memory', action='store_true', help='قياس ذروة الذاكرة عبر tracemalloc')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-import-')
+    app = load_app('sqlite:///' + os.path.join(workdir, 'bench.db'))
+
+    from bank_import import import_file, prepare_row, read_jsonl
+    from extensions import db
+    from models import Question
+
+    def orm_import(path):
+        # المسار القديم: كائن ORM لكل صف ومعاملة واحدة، دون إزالة المكرر
+        rows = [prepare_row(raw, {})[0] for raw in read_jsonl(path)]
+        db.session.add_all([Question(**row) for row in rows if row])
+        db.session.commit()
+        return len(rows)
+
+    with app.app_context():
+        db.create_all()
+        print(f"{'rows':>8} {'method':>8} {'seconds':>8} {'rows/s':>9} {'peak MiB':>9}  result")
+        for size in args.rows:
+            path = os.path.join(workdir, f'bank-{size}.jsonl')
+            write_jsonl(path, size, args.duplicate_rate)
+
+            db.session.execute(Question.__table__.delete())
+            db.session.commit()
+            count, elapsed, peak = measure(lambda: orm_import(path), args.trace_memory)
+            print(f'{size:>8} {"orm":>8} {elapsed:>8.2f} {size / elapsed:>9.0f} {peak:>9}  {count} rows')
+
+            db.session.execute(Question.__table__.delete())
+            db.session.commit()
+            stats, elapsed, peak = measure(lambda: import_file(path, batch_size=args.batch_size), args.trace_memory)
+            print(f'{size:>8} {"batched":>8} {elapsed:>8.2f} {size / elapsed:>9.0f} {peak:>9}  '
+                  f'{stats.inserted} inserted, {stats.duplicates} duplicates')
+
+
+if __name__ == '__main__':
+    main()
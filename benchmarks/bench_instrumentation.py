@@ -0,0 +1,60 @@
+# benchmarks/bench_instrumentation.py
+"""قياس كلفة قياس المسارات وجمل SQL على زمن الطلب.
+
+يشغّل مسارات JSON نفسها مع تفعيل القياس وتعطيله بالتناوب ويقارن الأزمنة.
+
+    python -m benchmarks.bench_instrumentation --repeat 2000
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import load_app, summarize, timed
+
+PATHS = ['/hierarchy.json', '/api/v1/users/{uid}/progress', '/api/v1/users/{uid}/weak-topics']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    app = load_app('sqlite:///' + os.path.join(workdir, 'bench.db'))
+
+    from extensions import db
+    from instrumentation import REQUEST_STATEMENTS, instrumentation
+    from models import User
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='-')
+        db.session.add(user)
+        db.session.commit()
+        uid = user.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(uid)
+        session['_fresh'] = True
+
+    for path in PATHS:
+        url = path.format(uid=uid)
+        assert client.get(url).status_code == 200, url
+        results = {True: [], False: []}
+        # التناوب بين الوضعين يوزع تذبذب الجهاز على الطرفين بالتساوي
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                instrumentation.enabled = enabled
+                results[enabled] += timed(lambda: client.get(url), args.repeat // args.rounds)
+        off, on = summarize(results[False]), summarize(results[True])
+        endpoint = app.url_map.bind('').match(url)[0]
+        statements = REQUEST_STATEMENTS.count(endpoint=endpoint)
+        print(f"{path:34} off p50={off['p50']:.3f}ms  on p50={on['p50']:.3f}ms  "
+              f"overhead={(on['p50'] - off['p50']) * 1000:+.0f}us  (طلبات مقاسة: {statements})")
+    instrumentation.enabled = True
+
+
+if __name__ == '__main__':
+    main()
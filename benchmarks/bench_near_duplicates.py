@@ -0,0 +1,78 @@
+# benchmarks/bench_near_duplicates.py
+"""قياس زمن فحص السؤال المرشح في فهرس شبه المكرر ودقة اكتشاف إعادة الصياغة.
+
+    python -m benchmarks.bench_near_duplicates --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.common import summarize
+
+os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+
+LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+STEMS = ['ما هي وظيفة', 'ما العلاقة بين', 'أي مما يلي يصف', 'ما الذي يحدد', 'كيف يؤثر']
+
+
+def make_word(rng):
+    return ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 7)))
+
+
+def make_question(rng):
+    """سؤال اصطناعي بقالب شائع ومفردات عشوائية، كما في أسئلة الموضوع الواحد."""
+    return {
+        'question_text': f"{rng.choice(STEMS)} {' '.join(make_word(rng) for _ in range(rng.randint(4, 8)))}؟",
+        'option_a': make_word(rng), 'option_b': make_word(rng),
+        'option_c': make_word(rng), 'option_d': make_word(rng),
+    }
+
+
+def paraphrase(question, rng):
+    """تشكيل وتبديل ترتيب الخيارات وحذف كلمة من نص السؤال."""
+    words = question['question_text'].split()
+    del words[rng.randrange(1, len(words))]
+    options = [question[f'option_{key}'] for key in 'abcd']
+    rng.shuffle(options)
+    variant = dict(zip(('option_a', 'option_b', 'option_c', 'option_d'), options))
+    variant['question_text'] = ' '.join(words).replace('ا', 'اَ', 1)
+    return variant
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--probes', type=int, default=1000)
+    args = parser.parse_args()
+
+    from config import Config
+    from near_duplicates import TopicIndex, signature
+
+    threshold = Config.NEAR_DUPLICATE_THRESHOLD
+    rng = random.Random(3)
+    for size in args.sizes:
+        questions = [make_question(rng) for _ in range(size)]
+        index = TopicIndex()
+        start = time.perf_counter()
+        for qid, question in enumerate(questions):
+            index.add(qid, signature(question))
+        build = time.perf_counter() - start
+
+        samples, found, false_hits = [], 0, 0
+        for _ in range(args.probes):
+            original = rng.randrange(size)
+            start = time.perf_counter()
+            match = index.find(signature(paraphrase(questions[original], rng)), threshold)
+            samples.append((time.perf_counter() - start) * 1000)
+            found += bool(match and match[0] == original)
+            fresh = index.find(signature(make_question(rng)), threshold)
+            false_hits += bool(fresh)
+
+        stats = summarize(samples)
+        print(f"size={size:>6} build={build:.2f}s  check p50={stats['p50']}ms p95={stats['p95']}ms  "
+              f"paraphrase recall={found / args.probes:.2%}  false matches={false_hits / args.probes:.2%}")
+
+
+if __name__ == '__main__':
+    main()
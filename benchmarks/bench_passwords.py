@@ -0,0 +1,86 @@
+# benchmarks/bench_passwords.py
+"""قياس معدل تسجيلات الدخول لكل نواة لكل خوارزمية تجزئة ومعامل عمل.
+
+لكل إعداد: زمن التحقق الواحد في خيط الطلب، ثم معدل التحقق عبر مجمع
+العمليات بعدد العمال المطلوب تحت ضغط خيوط متزامنة كخيوط خادم الويب،
+ومعدل الخيوط نفسها دون مجمع للمقارنة (الـ GIL يسلسلها).
+
+    python -m benchmarks.bench_passwords
+    python -m benchmarks.bench_passwords --settings scrypt:15 bcrypt:12 --workers 4 --threads 16
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import summarize, timed
+from passwords import PasswordHasher, method_for
+
+DEFAULT_SETTINGS = ('scrypt:14', 'scrypt:15', 'pbkdf2:300000', 'pbkdf2:600000', 'bcrypt:10', 'bcrypt:12')
+PASSWORD = 'correct horse battery staple'
+
+
+def parse_setting(value):
+    algorithm, _, work_factor = value.partition(':')
+    return algorithm, int(work_factor) if work_factor else None
+
+
+def throughput(hasher, stored, threads, duration):
+    """عدد عمليات التحقق في الثانية من threads خيطًا متزامنًا."""
+    count = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        done = 0
+        while time.monotonic() < deadline:
+            assert hasher.verify(stored, PASSWORD)
+            done += 1
+        with lock:
+            count[0] += done
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return count[0] / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--settings', nargs='+', default=DEFAULT_SETTINGS,
+                        help='خوارزمية:معامل_عمل، مثل scrypt:15 أو pbkdf2:600000 أو bcrypt:12')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='عمليات مجمع التجزئة')
+    parser.add_argument('--threads', type=int, default=8, help='خيوط الطلبات المتزامنة')
+    parser.add_argument('--duration', type=float, default=3.0, help='مدة كل قياس معدل بالثواني')
+    parser.add_argument('--repeat', type=int, default=5, help='عدد عينات زمن التحقق الواحد')
+    args = parser.parse_args()
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"عمال المجمع: {args.workers} | الأنوية المتاحة: {os.cpu_count()} | الخيوط: {args.threads}")
+    print(f"{'الإعداد':24} {'طول البصمة':>10} {'p50 ms':>9} {'خيوط/ث':>9} {'مجمع/ث':>9} {'لكل نواة':>9}")
+
+    inline, pooled = PasswordHasher(), PasswordHasher()
+    for setting in args.settings:
+        algorithm, work_factor = parse_setting(setting)
+        inline.configure(algorithm, work_factor, workers=0)
+        pooled.configure(algorithm, work_factor, workers=args.workers, max_pending=args.threads)
+        stored = inline.hash(PASSWORD)
+
+        latency = summarize(timed(lambda: inline.verify(stored, PASSWORD), args.repeat))
+        # تسخين المجمع: بدء عمليات spawn خارج القياس
+        for _ in range(args.workers):
+            pooled.verify(stored, PASSWORD)
+        threaded = throughput(inline, stored, args.threads, args.duration)
+        offloaded = throughput(pooled, stored, args.threads, args.duration)
+        pooled.shutdown()
+
+        label = method_for(algorithm, work_factor or inline.work_factor)
+        print(f"{label:24} {len(stored):>10} {latency['p50']:>9.1f} {threaded:>9.1f} "
+              f"{offloaded:>9.1f} {offloaded / cores:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_prefill.py
+"""قياس زمن ملء بنك الأسئلة بالكامل مقابل خادم DeepSeek تجريبي محلي.
+
+    python -m benchmarks.bench_prefill --target 20 --workers 8 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import load_app
+from benchmarks.stub_deepseek import StubDeepSeek
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=0)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-prefill-')
+    with StubDeepSeek(latency=args.latency) as stub:
+        os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+        os.environ['AI_MAX_CONCURRENCY'] = str(args.workers)
+        app = load_app('sqlite:///' + os.path.join(workdir, 'bench.db'))
+
+        from ai_helper import deepseek_ai
+        from bank_prefill import run_prefill
+        from extensions import db
+
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            stats = run_prefill(
+                deepseek_ai.generate_questions,
+                target=args.target,
+                workers=args.workers,
+                rate=args.rate,
+                batch_size=args.batch_size,
+                checkpoint_path=os.path.join(workdir, 'checkpoint.json')
+            )
+            elapsed = time.perf_counter() - start
+
+    print(f"workers={args.workers} target={args.target} latency={args.latency}s")
+    print(f"buckets={stats['buckets']} completed={stats['completed']} failed={stats['failed']} "
+          f"requests={stats['requests']} inserted={stats['inserted']}")
+    print(f"elapsed {elapsed:.2f}s  ({stats['inserted'] / elapsed:.0f} questions/s)")
+
+
+if __name__ == '__main__':
+    main()
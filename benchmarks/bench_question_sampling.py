@@ -0,0 +1,82 @@
+# benchmarks/bench_question_sampling.py
+"""قياس زمن اختيار أسئلة الاختبار مقابل حجم بنك الأسئلة.
+
+يقارن المسار القديم (ORDER BY random() LIMIT n) بمخزن المعرّفات في الذاكرة.
+
+    python -m benchmarks.bench_question_sampling --sizes 1000 10000 100000 300000
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import load_app, summarize, timed
+
+CATEGORY = 'العلوم'
+TOPICS = ['الخلية', 'التكاثر', 'الوراثة', 'الجدول الدوري']
+DIFFICULTIES = ['سهل', 'متوسط', 'صعب']
+
+
+def seed_bank(db, Question, size):
+    """ملء البنك بـ size سؤال موزعة على الأقسام عبر إدراج جماعي."""
+    db.session.execute(Question.__table__.delete())
+    buckets = [(topic, diff) for topic in TOPICS for diff in DIFFICULTIES]
+    batch = []
+    for i in range(size):
+        topic, difficulty = buckets[i % len(buckets)]
+        batch.append({
+            'question_text': f'سؤال رقم {i}',
+            'option_a': 'أ', 'option_b': 'ب', 'option_c': 'ج', 'option_d': 'د',
+            'correct_answer': 'أ',
+            'category': CATEGORY,
+            'topic': topic,
+            'difficulty': difficulty,
+        })
+        if len(batch) == 5000:
+            db.session.execute(Question.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Question.__table__.insert(), batch)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    app = load_app('sqlite:///' + os.path.join(workdir, 'bench.db'))
+
+    from extensions import db
+    from models import Question
+    from question_pool import question_pool
+
+    topic, difficulty = TOPICS[0], DIFFICULTIES[1]
+
+    def old_path():
+        Question.query.filter_by(
+            category=CATEGORY, topic=topic, difficulty=difficulty
+        ).order_by(db.func.random()).limit(args.count).all()
+
+    def new_path():
+        question_pool.sample(CATEGORY, topic, difficulty, args.count)
+
+    print(f"{'bank size':>10} | {'old p50 ms':>10} | {'old p95 ms':>10} | "
+          f"{'cold ms':>8} | {'new p50 ms':>10} | {'new p95 ms':>10}")
+    with app.app_context():
+        db.create_all()
+        for size in args.sizes:
+            seed_bank(db, Question, size)
+            question_pool.invalidate()
+            old = summarize(timed(old_path, args.repeat))
+            cold = timed(new_path, 1)[0]
+            new = summarize(timed(new_path, args.repeat))
+            db.session.remove()
+            print(f"{size:>10} | {old['p50']:>10} | {old['p95']:>10} | "
+                  f"{cold:>8.2f} | {new['p50']:>10} | {new['p95']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+# benchmarks/bench_quiz_flow.py
+"""قياس تحمل مسار الاختبار الكامل من التسجيل حتى عرض النتيجة.
+
+كل مستخدم افتراضي ينفذ: التسجيل ← الدخول ← اختيار الموضوع ← بدء الاختبار ←
+الإجابة عن N سؤال ← الإنهاء ← عرض النتيجة، ويُقاس زمن كل خطوة على حدة.
+
+    # داخل العملية عبر Flask test client
+    python -m benchmarks.bench_quiz_flow --mode client --users 30 --db-sizes 1000 50000
+
+    # عبر HTTP حقيقي: خادم محلي متعدد الخيوط وعمليات توليد حمل متوازية
+    python -m benchmarks.bench_quiz_flow --mode http --workers 1 4 8 --users 20
+
+    # الوضع السريع: الاختبار كاملًا في رد JSON واحد والإجابات في طلب واحد
+    python -m benchmarks.bench_quiz_flow --fast --answers 20
+
+    # الاختبارات النشطة في مخزن الجلسات بدل صفوف quiz_session
+    python -m benchmarks.bench_quiz_flow --mode client --store sqlite
+
+    # حفظ خط أساس ثم المقارنة به بعد تعديل (رمز خروج 1 عند التراجع)
+    python -m benchmarks.bench_quiz_flow --save-baseline /tmp/quiz_flow.json
+    python -m benchmarks.bench_quiz_flow --compare /tmp/quiz_flow.json --tolerance 0.2
+
+حماية CSRF معطلة في تطبيق القياس، وطلبات الذكاء الاصطناعي موجهة إلى
+الخادم التجريبي المحلي. القوالب غير الموجودة في المستودع (مثل results.html)
+تُستبدل بقالب بسيط حتى لا يُقاس خطأ العرض بدل المسار.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from benchmarks.common import load_app, percentile
+from benchmarks.stub_deepseek import StubDeepSeek
+
+STEPS = ('register', 'login', 'selection', 'start', 'answer', 'submit', 'results')
+DIFFICULTIES = ('سهل', 'متوسط', 'صعب')
+PASSWORD = 'bench-password'
+
+FALLBACK_TEMPLATES = {
+    'results.html': '{{ quiz_result.score }}/{{ quiz_result.total_questions }}',
+    'review.html': '{{ questions|length }}',
+    'profile.html': '{{ form.username.data }}',
+    'leaderboard.html': '{{ entries|length }}',
+}
+
+
+class FlowError(Exception):
+    def __init__(self, step, status):
+        super().__init__(f"{step}: HTTP {status}")
+        self.step = step
+
+
+class HttpClient:
+    """واجهة مماثلة لـ Flask test client فوق requests دون تتبع التحويلات."""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def get(self, path):
+        return self.session.get(self.base_url + path, allow_redirects=False)
+
+    def post(self, path, data=None, json=None):
+        return self.session.post(self.base_url + path, data=data, json=json, allow_redirects=False)
+
+
+def _location(response):
+    return response.headers.get('Location', '')
+
+
+def _json(response):
+    return response.get_json() if hasattr(response, 'get_json') else response.json()
+
+
+def run_flow(client, username, selection, answers, timings, fast=False):
+    """تنفيذ مسار مستخدم واحد وتسجيل زمن كل خطوة (بالمللي ثانية) في timings.
+
+    في الوضع السريع تُرسل كل الإجابات في خطوة submit واحدة ولا توجد خطوات answer.
+    """
+    def step(name, call, expect=(200, 302)):
+        start = time.perf_counter()
+        response = call()
+        timings[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code not in expect:
+            raise FlowError(name, response.status_code)
+        return response
+
+    email = f'{username}@example.com'
+    step('register', lambda: client.post('/register', data={
+        'username': username, 'email': email,
+        'password': PASSWORD, 'confirm_password': PASSWORD
+    }), expect=(302,))
+    step('login', lambda: client.post('/login', data={
+        'email': email, 'password': PASSWORD, 'remember_me': 'no'
+    }), expect=(302,))
+    step('selection', lambda: client.post('/selection', data=dict(selection, count=answers)), expect=(302,))
+    if fast:
+        quiz = _json(step('start', lambda: client.get('/start?mode=fast'), expect=(200,)))['data']
+        payload = {'answers': {str(question['id']): 'أ' for question in quiz['questions']}}
+        result = _json(step('submit', lambda: client.post(
+            f"/api/v1/quiz/{quiz['token']}/answers", json=payload), expect=(200,)))['data']
+        step('results', lambda: client.get(result['results_url']), expect=(200,))
+        return
+    response = step('start', lambda: client.get('/start'), expect=(302,))
+    if not _location(response).endswith('/question'):
+        raise FlowError('start', 'no-questions')
+    for _ in range(answers):
+        step('answer', lambda: client.post('/question', data={'answer': 'أ'}), expect=(302,))
+    response = step('submit', lambda: client.get('/submit'), expect=(302,))
+    step('results', lambda: client.get(urlsplit(_location(response)).path), expect=(200,))
+
+
+def _run_users(client_factory, prefix, users, selection, answers, fast=False):
+    timings = defaultdict(list)
+    errors = Counter()
+    started = time.perf_counter()
+    for index in range(users):
+        try:
+            run_flow(client_factory(), f'{prefix}{index}', selection, answers, timings, fast)
+        except FlowError as e:
+            errors[e.step] += 1
+    return dict(timings), errors, started, time.perf_counter()
+
+
+def _http_worker(args):
+    base_url, prefix, users, selection, answers, fast = args
+    return _run_users(lambda: HttpClient(base_url), prefix, users, selection, answers, fast)
+
+
+def seed_bank(app, size, selection):
+    """ملء البنك بـ size سؤال موزعة على كل أوراق الشجرة والصعوبات.
+
+    موضوع الاختيار يأخذ نصيبًا إضافيًا حتى تكفي أسئلته الاختبار مهما صغر البنك.
+    """
+    from extensions import db
+    from hierarchy_index import LEAF_PATHS
+    from models import Question
+    from question_pool import question_pool
+
+    topics = sorted({(path[0], path[2] if len(path) > 2 else path[-1]) for path in LEAF_PATHS})
+    selected = (selection['subject'], selection['topic'])
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Question.__table__.delete())
+        batch = []
+        for i in range(size):
+            category, topic = selected if i % 4 == 0 else topics[i % len(topics)]
+            batch.append({
+                'question_text': f'سؤال تحميل {i}',
+                'option_a': 'أ', 'option_b': 'ب', 'option_c': 'ج', 'option_d': 'د',
+                'correct_answer': 'أ',
+                'category': category, 'topic': topic,
+                'difficulty': DIFFICULTIES[(i // 4) % len(DIFFICULTIES)],
+            })
+            if len(batch) == 5000:
+                db.session.execute(Question.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(Question.__table__.insert(), batch)
+        db.session.commit()
+        question_pool.invalidate()
+        db.engine.dispose()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app, port):
+    from werkzeug.serving import make_server
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def _wait_ready(base_url, timeout=15):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + '/hierarchy.json', timeout=1).status_code == 200:
+                return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"الخادم لم يستجب خلال {timeout} ثانية")
+
+
+def summarize_run(timings, errors, started, finished):
+    steps = {}
+    for name in STEPS:
+        samples = timings.get(name, [])
+        steps[name] = {
+            'count': len(samples),
+            'errors': errors.get(name, 0),
+            'p50': round(percentile(samples, 50), 2),
+            'p95': round(percentile(samples, 95), 2),
+            'p99': round(percentile(samples, 99), 2),
+        }
+    requests_made = sum(len(samples) for samples in timings.values())
+    elapsed = max(finished - started, 1e-9)
+    return {'rps': round(requests_made / elapsed, 1), 'requests': requests_made,
+            'seconds': round(elapsed, 2), 'steps': steps}
+
+
+def merge(results):
+    timings, errors = defaultdict(list), Counter()
+    for worker_timings, worker_errors, _, _ in results:
+        for name, samples in worker_timings.items():
+            timings[name].extend(samples)
+        errors.update(worker_errors)
+    return timings, errors, min(r[2] for r in results), max(r[3] for r in results)
+
+
+def print_run(run):
+    store = run.get('store', 'database')
+    print(f"\n[{run['mode']}{' fast' if run.get('fast') else ''}{'' if store == 'database' else ' ' + store}] "
+          f"workers={run['workers']} db_size={run['db_size']}: "
+          f"{run['rps']} req/s ({run['requests']} طلب في {run['seconds']}s)")
+    if 'db_writes' in run:
+        print(f"  كتابات القاعدة الرئيسية لكل مستخدم: {run['db_writes']}")
+    print(f"  {'step':<10} {'count':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in run['steps'].items():
+        print(f"  {name:<10} {stats['count']:>6} {stats['errors']:>4} "
+              f"{stats['p50']:>8} {stats['p95']:>8} {stats['p99']:>8}")
+
+
+def _run_key(run):
+    store = run.get('store', 'database')
+    return (f"{run['mode']}|{run['workers']}|{run['db_size']}" + ('|fast' if run.get('fast') else '')
+            + ('' if store == 'database' else f'|{store}'))
+
+
+def compare(baseline, runs, tolerance):
+    """مقارنة p95 لكل خطوة ومعدل الطلبات بخط الأساس؛ تعيد عدد التراجعات."""
+    previous = {_run_key(run): run for run in baseline['runs']}
+    regressions = 0
+    for run in runs:
+        old = previous.get(_run_key(run))
+        if old is None:
+            print(f"\n{_run_key(run)}: لا يوجد في خط الأساس")
+            continue
+        print(f"\n{_run_key(run)} مقابل {baseline['meta'].get('commit', '?')[:10]}:")
+        rows = [('rps', old['rps'], run['rps'], True)]
+        rows += [(f"{name} p95", old['steps'][name]['p95'], stats['p95'], False)
+                 for name, stats in run['steps'].items() if name in old['steps']]
+        for label, before, after, higher_is_better in rows:
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            flag = 'تراجع' if worse > tolerance else ''
+            regressions += bool(flag)
+            print(f"  {label:<14} {before:>9} -> {after:<9} {change:+.1%} {flag}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4],
+                        help='عدد عمليات توليد الحمل (وضع http فقط)')
+    parser.add_argument('--users', type=int, default=10, help='عدد المستخدمين لكل عملية')
+    parser.add_argument('--answers', type=int, default=10, help='عدد الأسئلة في كل اختبار')
+    parser.add_argument('--db-sizes', type=int, nargs='+', default=[1000, 20000])
+    parser.add_argument('--url', help='خادم قائم بدل الخادم المحلي (يُفترض أن CSRF معطل فيه)')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--fast', action='store_true', help='الوضع السريع: /start?mode=fast ثم إرسال الإجابات دفعة واحدة')
+    parser.add_argument('--store', choices=('database', 'memory', 'sqlite'), default='database',
+                        help='مخزن الاختبارات النشطة (memory لا يصلح مع وضع http متعدد العمليات)')
+    args = parser.parse_args()
+
+    stub = StubDeepSeek().start()
+    os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+    workdir = tempfile.mkdtemp(prefix='quiz-bench-')
+    app = load_app('sqlite:///' + os.path.join(workdir, 'bench.db'))
+    app.config['WTF_CSRF_ENABLED'] = False
+    from session_store import active_sessions
+    active_sessions.configure(args.store, path=os.path.join(workdir, 'active_sessions.db'))
+
+    # عدّ جمل الكتابة على القاعدة الرئيسية (داخل العملية فقط)
+    from sqlalchemy import event
+    from extensions import db
+    writes = Counter()
+
+    def count_write(conn, cursor, statement, *args):
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            writes['statements'] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_write)
+
+    from jinja2 import ChoiceLoader, DictLoader
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader(FALLBACK_TEMPLATES)])
+
+    from hierarchy_index import leaf_paths
+    path = leaf_paths(('العلوم',))[0]
+    selection = {'subject': path[0], 'specialization': path[1], 'topic': path[2],
+                 'sub_topic': path[3] if len(path) > 3 else '', 'difficulty': 'متوسط'}
+
+    ctx = multiprocessing.get_context('fork')
+    runs = []
+    for db_size in args.db_sizes:
+        seed_bank(app, db_size, selection)
+        run_id = uuid.uuid4().hex[:6]
+
+        if args.mode in ('client', 'both'):
+            writes.clear()
+            result = _run_users(app.test_client, f'c{run_id}', args.users, selection, args.answers, args.fast)
+            runs.append(dict(summarize_run(*result), mode='client', workers=1, db_size=db_size, fast=args.fast,
+                             store=args.store, db_writes=round(writes['statements'] / args.users, 1)))
+            print_run(runs[-1])
+
+        if args.mode in ('http', 'both'):
+            server = None
+            base_url = args.url
+            if not base_url:
+                port = _free_port()
+                server = ctx.Process(target=_serve, args=(app, port))
+                server.start()
+                base_url = f'http://127.0.0.1:{port}'
+            try:
+                _wait_ready(base_url)
+                for workers in args.workers:
+                    jobs = [(base_url, f'h{run_id}w{workers}p{i}u', args.users, selection, args.answers, args.fast)
+                            for i in range(workers)]
+                    with ctx.Pool(workers) as pool:
+                        result = merge(pool.map(_http_worker, jobs))
+                    runs.append(dict(summarize_run(*result), mode='http', workers=workers, db_size=db_size,
+                                     fast=args.fast, store=args.store))
+                    print_run(runs[-1])
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.join()
+    stub.stop()
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'users': args.users,
+            'answers': args.answers,
+        },
+        'runs': runs,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+        print(f"\nخط الأساس محفوظ في {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            regressions = compare(json.load(handle), runs, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} تراجع يتجاوز {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_salvage.py
+"""مقارنة إعادة التوليد الكامل عند الردود المقطوعة بإنقاذ الأسئلة وطلب النقص فقط.
+
+    python -m benchmarks.bench_salvage --runs 20 --count 10 --truncate-rate 0.5
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from benchmarks.stub_deepseek import StubDeepSeek
+
+
+def legacy_generate(ai, params, count):
+    """المسار السابق: تحليل الرد كاملًا بتعبير نمطي وإعادة توليد العدد كله عند النقص."""
+    for _ in range(ai.max_retries):
+        response = ai._send_api_request(ai._build_prompt(params, count))
+        match = re.search(r'\{[\s\S]*\}', response or '')
+        if not match:
+            continue
+        try:
+            questions = json.loads(match.group()).get('questions', [])
+        except json.JSONDecodeError:
+            continue
+        valid = [q for q in questions if ai._validate_question(q)]
+        if len(valid) >= count:
+            return valid[:count]
+    return []
+
+
+def measure(stub, fn, runs):
+    requests_before, chars_before = stub.requests, stub.completion_chars
+    complete = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        complete += bool(fn())
+    elapsed = time.perf_counter() - start
+    return {
+        'complete': complete,
+        'requests': stub.requests - requests_before,
+        'tokens': (stub.completion_chars - chars_before) // 4,
+        'elapsed': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--truncate-rate', type=float, default=0.5)
+    args = parser.parse_args()
+
+    with StubDeepSeek(latency=args.latency, truncate_rate=args.truncate_rate, seed=1) as stub:
+        # يجب ضبط البيئة قبل استيراد الإعدادات
+        os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+        os.environ.setdefault('AI_RETRY_BASE_DELAY', '0.05')
+        from ai_helper import DeepSeekAI
+
+        ai = DeepSeekAI()
+        params = {'category': 'العلوم', 'topic': 'الخلية', 'difficulty': 'متوسط'}
+        legacy = measure(stub, lambda: len(legacy_generate(ai, params, args.count)) == args.count, args.runs)
+        salvage = measure(stub, lambda: len(ai.generate_questions(params, args.count)) == args.count, args.runs)
+
+    print(f'runs={args.runs} count={args.count} truncate_rate={args.truncate_rate}')
+    for name, result in (('full regeneration', legacy), ('salvage + top-up', salvage)):
+        print(f"{name:18}: {result['complete']}/{args.runs} complete, {result['requests']} requests, "
+              f"~{result['tokens']} completion tokens, {result['elapsed']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_streaming.py
+"""قياس زمن الوصول إلى أول سؤال: التوليد الكامل مقابل التوليد المتدفق.
+
+    python -m benchmarks.bench_streaming --count 10 --latency 3
+"""
+import argparse
+import os
+import time
+
+from benchmarks.stub_deepseek import StubDeepSeek
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=3.0)
+    args = parser.parse_args()
+
+    with StubDeepSeek(latency=args.latency) as stub:
+        # يجب ضبط البيئة قبل استيراد الإعدادات
+        os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+        from ai_helper import DeepSeekAI
+
+        ai = DeepSeekAI()
+        params = {'category': 'العلوم', 'topic': 'الخلية', 'difficulty': 'متوسط'}
+
+        start = time.perf_counter()
+        blocking = ai.generate_questions(params, args.count)
+        blocking_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first = None
+        streamed = 0
+        for _ in ai.stream_questions(params, args.count):
+            streamed += 1
+            if first is None:
+                first = time.perf_counter() - start
+        streaming_total = time.perf_counter() - start
+
+    print(f'count={args.count} latency={args.latency}s')
+    print(f'blocking  : first question {blocking_total:.2f}s, all {len(blocking)} in {blocking_total:.2f}s')
+    print(f'streaming : first question {first:.2f}s, all {streamed} in {streaming_total:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/common.py
+"""أدوات مشتركة لسكربتات قياس الأداء."""
+import os
+import statistics
+import time
+
+# extensions ينشئ عميل الذكاء الاصطناعي عند الاستيراد ويتطلب وجود مفتاح
+os.environ.setdefault('DEEPSEEK_API_KEY', 'benchmark')
+
+
+def load_app(database_uri):
+    """تحميل تطبيق Flask موجّهًا إلى قاعدة بيانات القياس."""
+    os.environ['DATABASE_URL'] = database_uri
+    from app import app
+    return app
+
+
+def timed(fn, repeat):
+    """تنفيذ fn عدة مرات وإرجاع الأزمنة بالمللي ثانية."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    """حساب المئين pct من عينة أزمنة."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(samples):
+    return {
+        'p50': round(statistics.median(samples), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'max': round(max(samples), 3),
+    }
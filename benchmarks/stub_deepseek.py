@@ -0,0 +1,255 @@
+# benchmarks/stub_deepseek.py
+"""خادم محلي يحاكي واجهة DeepSeek لأغراض القياس والاختبارات دون اتصال.
+
+    python -m benchmarks.stub_deepseek --port 8089 --latency 0.5
+
+ثم توجيه التطبيق إليه عبر DEEPSEEK_BASE_URL=http://127.0.0.1:8089/v1
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_counter = itertools.count(1)
+_ANSWERS = ['أ', 'ب', 'ج', 'د']
+_LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+
+
+def _words(n, count):
+    """كلمات عشوائية ثابتة لكل رقم حتى لا تُعد الأسئلة المولدة شبه مكررة."""
+    rng = random.Random(n)
+    return ' '.join(''.join(rng.choice(_LETTERS) for _ in range(rng.randint(3, 7))) for _ in range(count))
+
+
+def _field(prompt, name, default):
+    match = re.search(rf'"{name}":\s*"([^"]*)"', prompt)
+    return match.group(1) if match else default
+
+
+def build_questions(prompt):
+    """بناء أسئلة صالحة من حقول نموذج التنسيق الموجود في نص الطلب."""
+    count_match = re.search(r'(\d+)\s*أسئلة', prompt)
+    count = int(count_match.group(1)) if count_match else 5
+    category = _field(prompt, 'category', 'عام')
+    topic = _field(prompt, 'topic', 'عام')
+    difficulty = _field(prompt, 'difficulty', 'متوسط')
+    questions = []
+    for _ in range(count):
+        n = next(_counter)
+        questions.append({
+            'question_text': f'سؤال تجريبي رقم {n} في {topic}: {_words(n, 5)}',
+            'option_a': f'الخيار الأول {_words(-n, 1)}',
+            'option_b': f'الخيار الثاني {_words(-n - 1, 1)}',
+            'option_c': f'الخيار الثالث {_words(-n - 2, 1)}',
+            'option_d': f'الخيار الرابع {_words(-n - 3, 1)}',
+            'correct_answer': _ANSWERS[n % 4],
+            'category': category,
+            'topic': topic,
+            'difficulty': difficulty,
+            'explanation': f'شرح السؤال رقم {n}'
+        })
+    return questions
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # العميل أغلق الاتصال (انتهاء مهلته مثلًا)
+            pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_stream(self, content, usage=None, chunk_size=24):
+        """إرسال المحتوى كأحداث SSE مع توزيع زمن الاستجابة على الأجزاء."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        delay = self.server.latency / max(len(pieces), 1)
+        try:
+            for piece in pieces:
+                time.sleep(delay)
+                event = {'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                self._write_chunk(f'data: {json.dumps(event, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            if usage:
+                # stream_options.include_usage: جزء أخير بلا خيارات يحمل الاستهلاك
+                self._write_chunk(f'data: {json.dumps({"choices": [], "usage": usage})}\n\n'.encode('utf-8'))
+            self._write_chunk(b'data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # العميل أغلق الاتصال بعد الحصول على ما يكفيه
+            self.close_connection = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            self._complete(request)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _complete(self, request):
+        server = self.server
+        with server.lock:
+            failing = server.random.random() < server.error_rate
+        if failing:
+            with server.lock:
+                server.requests += 1
+            time.sleep(server.latency)
+            self._send_json(503, {'error': {'message': 'service unavailable (injected)'}})
+            return
+
+        prompt = request.get('messages', [{}])[-1].get('content', '')
+        content = json.dumps({'questions': build_questions(prompt)}, ensure_ascii=False)
+        finish_reason = 'stop'
+        with server.lock:
+            server.requests += 1
+            truncated = server.random.random() < server.truncate_rate
+        if truncated:
+            # محاكاة بلوغ max_tokens: قطع الرد في منتصف أحد الأسئلة
+            content = content[:int(len(content) * 0.6)]
+            finish_reason = 'length'
+        with server.lock:
+            server.completion_chars += len(content)
+
+        # تقدير تقريبي: أربعة أحرف لكل رمز
+        usage = {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (len(prompt) + len(content)) // 4
+        }
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage')
+            self._send_stream(content, usage if include_usage else None)
+            return
+
+        time.sleep(server.latency)
+        self._send_json(200, {
+            'id': f'stub-{next(_counter)}',
+            'object': 'chat.completion',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': finish_reason
+            }],
+            'usage': usage
+        })
+
+
+class StubDeepSeek:
+    """تشغيل الخادم التجريبي في خيط خلفي.
+
+        with StubDeepSeek(latency=0.2) as stub:
+            os.environ['DEEPSEEK_BASE_URL'] = stub.base_url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, truncate_rate=0.0, error_rate=0.0, seed=None):
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.requests = 0
+        self.server.completion_chars = 0
+        # الطلبات الجارية الآن وأقصى عدد منها في وقت واحد
+        self.server.in_flight = 0
+        self.server.peak_in_flight = 0
+        self.server.truncate_rate = truncate_rate
+        self.server.error_rate = error_rate
+        self.server.random = random.Random(seed)
+        self.server.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def completion_chars(self):
+        return self.server.completion_chars
+
+    @property
+    def peak_in_flight(self):
+        return self.server.peak_in_flight
+
+    def set_faults(self, latency=None, error_rate=None, truncate_rate=None):
+        """تغيير الأعطال المحاكاة أثناء التشغيل (بطء، أخطاء 503، ردود مقطوعة)."""
+        with self.server.lock:
+            if latency is not None:
+                self.server.latency = latency
+            if error_rate is not None:
+                self.server.error_rate = error_rate
+            if truncate_rate is not None:
+                self.server.truncate_rate = truncate_rate
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='زمن الاستجابة المحاكى بالثواني')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='نسبة الردود المقطوعة عند max_tokens')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='نسبة الطلبات التي تُرد بخطأ 503')
+    args = parser.parse_args()
+
+    stub = StubDeepSeek(args.host, args.port, args.latency, args.truncate_rate, args.error_rate)
+    print(f'Stub DeepSeek API on {stub.base_url}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# circuit_breaker.py
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import requests
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class AIUnavailableError(requests.exceptions.RequestException):
+    """رفض الطلب محليًا دون الاتصال بالخدمة لأنها غير متاحة حاليًا."""
+
+
+class CircuitOpenError(AIUnavailableError):
+    pass
+
+
+class ConcurrencyLimitError(AIUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """قاطع دائرة بثلاث حالات لحماية العمال من خدمة متعطلة.
+
+    - مغلق: الطلبات تمر، وبعد عدد من الإخفاقات المتتالية ينفتح.
+    - مفتوح: كل الطلبات تُرفض فورًا حتى تنقضي مهلة إعادة المحاولة.
+    - نصف مفتوح: يمر عدد محدود من طلبات الاختبار؛ نجاحها يغلق الدائرة
+      وفشل أي منها يعيد فتحها.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30,
+                 half_open_probes: int = 1, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """يرفع CircuitOpenError إذا لم يكن مسموحًا بالطلب الآن."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self._rejected += 1
+            retry_after = max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(f"دائرة الذكاء الاصطناعي مفتوحة؛ إعادة المحاولة بعد {retry_after:.0f} ثانية")
+
+    def release_probe(self) -> None:
+        """إرجاع تصريح اختبار لم يُستخدم (الطلب لم يُرسل أصلًا)."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected,
+                'retry_after': round(max(0.0, self.reset_timeout - (self._clock() - self._opened_at)), 1)
+                if state == OPEN else 0
+            }
+
+
+class AdaptiveLimiter:
+    """حد تزامن متكيف بأسلوب AIMD.
+
+    كل نجاح سريع يزيد الحد بمقدار 1/الحد (زيادة بنحو واحد لكل دورة كاملة)،
+    وكل فشل أو استجابة بطيئة يقسم الحد على اثنين. الطلب الذي لا يجد
+    مكانًا خلال مهلة الانتظار يُرفض بدل أن يحجز عاملًا.
+    """
+
+    def __init__(self, initial: float, min_limit: float = 1, max_limit: Optional[float] = None,
+                 queue_timeout: float = 2.0, backoff_ratio: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit or initial
+        self.limit = min(max(initial, min_limit), self.max_limit)
+        self.queue_timeout = queue_timeout
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self._rejected = 0
+        self._waiters = deque()
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """حجز مكان بترتيب الوصول؛ يرفع ConcurrencyLimitError عند انتهاء مهلة الانتظار."""
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+        ticket = object()
+        with self._condition:
+            # طابور بترتيب الوصول حتى لا يستعيد العامل الذي أنهى طلبه مكانه فورًا
+            self._waiters.append(ticket)
+            try:
+                while self._waiters[0] is not ticket or self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        raise ConcurrencyLimitError(
+                            f"تم بلوغ حد التزامن لطلبات الذكاء الاصطناعي ({int(self.limit)})"
+                        )
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self._waiters.remove(ticket)
+                self._condition.notify_all()
+
+    def release(self, success: bool) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'max_limit': self.max_limit,
+                'rejected': self._rejected
+            }
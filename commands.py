@@ -0,0 +1,165 @@
+# commands.py
+from datetime import timezone
+
+import click
+from flask.cli import AppGroup
+
+from leaderboard import rebuild_leaderboard
+from question_bank import backfill_content_hashes
+from bank_import import FORMATS, import_file
+from bank_prefill import run_prefill
+from near_duplicates import recluster
+from user_stats import backfill_user_stats
+from synthetic_data import SeedConfig, seed_dataset
+from quiz_service import checkpoint_expired_sessions
+from session_store import active_sessions
+
+leaderboard_cli = AppGroup('leaderboard', help='أوامر لوحة المتصدرين.')
+stats_cli = AppGroup('stats', help='أوامر إحصاءات المستخدمين.')
+bank_cli = AppGroup('bank', help='أوامر بنك الأسئلة.')
+bench_cli = AppGroup('bench', help='أوامر بيانات قياس الأداء.')
+sessions_cli = AppGroup('sessions', help='أوامر مخزن الاختبارات النشطة.')
+
+
+@leaderboard_cli.command('rebuild')
+@click.option('--batch-size', default=5000, show_default=True, help='حجم دفعة القراءة والإدراج.')
+def rebuild_command(batch_size):
+    """إعادة بناء مجاميع لوحة المتصدرين من جدول النتائج."""
+    written = rebuild_leaderboard(batch_size=batch_size)
+    click.echo(f"تمت إعادة بناء لوحة المتصدرين: {written} صف")
+
+
+@stats_cli.command('backfill')
+@click.option('--batch-size', default=5000, show_default=True, help='حجم دفعة القراءة والإدراج.')
+def backfill_command(batch_size):
+    """إعادة حساب إحصاءات المستخدمين من جدول النتائج."""
+    written = backfill_user_stats(batch_size=batch_size)
+    click.echo(f"تم حساب إحصاءات {written} مستخدم")
+
+
+@bank_cli.command('rehash')
+@click.option('--batch-size', default=1000, show_default=True, help='عدد الأسئلة في كل دفعة.')
+def rehash_command(batch_size):
+    """حساب بصمات المحتوى للأسئلة التي لا تملك بصمة."""
+    updated = backfill_content_hashes(batch_size=batch_size)
+    click.echo(f"تم حساب بصمات {updated} سؤال")
+
+
+@bank_cli.command('prefill')
+@click.option('--target', default=50, show_default=True, help='العدد المستهدف من الأسئلة لكل (موضوع، صعوبة).')
+@click.option('--workers', default=4, show_default=True, help='عدد عمال التوليد المتوازيين.')
+@click.option('--rate', default=2.0, show_default=True, help='الحد الأقصى لطلبات التوليد في الثانية (0 بلا حد).')
+@click.option('--batch-size', default=10, show_default=True, help='عدد الأسئلة المطلوبة في كل طلب.')
+@click.option('--checkpoint', 'checkpoint_path', default='prefill_checkpoint.json', show_default=True,
+              help='ملف نقطة الاستئناف.')
+def prefill_command(target, workers, rate, batch_size, checkpoint_path):
+    """ملء بنك الأسئلة لكل أوراق شجرة المواد حتى العدد المستهدف.
+
+    يمكن توجيهه إلى خادم تجريبي عبر DEEPSEEK_BASE_URL.
+    """
+    from ai_helper import deepseek_ai
+
+    stats = run_prefill(
+        deepseek_ai.generate_questions,
+        target=target,
+        workers=workers,
+        rate=rate,
+        batch_size=batch_size,
+        checkpoint_path=checkpoint_path
+    )
+    click.echo(
+        f"الأقسام: {stats['buckets']} | المكتملة: {stats['completed']} | المتعثرة: {stats['failed']} | "
+        f"الطلبات: {stats['requests']} | الأسئلة المضافة: {stats['inserted']}"
+    )
+
+
+@bank_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='صيغة الملف (تُستنتج من الامتداد افتراضيًا).')
+@click.option('--batch-size', default=1000, show_default=True, help='عدد الأسئلة في كل دفعة إدراج.')
+@click.option('--source', default='import', show_default=True, help='قيمة حقل المصدر للأسئلة المستوردة.')
+@click.option('--category', help='المادة الافتراضية للصفوف التي لا تحددها.')
+@click.option('--topic', help='الموضوع الافتراضي للصفوف التي لا تحدده.')
+@click.option('--difficulty', help='الصعوبة الافتراضية للصفوف التي لا تحددها.')
+def import_command(path, fmt, batch_size, source, category, topic, difficulty):
+    """استيراد أسئلة من ملف JSONL أو CSV أو DOCX مع تجاهل المكرر."""
+    defaults = {'category': category, 'topic': topic, 'difficulty': difficulty}
+    stats = import_file(
+        path,
+        fmt=fmt,
+        batch_size=batch_size,
+        source=source,
+        defaults={key: value for key, value in defaults.items() if value}
+    )
+    click.echo(
+        f"المقروء: {stats.read} | المضاف: {stats.inserted} | "
+        f"المكرر: {stats.duplicates} | شبه المكرر: {stats.near_duplicates} | المرفوض: {stats.invalid}"
+    )
+    for reason, count in stats.rejected.most_common(10):
+        click.echo(f"  {reason}: {count}")
+
+
+@bank_cli.command('dedupe')
+@click.option('--batch-size', default=1000, show_default=True, help='عدد الأسئلة في كل دفعة.')
+@click.option('--threshold', type=float, help='عتبة التشابه (الافتراضي NEAR_DUPLICATE_THRESHOLD).')
+def dedupe_command(batch_size, threshold):
+    """إعادة تجميع البنك وتعليم الأسئلة شبه المكررة لاستبعادها من الاختبارات."""
+    stats = recluster(batch_size=batch_size, threshold=threshold)
+    click.echo(
+        f"المفحوص: {stats['scanned']} | شبه المكرر: {stats['duplicates']} | المتغير: {stats['changed']}"
+    )
+
+
+@bench_cli.command('seed')
+@click.option('--scale', default=1.0, show_default=True, help='معامل الحجم (100 ≈ مئة ألف مستخدم وعشرة ملايين صف).')
+@click.option('--seed', default=42, show_default=True, help='بذرة التوليد؛ نفس البذرة تعطي نفس البيانات.')
+@click.option('--quizzes-per-user', default=8.0, show_default=True, help='متوسط عدد الاختبارات لكل مستخدم.')
+@click.option('--questions-per-quiz', default=10, show_default=True, help='عدد أسئلة كل اختبار.')
+@click.option('--topic-skew', default=1.1, show_default=True, help='أس Zipf لشعبية المواضيع.')
+@click.option('--activity-skew', default=1.3, show_default=True, help='أس Pareto لنشاط المستخدمين (أصغر = أكثر انحرافًا).')
+@click.option('--days', default=180, show_default=True, help='عدد الأيام التي تتوزع عليها النتائج.')
+@click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), help='تاريخ آخر يوم في البيانات (الافتراضي اليوم).')
+@click.option('--batch-size', default=10000, show_default=True, help='عدد الصفوف في كل دفعة إدراج.')
+@click.option('--reset', is_flag=True, help='حذف المستخدمين والأسئلة والنتائج الموجودة قبل التوليد.')
+@click.option('--no-aggregates', is_flag=True, help='عدم إعادة بناء الإحصاءات ولوحة المتصدرين بعد التوليد.')
+def seed_command(scale, seed, quizzes_per_user, questions_per_quiz, topic_skew, activity_skew,
+                 days, anchor, batch_size, reset, no_aggregates):
+    """توليد بيانات اصطناعية حتمية بتوزيعات منحرفة لاختبارات الأداء."""
+    if reset:
+        click.confirm('سيتم حذف كل المستخدمين والأسئلة والنتائج. متابعة؟', abort=True)
+    config = SeedConfig(
+        scale=scale,
+        seed=seed,
+        quizzes_per_user=quizzes_per_user,
+        questions_per_quiz=questions_per_quiz,
+        topic_skew=topic_skew,
+        activity_skew=activity_skew,
+        days=days,
+        anchor=anchor.replace(tzinfo=timezone.utc) if anchor else None,
+        batch_size=batch_size
+    )
+    stats = seed_dataset(config, reset=reset, aggregates=not no_aggregates)
+    click.echo(
+        f"المستخدمون: {stats.users} | الأسئلة: {stats.questions} | النتائج: {stats.results} | "
+        f"أسئلة الجلسات: {stats.session_questions} | التقدم: {stats.progress} | أيامه: {stats.progress_days}"
+    )
+    click.echo(f"{stats.rows} صف في {stats.elapsed:.1f} ثانية ({stats.rows / max(stats.elapsed, 1e-9):,.0f} صف/ث)")
+
+
+@sessions_cli.command('checkpoint')
+@click.option('--batch-size', default=500, show_default=True, help='عدد الجلسات المنتهية في كل دفعة.')
+def checkpoint_command(batch_size):
+    """حفظ تقدم الاختبارات المنتهية دون إنهاء وحذفها من المخزن أو من quiz_session."""
+    if active_sessions.backend == 'memory':
+        # مخزن الذاكرة يعيش في عملية الخادم، ونسخة هذه العملية فارغة دائمًا
+        raise click.ClickException(
+            "ACTIVE_SESSION_STORE=memory: المخزن داخل عملية الخادم ويُفحص فيها تلقائيًا "
+            "كل ACTIVE_SESSION_CHECKPOINT_INTERVAL ثانية"
+        )
+    total = 0
+    while True:
+        saved = checkpoint_expired_sessions(limit=batch_size)
+        total += saved
+        if saved < batch_size:
+            break
+    click.echo(f"تم حفظ تقدم {total} اختبار منتهٍ")
@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# الحد الأقصى لعدد الأسئلة في طلب توليد واحد
+MAX_QUESTIONS = int(os.getenv('MAX_QUESTIONS', 20))
+
 class Config:
     # إعدادات الأمان الأساسية
     SECRET_KEY = os.getenv('FLASK_SECRET_KEY', os.getenv('SECRET_KEY', 'default-secret-key'))
@@ -12,9 +15,92 @@ class Config:
     # إعدادات قاعدة البيانات
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # مدة صلاحية أقسام مخزن الأسئلة في الذاكرة (بالثواني)
+    QUESTION_POOL_TTL = int(os.getenv('QUESTION_POOL_TTL', 300))
+
+    # حدود تفريغ مخزن تقدم المستخدم المؤقت (عدد الإجابات / الثواني)
+    PROGRESS_FLUSH_SIZE = int(os.getenv('PROGRESS_FLUSH_SIZE', 20))
+    PROGRESS_FLUSH_INTERVAL = int(os.getenv('PROGRESS_FLUSH_INTERVAL', 300))
+
+    # ذاكرة المستخدمين المؤقتة لمحمّل Flask-Login (TTL صفر يعطلها) وفترة مزامنتها بين العمليات
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))
+    USER_CACHE_SYNC_INTERVAL = float(os.getenv('USER_CACHE_SYNC_INTERVAL', 1.0))
+
+    # تجزئة كلمات المرور: scrypt أو pbkdf2 أو bcrypt ومعامل العمل (فارغ = الافتراضي للخوارزمية)،
+    # وعدد عمليات التجزئة المنفصلة (0 = في خيط الطلب) وحد المهام المعلقة ومهلة انتظارها بالثواني
+    PASSWORD_HASH_ALGORITHM = os.getenv('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_HASH_WORK_FACTOR = int(os.getenv('PASSWORD_HASH_WORK_FACTOR', 0)) or None
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+    # أقصى عدد للقطات جلسات الاختبار المخزنة في الذاكرة
+    SESSION_SNAPSHOT_CACHE_SIZE = int(os.getenv('SESSION_SNAPSHOT_CACHE_SIZE', 1024))
+
+    # مدة صلاحية رمز اختبار الوضع السريع بالثواني
+    FAST_QUIZ_MAX_AGE = int(os.getenv('FAST_QUIZ_MAX_AGE', 7200))
+
+    # مخزن الاختبارات النشطة: database (صفوف quiz_session)، أو memory (ذاكرة العملية،
+    # لعملية خادم واحدة)، أو sqlite (ملف جانبي بوضع WAL تتشاركه عمليات الجهاز)
+    ACTIVE_SESSION_STORE = os.getenv('ACTIVE_SESSION_STORE', 'database')
+    ACTIVE_SESSION_STORE_PATH = os.getenv('ACTIVE_SESSION_STORE_PATH', 'active_sessions.db')
+    # مدة خمول الاختبار قبل انتهائه وحفظ تقدمه، وأقل فاصل بين فحوص الانتهاء (بالثواني)
+    ACTIVE_SESSION_TTL = int(os.getenv('ACTIVE_SESSION_TTL', 7200))
+    ACTIVE_SESSION_CHECKPOINT_INTERVAL = int(os.getenv('ACTIVE_SESSION_CHECKPOINT_INTERVAL', 60))
+
+    # عدد المواضيع الضعيفة المعروضة في صفحة النتائج
+    WEAK_TOPICS_LIMIT = int(os.getenv('WEAK_TOPICS_LIMIT', 5))
+    # نافذة تحليل الأخطاء في صفحة النتائج بالأيام (0 = كل التاريخ)
+    WEAK_TOPICS_DAYS = int(os.getenv('WEAK_TOPICS_DAYS', 0))
     
     # إعدادات الذكاء الاصطناعي
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
+    DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com/v1')
+
+    # مجمع اتصالات عميل الذكاء الاصطناعي والتوازي والمهلات (بالثواني)
+    AI_POOL_SIZE = int(os.getenv('AI_POOL_SIZE', 10))
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 4))
+    AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', 5))
+    AI_READ_TIMEOUT = float(os.getenv('AI_READ_TIMEOUT', 30))
+
+    # التأخير الأساسي والأقصى (بالثواني) لإعادة المحاولة مع التراجع الأسي
+    AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', 0.5))
+    AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', 8))
+
+    # قاطع الدائرة: عدد الإخفاقات المتتالية قبل الفتح، ومدة البقاء مفتوحًا،
+    # وزمن الاستجابة (بالثواني) الذي يُعد بعده الطلب بطيئًا ويُحسب إخفاقًا
+    AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', 5))
+    AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', 30))
+    AI_SLOW_CALL_THRESHOLD = float(os.getenv('AI_SLOW_CALL_THRESHOLD', 10))
+
+    # الحد الأدنى للتزامن المتكيف، وأقصى انتظار لمكان شاغر قبل الرفض
+    AI_MIN_CONCURRENCY = int(os.getenv('AI_MIN_CONCURRENCY', 1))
+    AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', 2))
+
+    # قياس زمن المسارات وجمل SQL، وعتبة سجل الطلبات البطيئة بالثواني
+    # (0 = معطل) مع أقصى عدد من الجمل المسجلة لكل طلب بطيء
+    REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', 0))
+    SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv('SLOW_REQUEST_MAX_STATEMENTS', 50))
+
+    # ميزانية جمل SQL لكل مسار وكشف N+1: off أو warn (تسجيل تحذير) أو raise
+    # (للاختبارات)، والعدد الذي تُعد عنده الجملة المتكررة نمط N+1
+    QUERY_BUDGET_MODE = os.getenv('QUERY_BUDGET_MODE', 'warn' if DEBUG else 'off')
+    QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 3))
+
+    # رمز Bearer المطلوب لقراءة /metrics (فارغ = بلا حماية، للشبكات الداخلية)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # ذاكرة نتائج التوليد المؤقتة (عدد المفاتيح / مدة الصلاحية بالثواني)
+    GENERATION_CACHE_SIZE = int(os.getenv('GENERATION_CACHE_SIZE', 256))
+    GENERATION_CACHE_TTL = int(os.getenv('GENERATION_CACHE_TTL', 3600))
+
+    # عتبة تشابه جاكارد المقدّر التي يُعد عندها السؤال شبه مكرر
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', 0.75))
+    # عدد بصمات آخر الأسئلة المستوردة التي يُقارن بها كل سؤال جديد أثناء الاستيراد
+    IMPORT_NEAR_DUPLICATE_WINDOW = int(os.getenv('IMPORT_NEAR_DUPLICATE_WINDOW', 20000))
     
     # إعدادات الخادم
     HOST = os.getenv('HOST', '127.0.0.1')
@@ -0,0 +1,78 @@
+# db_utils.py
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+
+def _greatest(dialect: str, stored, new):
+    """أكبر القيمتين، والجديدة إن كانت المخزنة NULL."""
+    greatest = db.func.max if dialect == 'sqlite' else db.func.greatest
+    return greatest(db.func.coalesce(stored, new), new)
+
+
+def upsert_rows(table, rows: List[Dict], key_columns: Sequence[str],
+                increment_columns: Iterable[str] = (), set_columns: Iterable[str] = (),
+                max_columns: Iterable[str] = ()) -> None:
+    """إدراج دفعة صفوف أو تحديثها عند تعارض المفتاح في جملة واحدة.
+
+    أعمدة increment_columns تُجمع مع القيمة المخزنة، وأعمدة set_columns
+    تُستبدل، وأعمدة max_columns تأخذ أكبر القيمتين. تُنفَّذ ضمن المعاملة
+    الحالية دون commit.
+    """
+    if not rows:
+        return
+    increment_columns = list(increment_columns)
+    set_columns = list(set_columns)
+    max_columns = list(max_columns)
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table)
+        updates = {col: table.c[col] + stmt.excluded[col] for col in increment_columns}
+        updates.update({col: stmt.excluded[col] for col in set_columns})
+        updates.update({col: _greatest(dialect, table.c[col], stmt.excluded[col]) for col in max_columns})
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=updates)
+        db.session.execute(stmt, rows)
+        return
+
+    # مسار عام لبقية قواعد البيانات: تحديث ثم إدراج ما لم يُحدَّث
+    for row in rows:
+        condition = [table.c[col] == row[col] for col in key_columns]
+        values = {col: table.c[col] + row[col] for col in increment_columns}
+        values.update({col: row[col] for col in set_columns})
+        values.update({col: _greatest(dialect, table.c[col], row[col]) for col in max_columns})
+        result = db.session.execute(table.update().where(*condition).values(**values))
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(**row))
+
+
+def insert_missing(table, rows: List[Dict], key_columns: Sequence[str]) -> List[Tuple]:
+    """إدراج دفعة صفوف مع تجاوز ما يتعارض مفتاحه مع صف مخزن.
+
+    الصف الذي سبق إليه طلب متزامن يبقى كما هو بدل رفع IntegrityError.
+    تعاد مفاتيح الصفوف المدرجة فعلًا، وتُنفَّذ ضمن المعاملة الحالية دون commit.
+    """
+    if not rows:
+        return []
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(table).on_conflict_do_nothing(index_elements=list(key_columns))\
+            .returning(*(table.c[col] for col in key_columns))
+        return [tuple(row) for row in db.session.execute(stmt, rows)]
+
+    # مسار عام لبقية قواعد البيانات: كل صف في نقطة حفظ مستقلة
+    inserted = []
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**row))
+        except IntegrityError:
+            continue
+        inserted.append(tuple(row[col] for col in key_columns))
+    return inserted
@@ -1,16 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from flask_migrate import Migrate
 import os
 import requests
 import json
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
 from flask import Flask
 
+import metrics
+from ai_client import backoff_delay, get_ai_client
+from circuit_breaker import AIUnavailableError
+from json_stream import salvage_objects
+
 # تهيئة إضافات Flask
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 login_manager = LoginManager()
+migrate = Migrate()
 
 class AIError(Exception):
     """فئة استثناء مخصصة لأخطاء الذكاء الاصطناعي"""
@@ -25,7 +31,6 @@ class AIIntegration:
 
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv('DEEPSEEK_API_KEY')
-        self.base_url = "https://api.deepseek.com/v1"
         self.max_retries = 3
         self._validate_initial_config()
 
@@ -41,16 +46,53 @@ class AIIntegration:
             raise RuntimeError("لم يتم العثور على DEEPSEEK_API_KEY في تكوين التطبيق")
 
     def generate_quiz(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """توليد أسئلة الاختبار"""
-        prompt = self._build_prompt(params)
+        """توليد أسئلة الاختبار
+
+        عند نقص الأسئلة في الرد يُطلب الباقي فقط، وبين المحاولات الفاشلة
+        تراجع أسي مع عشوائية.
+        """
+        count = int(params.get('count', 10))
+        labels = metrics.ai_labels('quiz', params)
+        result = None
         for attempt in range(self.max_retries):
+            if attempt:
+                metrics.AI_RETRIES.inc(**labels)
+                time.sleep(backoff_delay(attempt - 1))
+
+            deficit_params = dict(params)
+            if result is not None:
+                deficit_params['count'] = count - len(result['questions'])
+                deficit_params['exclude'] = [
+                    q.get('question_text') for q in result['questions'] if isinstance(q, dict)
+                ]
             try:
-                return self._send_request(prompt)
+                data = self._send_request(self._build_prompt(deficit_params), labels)
             except AIError as e:
-                if attempt == self.max_retries - 1:
+                unavailable = isinstance(e.__cause__, AIUnavailableError)
+                if result is None and (unavailable or attempt == self.max_retries - 1):
                     raise
+                if unavailable:
+                    break
                 continue
-        raise AIError("فشل بعد محاولات متعددة")
+
+            if result is None:
+                if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+                    return data
+                result = data
+                received = len(result['questions'])
+            elif isinstance(data, dict):
+                received = len(data.get('questions') or [])
+                result['questions'].extend(data.get('questions') or [])
+            else:
+                received = 0
+            metrics.AI_QUESTIONS_ACCEPTED.inc(received, **labels)
+            if len(result['questions']) >= count:
+                result['questions'] = result['questions'][:count]
+                return result
+
+        if result is None:
+            raise AIError("فشل بعد محاولات متعددة")
+        return result
 
     def _build_prompt(self, params: Dict[str, Any]) -> str:
         """بناء نص الطلب المخصص"""
@@ -61,11 +103,15 @@ class AIIntegration:
             params.get('sub_topic', '')
         ]
         hierarchy = " → ".join(filter(None, levels))
+        exclude = [text for text in params.get('exclude') or [] if text]
+        avoid = ''
+        if exclude:
+            avoid = "\n        لا تكرر الأسئلة التالية:\n" + "\n".join(f"        - {text}" for text in exclude)
 
         return f"""
         أنت معلم خبير في {hierarchy}.
         المطلوب: إنشاء {params.get('count', 10)} أسئلة اختيار من متعدد
-        مستوى الصعوبة: {params.get('difficulty', 'متوسط')}
+        مستوى الصعوبة: {params.get('difficulty', 'متوسط')}{avoid}
 
         المواصفات:
         - كل سؤال يجب أن يكون واضحًا ومحددًا
@@ -74,14 +120,21 @@ class AIIntegration:
         - التنسيق النهائي: JSON
         """
 
-    def _send_request(self, prompt: str) -> Dict[str, Any]:
-        """إرسال الطلب إلى واجهة API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
+    def generate_many(self, params_list: List[Dict[str, Any]]) -> List[Any]:
+        """توليد عدة اختبارات بالتوازي عبر العميل المشترك.
+
+        تُعاد النتائج بترتيب المدخلات، ويحل كائن AIError محل أي طلب فشل.
+        """
+        def run(params):
+            try:
+                return self.generate_quiz(params)
+            except AIError as e:
+                return e
+        return get_ai_client().map(run, params_list)
 
+    def _send_request(self, prompt: str, labels: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """إرسال الطلب إلى واجهة API"""
+        labels = labels or metrics.ai_labels('quiz')
         data = {
             "model": "deepseek-chat",
             "messages": [{"role": "user", "content": prompt}],
@@ -90,15 +143,18 @@ class AIIntegration:
         }
 
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                json=data,
-                headers=headers,
-                timeout=15
-            )
-            response.raise_for_status()
-            return self._parse_response(response.json())
+            response = get_ai_client().chat(data, self.api_key, read_timeout=15, labels=labels)
+            response_data = response.json()
+            if isinstance(response_data, dict):
+                metrics.record_usage(labels, response_data.get('usage'))
+            return self._parse_response(response_data, labels)
 
+        except AIUnavailableError as e:
+            raise AIError(
+                message="AI Service Unavailable",
+                status_code=503,
+                details=str(e)
+            ) from e
         except requests.exceptions.HTTPError as e:
             raise AIError(
                 message=f"HTTP Error {e.response.status_code}",
@@ -112,12 +168,28 @@ class AIIntegration:
                 details=str(e)
             )
 
-    def _parse_response(self, response_data: Dict) -> Dict:
-        """تحليل الاستجابة من API"""
+    def _parse_response(self, response_data: Dict, labels: Optional[Dict[str, str]] = None) -> Dict:
+        """تحليل الاستجابة من API مع إنقاذ الأسئلة المكتملة من الرد المقطوع"""
+        labels = labels or metrics.ai_labels('quiz')
         try:
             content = response_data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as e:
+            metrics.AI_PARSE_FAILURES.inc(kind='response', **labels)
+            raise AIError(
+                message="Invalid API Response",
+                status_code=500,
+                details=f"Parsing failed: {str(e)}"
+            )
+        try:
             return json.loads(content)
-        except (KeyError, json.JSONDecodeError) as e:
+        except json.JSONDecodeError as e:
+            questions, errors = salvage_objects(content)
+            metrics.AI_PARSE_FAILURES.inc(kind='json', **labels)
+            if errors:
+                metrics.AI_PARSE_FAILURES.inc(errors, kind='object', **labels)
+            if questions:
+                return {'questions': questions}
+            metrics.AI_PARSE_FAILURES.inc(kind='no_objects', **labels)
             raise AIError(
                 message="Invalid API Response",
                 status_code=500,
@@ -0,0 +1,104 @@
+# generation_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from arabic_text import normalize_text
+from config import Config
+from extensions import db
+from question_bank import fetch_from_bank, normalize_difficulty, question_to_dict, save_questions
+
+
+class TTLCache:
+    """ذاكرة مؤقتة محدودة الحجم تطرد الأقدم استخدامًا وتُسقط المنتهي صلاحيته."""
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cache_key(params: Dict[str, Any]) -> Tuple[str, str, str]:
+    """مفتاح موحد لمعاملات التوليد (المادة، الموضوع، الصعوبة)."""
+    return (
+        normalize_text(params.get('category', '')),
+        normalize_text(params.get('topic', '')),
+        normalize_difficulty(params.get('difficulty'))
+    )
+
+
+generation_cache = TTLCache(max_size=Config.GENERATION_CACHE_SIZE, ttl=Config.GENERATION_CACHE_TTL)
+
+
+def get_or_generate(params: Dict[str, Any], count: int,
+                    generate: Callable[[Dict[str, Any], int], List[Dict]]) -> Tuple[List[Dict], Dict[str, int]]:
+    """تقديم الأسئلة من الذاكرة المؤقتة ثم من البنك، وتوليد النقص فقط.
+
+    الأسئلة المولدة تُحفظ في البنك بمصدر 'ai' بعد إزالة المكرر. تعاد
+    الأسئلة مع عدد ما جاء من كل مصدر.
+    """
+    key = cache_key(params)
+    cached = generation_cache.get(key)
+    if cached is not None and len(cached) >= count:
+        return cached[:count], {'cache': count}
+
+    bucket = {
+        'category': params['category'],
+        'topic': params['topic'],
+        'difficulty': normalize_difficulty(params.get('difficulty'))
+    }
+    questions = [
+        question_to_dict(question)
+        for question in fetch_from_bank(bucket['category'], bucket['topic'], bucket['difficulty'], count)
+    ]
+    sources = {'bank': len(questions)}
+
+    shortfall = count - len(questions)
+    if shortfall > 0:
+        generated = [dict(question, **bucket) for question in generate(bucket, shortfall)]
+        known_ids = {question['id'] for question in questions}
+        saved, _ = save_questions(generated, source='ai')
+        stored = []
+        for row in saved:
+            # المكرر في الدفعة أو ما يشبه سؤالًا مقدمًا يقابل صفًا سبق تقديمه
+            if row.id not in known_ids:
+                known_ids.add(row.id)
+                stored.append(question_to_dict(row))
+        # التحويل قبل الـ commit: بعده تنتهي صلاحية الصفوف ويُعاد تحميل كل منها باستعلام
+        db.session.commit()
+        questions.extend(stored)
+        sources['ai'] = len(stored)
+
+    generation_cache.put(key, questions)
+    return questions[:count], sources
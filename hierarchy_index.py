@@ -0,0 +1,79 @@
+# hierarchy_index.py
+"""فهرس مسطّح لشجرة المواد يُبنى مرة واحدة عند تحميل التطبيق."""
+import hashlib
+import json
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+from hierarchy import SUBJECT_TREE
+
+Path = Tuple[str, ...]
+
+LEVELS = ('subject', 'specialization', 'topic', 'sub_topic')
+
+
+def _walk(node, prefix: Path):
+    """توليد كل المسارات الجزئية مع علامة تدل على كون المسار ورقة."""
+    if isinstance(node, dict):
+        for name, child in node.items():
+            path = prefix + (name,)
+            is_leaf = not child
+            yield path, is_leaf
+            if not is_leaf:
+                yield from _walk(child, path)
+    else:
+        for name in node:
+            yield prefix + (name,), True
+
+
+def _compile(tree) -> Tuple[FrozenSet[Path], Tuple[Path, ...]]:
+    paths, leaves = set(), []
+    for path, is_leaf in _walk(tree, ()):
+        paths.add(path)
+        if is_leaf:
+            leaves.append(path)
+    return frozenset(paths), tuple(leaves)
+
+
+def _index_children(tree) -> Dict[Path, Tuple[str, ...]]:
+    children = {}
+    for path, _ in _walk(tree, ()):
+        children.setdefault(path[:-1], []).append(path[-1])
+    return {prefix: tuple(names) for prefix, names in children.items()}
+
+
+PATHS, LEAF_PATHS = _compile(SUBJECT_TREE)
+CHILDREN = _index_children(SUBJECT_TREE)
+SUBJECTS = tuple(SUBJECT_TREE.keys())
+# كل الأسماء تحت كل مادة في أي مستوى، لحصر القيم الحرة القادمة من الطلبات
+SUBJECT_NAMES: Dict[str, FrozenSet[str]] = {
+    subject: frozenset(path[-1] for path in PATHS if len(path) > 1 and path[0] == subject)
+    for subject in SUBJECTS
+}
+
+# جسم JSON جاهز للإرسال مع بصمة ثابتة تُستخدم كـ ETag ومعامل إصدار للرابط
+TREE_JSON = json.dumps(SUBJECT_TREE, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+TREE_ETAG = hashlib.sha256(TREE_JSON).hexdigest()[:32]
+
+
+def is_valid_path(values: Iterable[str]) -> bool:
+    """التحقق من مسار (مع تجاهل المستويات الفارغة) في زمن ثابت."""
+    path = tuple(value for value in values if value)
+    return not path or path in PATHS
+
+
+def is_known_topic(subject: str, topic: str) -> bool:
+    """هل topic اسم في أي مستوى تحت المادة subject."""
+    return topic in SUBJECT_NAMES.get(subject, ())
+
+
+def child_names(prefix: Iterable[str]) -> Tuple[str, ...]:
+    """أسماء المستوى التالي تحت المسار المعطى بترتيب الشجرة."""
+    return CHILDREN.get(tuple(prefix), ())
+
+
+def leaf_paths(prefix: Path = ()) -> Tuple[Path, ...]:
+    """كل المسارات المنتهية بورقة، مع تصفية اختيارية ببادئة."""
+    if not prefix:
+        return LEAF_PATHS
+    size = len(prefix)
+    return tuple(path for path in LEAF_PATHS if path[:size] == prefix)
@@ -0,0 +1,130 @@
+# instrumentation.py
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from flask import Flask, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram(
+    'quiz_http_request_duration_seconds', 'زمن معالجة الطلب حسب المسار',
+    ('endpoint', 'method', 'status'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_DB_SECONDS = metrics.histogram(
+    'quiz_http_request_db_seconds', 'زمن تنفيذ جمل SQL داخل الطلب', ('endpoint',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+REQUEST_STATEMENTS = metrics.histogram(
+    'quiz_http_request_statements', 'عدد جمل SQL المنفذة في الطلب', ('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+
+
+class RequestStats:
+    """ما يُجمع لطلب واحد: عدد الجمل وزمنها، ونصوصها عند تفعيل سجل الطلبات البطيئة."""
+
+    __slots__ = ('start', 'statements', 'db_time', 'status', 'captured', 'capture_limit')
+
+    def __init__(self, capture_limit: int = 0):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.status = 500
+        self.capture_limit = capture_limit
+        self.captured: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.db_time += elapsed
+        if len(self.captured) < self.capture_limit:
+            self.captured.append((elapsed, statement))
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """إحصاءات الطلب الجاري (أو None خارج الطلبات)."""
+    return _current.get()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    start = getattr(context, '_instrumentation_start', None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+class RequestInstrumentation:
+    """قياس زمن كل مسار وعدد جمل SQL وزمنها، مع سجل اختياري للطلبات البطيئة.
+
+    الطلب يُقاس من before_request حتى teardown_request، فيشمل زمن
+    التدفق في الاستجابات المتدفقة (stream_with_context). معاملات الجمل
+    لا تُسجل أبدًا لأنها قد تحتوي بيانات المستخدمين.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.enabled = True
+        self.slow_threshold = 0.0
+        self.capture_limit = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        if not app.config.get('REQUEST_METRICS_ENABLED', True):
+            return
+        self.slow_threshold = app.config.get('SLOW_REQUEST_THRESHOLD', 0)
+        self.capture_limit = app.config.get('SLOW_REQUEST_MAX_STATEMENTS', 50) if self.slow_threshold else 0
+        app.before_request(self._start)
+        app.after_request(self._after)
+        app.teardown_request(self._finish)
+
+    def _start(self) -> None:
+        if self.enabled:
+            _current.set(RequestStats(self.capture_limit))
+
+    def _after(self, response):
+        stats = _current.get()
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    def _finish(self, exc=None) -> None:
+        stats = _current.get()
+        if stats is None:
+            return
+        _current.set(None)
+        elapsed = time.perf_counter() - stats.start
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=stats.status)
+        REQUEST_DB_SECONDS.observe(stats.db_time, endpoint=endpoint)
+        REQUEST_STATEMENTS.observe(stats.statements, endpoint=endpoint)
+        if self.slow_threshold and elapsed >= self.slow_threshold:
+            self._log_slow(endpoint, elapsed, stats)
+
+    def _log_slow(self, endpoint: str, elapsed: float, stats: RequestStats) -> None:
+        lines = [
+            f"طلب بطيء {request.method} {request.path} ({endpoint}): {elapsed * 1000:.1f}ms، "
+            f"{stats.statements} جملة SQL في {stats.db_time * 1000:.1f}ms"
+        ]
+        lines.extend(f"  {duration * 1000:.2f}ms {' '.join(sql.split())}" for duration, sql in stats.captured)
+        if stats.statements > len(stats.captured):
+            lines.append(f"  ... و{stats.statements - len(stats.captured)} جمل أخرى")
+        logger.warning('\n'.join(lines))
+
+
+instrumentation = RequestInstrumentation()
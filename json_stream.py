@@ -0,0 +1,73 @@
+# json_stream.py
+import json
+from typing import Dict, List, Tuple
+
+
+class ObjectStreamParser:
+    """محلل JSON تزايدي يُخرج كل كائن داخل مصفوفة فور اكتمال قوسه.
+
+    يُغذّى بأجزاء النص كما تصل من الاستجابة المتدفقة، ويتتبع الأقواس
+    والنصوص وعلامات الهروب دون إعادة فحص ما سبق. أي نص خارج JSON
+    (مثل ```json) يتم تجاهله.
+    """
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._buffer: List[str] = []
+        self._capture_depth = None
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[Dict]:
+        completed = []
+        for char in chunk:
+            capturing = self._capture_depth is not None
+            if capturing:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+            elif char in '{[':
+                if char == '{' and not capturing and self._stack and self._stack[-1] == '[':
+                    self._capture_depth = len(self._stack)
+                    self._buffer = [char]
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if capturing and len(self._stack) == self._capture_depth:
+                    self._capture_depth = None
+                    obj = self._decode(''.join(self._buffer))
+                    self._buffer = []
+                    if obj is not None:
+                        completed.append(obj)
+        return completed
+
+    def _decode(self, text: str):
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            self.errors += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def salvage_objects(text: str) -> Tuple[List[Dict], int]:
+    """استخراج كل كائن مكتمل داخل مصفوفة من رد مقطوع أو معطوب.
+
+    يعاد عدد الكائنات التي تعذر تحليلها أيضًا. الكائن الأخير غير المكتمل
+    في الرد المقطوع يُتجاهل ببساطة.
+    """
+    parser = ObjectStreamParser()
+    return parser.feed(text or ''), parser.errors
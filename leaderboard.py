@@ -0,0 +1,85 @@
+# leaderboard.py
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy.orm import joinedload
+
+from db_utils import upsert_rows
+from extensions import db
+from models import LeaderboardEntry, QuizResult
+
+PERIODS = ('all', 'week', 'month')
+_ALL_TIME_BUCKET = date(1970, 1, 1)
+
+
+def bucket_start(period: str, moment: datetime) -> date:
+    """بداية الفترة التي يقع فيها التاريخ المعطى."""
+    day = moment.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return _ALL_TIME_BUCKET
+
+
+def record_result(user_id: int, score: int, taken_at: datetime) -> None:
+    """إضافة نتيجة اختبار إلى مجاميع لوحة المتصدرين ضمن المعاملة الحالية."""
+    now = datetime.now(timezone.utc)
+    rows = [{
+        'user_id': user_id,
+        'period': period,
+        'bucket_start': bucket_start(period, taken_at),
+        'total_score': score,
+        'quiz_count': 1,
+        'updated_at': now
+    } for period in PERIODS]
+    upsert_rows(
+        LeaderboardEntry.__table__, rows,
+        key_columns=('period', 'bucket_start', 'user_id'),
+        increment_columns=('total_score', 'quiz_count'),
+        set_columns=('updated_at',)
+    )
+
+
+def top_entries(period: str = 'all', limit: int = 10, moment: Optional[datetime] = None) -> List[LeaderboardEntry]:
+    """أعلى المستخدمين نقاطًا في الفترة الحالية، قراءة مباشرة من الفهرس."""
+    if period not in PERIODS:
+        raise ValueError(f"فترة غير معروفة: {period}")
+    moment = moment or datetime.now(timezone.utc)
+    return LeaderboardEntry.query.options(joinedload(LeaderboardEntry.user)).filter_by(
+        period=period,
+        bucket_start=bucket_start(period, moment)
+    ).order_by(LeaderboardEntry.total_score.desc()).limit(limit).all()
+
+
+def rebuild_leaderboard(batch_size: int = 5000) -> int:
+    """إعادة بناء جدول لوحة المتصدرين بالكامل من QuizResult.
+
+    تُقرأ النتائج على دفعات وتُجمع في الذاكرة حسب (الفترة، بداية الفترة،
+    المستخدم) ثم تُدرج المجاميع دفعة واحدة. يعيد عدد الصفوف المكتوبة.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    results = db.session.query(
+        QuizResult.user_id, QuizResult.score, QuizResult.date_taken
+    ).execution_options(yield_per=batch_size)
+    for user_id, score, taken_at in results:
+        for period in PERIODS:
+            entry = totals[(period, bucket_start(period, taken_at), user_id)]
+            entry[0] += score
+            entry[1] += 1
+
+    now = datetime.now(timezone.utc)
+    db.session.execute(LeaderboardEntry.__table__.delete())
+    rows = [{
+        'user_id': user_id,
+        'period': period,
+        'bucket_start': start,
+        'total_score': score,
+        'quiz_count': count,
+        'updated_at': now
+    } for (period, start, user_id), (score, count) in totals.items()]
+    for offset in range(0, len(rows), batch_size):
+        db.session.execute(LeaderboardEntry.__table__.insert(), rows[offset:offset + batch_size])
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,246 @@
+# metrics.py
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from hierarchy_index import SUBJECTS, is_known_topic
+from question_schema import DIFFICULTY_LEVELS
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name) or '') for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.type_name}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # لكل مجموعة تسميات: عدادات الحاويات (غير تراكمية)، المجموع، العدد
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"المقياس {metric.name} مسجل مسبقًا")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """دالة تُستدعى قبل كل عرض لتحديث المقاييس المحسوبة عند الطلب (gauges)."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """كل المقاييس بصيغة Prometheus النصية (الإصدار 0.0.4)."""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            collector()
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def counter(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames: Iterable[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+# --- مقاييس طلبات الذكاء الاصطناعي ---
+
+AI_LABELS = ('operation', 'category', 'topic', 'difficulty')
+# قيمة التسمية لكل مادة أو موضوع أو صعوبة خارج القيم المعروفة
+OTHER_LABEL = 'other'
+
+AI_REQUEST_SECONDS = histogram(
+    'quiz_ai_request_duration_seconds', 'زمن طلبات DeepSeek حتى اكتمال الرد', AI_LABELS
+)
+AI_REQUESTS = counter(
+    'quiz_ai_requests_total', 'طلبات DeepSeek حسب النتيجة', ('operation', 'outcome')
+)
+AI_TOKENS = counter(
+    'quiz_ai_tokens_total', 'الرموز المستهلكة حسب النوع (prompt/completion)', AI_LABELS + ('kind',)
+)
+AI_RETRIES = counter(
+    'quiz_ai_retries_total', 'إعادات محاولة التوليد', AI_LABELS
+)
+AI_QUESTIONS_ACCEPTED = counter(
+    'quiz_ai_questions_accepted_total', 'الأسئلة الصالحة المقبولة من ردود الذكاء الاصطناعي', AI_LABELS
+)
+AI_VALIDATION_REJECTS = counter(
+    'quiz_ai_validation_rejects_total', 'الأسئلة المرفوضة حسب سبب التحقق', AI_LABELS + ('reason',)
+)
+AI_PARSE_FAILURES = counter(
+    'quiz_ai_parse_failures_total', 'ردود أو كائنات تعذر تحليلها حسب النوع', AI_LABELS + ('kind',)
+)
+AI_BREAKER_OPEN = gauge(
+    'quiz_ai_breaker_open', 'حالة قاطع الدائرة (1 مفتوح، 0.5 نصف مفتوح، 0 مغلق)'
+)
+AI_CONCURRENCY_LIMIT = gauge(
+    'quiz_ai_concurrency_limit', 'حد التزامن المتكيف الحالي لطلبات الذكاء الاصطناعي'
+)
+AI_IN_FLIGHT = gauge(
+    'quiz_ai_in_flight', 'طلبات الذكاء الاصطناعي الجارية'
+)
+
+
+def ai_labels(operation: str, params: Optional[Dict] = None) -> Dict[str, str]:
+    """تسميات المقاييس لطلب توليد: العملية والمادة والموضوع والصعوبة.
+
+    القيم تأتي من جسم الطلب، فتُحصر في مواد SUBJECT_TREE وأسمائها ومستويات
+    الصعوبة المعروفة، وما سواها OTHER_LABEL، حتى يبقى عدد السلاسل محدودًا.
+    """
+    # استيراد متأخر: question_bank يستورد extensions الذي يستورد هذه الوحدة
+    from question_bank import normalize_difficulty
+
+    params = params or {}
+    category = params.get('category') or params.get('subject') or ''
+    topic = params.get('topic') or ''
+    difficulty = params.get('difficulty') or ''
+    if category and (not isinstance(category, str) or category not in SUBJECTS):
+        category = OTHER_LABEL
+    if topic and not (isinstance(topic, str) and is_known_topic(category, topic)):
+        topic = OTHER_LABEL
+    if difficulty:
+        difficulty = normalize_difficulty(str(difficulty))
+        if difficulty not in DIFFICULTY_LEVELS:
+            difficulty = OTHER_LABEL
+    return {
+        'operation': operation,
+        'category': category,
+        'topic': topic,
+        'difficulty': difficulty
+    }
+
+
+def record_usage(labels: Dict[str, str], usage: Optional[Dict]) -> None:
+    """تسجيل كتلة usage من رد DeepSeek إن وُجدت."""
+    if not usage:
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = usage.get(f'{kind}_tokens')
+        if tokens:
+            AI_TOKENS.inc(tokens, kind=kind, **labels)
@@ -0,0 +1,40 @@
+"""Add user_progress_day for weak topics over a time window.
+
+Revision ID: 0a6d2e9c4b18
+Revises: f3c8a1d5b702
+Create Date: 2026-10-18 23:40:27.118904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6d2e9c4b18'
+down_revision = 'f3c8a1d5b702'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # لا تواريخ للعدادات التراكمية السابقة، فالجدول يبدأ فارغًا
+    op.create_table('user_progress_day',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('topic', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('correct_count', sa.Integer(), nullable=False),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_progress_day', schema=None) as batch_op:
+        batch_op.create_index('uq_user_progress_day', ['user_id', 'day', 'category', 'topic'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user_progress_day', schema=None) as batch_op:
+        batch_op.drop_index('uq_user_progress_day')
+
+    op.drop_table('user_progress_day')
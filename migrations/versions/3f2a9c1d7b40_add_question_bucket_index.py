@@ -0,0 +1,26 @@
+"""Add composite index on question (category, topic, difficulty).
+
+Revision ID: 3f2a9c1d7b40
+Revises: 161515585714
+Create Date: 2026-10-18 09:12:05.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b40'
+down_revision = '161515585714'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index('ix_question_bucket', ['category', 'topic', 'difficulty'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_bucket')
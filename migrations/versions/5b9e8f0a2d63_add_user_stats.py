@@ -0,0 +1,33 @@
+"""Add user_stats table.
+
+Revision ID: 5b9e8f0a2d63
+Revises: c7e05b3f19a8
+Create Date: 2026-10-18 15:22:10.641877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9e8f0a2d63'
+down_revision = 'c7e05b3f19a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_quizzes', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('best_score', sa.Integer(), nullable=False),
+    sa.Column('last_taken', sa.DateTime(), nullable=True),
+    sa.Column('recent_scores', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_stats')
@@ -0,0 +1,76 @@
+"""Add unique index on user_progress (user_id, category, topic).
+
+Revision ID: 8d41e6a2c915
+Revises: 3f2a9c1d7b40
+Create Date: 2026-10-18 11:40:27.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41e6a2c915'
+down_revision = '3f2a9c1d7b40'
+branch_labels = None
+depends_on = None
+
+
+user_progress = sa.table(
+    'user_progress',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('category', sa.String),
+    sa.column('topic', sa.String),
+    sa.column('correct_count', sa.Integer),
+    sa.column('total_count', sa.Integer),
+    sa.column('last_study_tip', sa.Text),
+    sa.column('last_updated', sa.DateTime),
+)
+
+
+def merge_duplicates():
+    """دمج الصفوف المكررة لكل (user_id, category, topic) في أقدمها قبل إنشاء الفهرس الفريد.
+
+    تُجمع العدادات، ويُحتفظ بأحدث last_updated وآخر نصيحة دراسة غير فارغة.
+    """
+    bind = op.get_bind()
+    key = (user_progress.c.user_id, user_progress.c.category, user_progress.c.topic)
+    duplicates = bind.execute(
+        sa.select(*key).group_by(*key).having(sa.func.count() > 1)
+    ).all()
+    for user_id, category, topic in duplicates:
+        rows = bind.execute(
+            sa.select(user_progress)
+            .where(user_progress.c.user_id == user_id,
+                   user_progress.c.category == category,
+                   user_progress.c.topic == topic)
+            .order_by(user_progress.c.id)
+        ).all()
+        keeper = rows[0]
+        updated = [row.last_updated for row in rows if row.last_updated is not None]
+        tips = [row.last_study_tip for row in sorted(
+            rows, key=lambda row: (row.last_updated is not None, row.last_updated or 0, row.id)
+        ) if row.last_study_tip]
+        bind.execute(
+            user_progress.update().where(user_progress.c.id == keeper.id).values(
+                correct_count=sum(row.correct_count or 0 for row in rows),
+                total_count=sum(row.total_count or 0 for row in rows),
+                last_updated=max(updated) if updated else None,
+                last_study_tip=tips[-1] if tips else None,
+            )
+        )
+        bind.execute(
+            user_progress.delete().where(user_progress.c.id.in_([row.id for row in rows[1:]]))
+        )
+
+
+def upgrade():
+    merge_duplicates()
+    with op.batch_alter_table('user_progress', schema=None) as batch_op:
+        batch_op.create_index('uq_user_progress_topic', ['user_id', 'category', 'topic'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user_progress', schema=None) as batch_op:
+        batch_op.drop_index('uq_user_progress_topic')
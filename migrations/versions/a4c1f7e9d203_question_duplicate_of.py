@@ -0,0 +1,28 @@
+"""Add duplicate_of_id to question for near-duplicate clustering.
+
+Revision ID: a4c1f7e9d203
+Revises: e2a7d4c8b6f1
+Create Date: 2026-10-18 19:20:41.508213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c1f7e9d203'
+down_revision = 'e2a7d4c8b6f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_question_duplicate_of', 'question', ['duplicate_of_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_question_duplicate_of', type_='foreignkey')
+        batch_op.drop_column('duplicate_of_id')
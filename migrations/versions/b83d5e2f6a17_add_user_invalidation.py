@@ -0,0 +1,29 @@
+"""Add user_invalidation for cross-process user cache invalidation.
+
+Revision ID: b83d5e2f6a17
+Revises: a4c1f7e9d203
+Create Date: 2026-10-18 19:45:12.284517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83d5e2f6a17'
+down_revision = 'a4c1f7e9d203'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_invalidation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_invalidation')
@@ -0,0 +1,41 @@
+"""Add leaderboard_entry aggregate table.
+
+Revision ID: c7e05b3f19a8
+Revises: 8d41e6a2c915
+Create Date: 2026-10-18 14:05:51.270318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e05b3f19a8'
+down_revision = '8d41e6a2c915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('leaderboard_entry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('bucket_start', sa.Date(), nullable=False),
+    sa.Column('total_score', sa.Integer(), nullable=False),
+    sa.Column('quiz_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.create_index('uq_leaderboard_bucket_user', ['period', 'bucket_start', 'user_id'], unique=True)
+        batch_op.create_index('ix_leaderboard_rank', ['period', 'bucket_start', 'total_score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaderboard_rank')
+        batch_op.drop_index('uq_leaderboard_bucket_user')
+
+    op.drop_table('leaderboard_entry')
@@ -0,0 +1,32 @@
+"""Widen user.password_hash to fit scrypt and bcrypt hashes.
+
+Revision ID: d5f1a8c3e942
+Revises: b83d5e2f6a17
+Create Date: 2026-10-18 20:05:37.613902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a8c3e942'
+down_revision = 'b83d5e2f6a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=255),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=128),
+               existing_nullable=True)
@@ -0,0 +1,30 @@
+"""Add source and content_hash to question.
+
+Revision ID: e2a7d4c8b6f1
+Revises: 5b9e8f0a2d63
+Create Date: 2026-10-18 16:48:33.115902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7d4c8b6f1'
+down_revision = '5b9e8f0a2d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source', sa.String(length=20), nullable=False, server_default='manual'))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('uq_question_content_hash', ['content_hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index('uq_question_content_hash')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('source')
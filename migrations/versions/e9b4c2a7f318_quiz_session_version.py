@@ -0,0 +1,26 @@
+"""Add quiz_session.version for optimistic concurrency on answers.
+
+Revision ID: e9b4c2a7f318
+Revises: d5f1a8c3e942
+Create Date: 2026-10-18 21:10:44.519306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b4c2a7f318'
+down_revision = 'd5f1a8c3e942'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('quiz_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_session', schema=None) as batch_op:
+        batch_op.drop_column('version')
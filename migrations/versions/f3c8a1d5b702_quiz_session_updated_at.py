@@ -0,0 +1,29 @@
+"""Add quiz_session.updated_at to expire abandoned quizzes.
+
+Revision ID: f3c8a1d5b702
+Revises: e9b4c2a7f318
+Create Date: 2026-10-18 23:05:12.304117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d5b702'
+down_revision = 'e9b4c2a7f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # الصفوف الحالية تبقى NULL وتُقاس بـ created_at
+    with op.batch_alter_table('quiz_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_quiz_session_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_session_updated_at')
+        batch_op.drop_column('updated_at')
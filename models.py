@@ -6,7 +6,7 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     quiz_results = db.relationship('QuizResult', backref='user', lazy=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_admin = db.Column(db.Boolean, default=False)
@@ -34,6 +34,12 @@ class User(UserMixin, db.Model):
     def get(user_id):
         return getattr(User, 'id')
 
+class UserInvalidation(db.Model):
+    """تعديل على مستخدم تقرؤه العمليات الأخرى لإسقاط نسختها المخزنة منه"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.String(500), nullable=False)
@@ -46,6 +52,15 @@ class Question(db.Model):
     topic = db.Column(db.String(50), nullable=False)
     difficulty = db.Column(db.String(20), nullable=False, default='متوسط')
     explanation = db.Column(db.Text)
+    source = db.Column(db.String(20), nullable=False, default='manual')
+    content_hash = db.Column(db.String(64))
+    # السؤال الأصلي إذا كان هذا السؤال شبه مكرر له (يُستبعد من الاختبارات)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('question.id'))
+
+    __table_args__ = (
+        db.Index('ix_question_bucket', 'category', 'topic', 'difficulty'),
+        db.Index('uq_question_content_hash', 'content_hash', unique=True),
+    )
 
 class QuizResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -55,6 +70,46 @@ class QuizResult(db.Model):
     time_taken = db.Column(db.Integer)
     date_taken = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
 
+class UserStats(db.Model):
+    """إحصاءات مجمعة لنتائج المستخدم تُحدَّث عند كل إنهاء اختبار"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_quizzes = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer, nullable=False, default=0)
+    last_taken = db.Column(db.DateTime)
+    recent_scores = db.Column(db.JSON, nullable=False, default=list)
+
+    def rolling_average(self, window: int):
+        scores = (self.recent_scores or [])[-window:]
+        return round(sum(scores) / len(scores), 2) if scores else None
+
+    def to_dict(self):
+        return {
+            'total_quizzes': self.total_quizzes,
+            'average_score': round(self.score_sum / self.total_quizzes, 2) if self.total_quizzes else None,
+            'best_score': self.best_score,
+            'last_attempt': self.last_taken.isoformat() if self.last_taken else None,
+            'rolling_average_5': self.rolling_average(5),
+            'rolling_average_10': self.rolling_average(10),
+            'progress_level': User.calculate_progress_level(self.total_quizzes)
+        }
+
+class LeaderboardEntry(db.Model):
+    """مجموع نقاط المستخدم في فترة زمنية (كل الأوقات، أسبوع، شهر)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.Date, nullable=False)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    quiz_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    user = db.relationship('User', lazy=True)
+
+    __table_args__ = (
+        db.Index('uq_leaderboard_bucket_user', 'period', 'bucket_start', 'user_id', unique=True),
+        db.Index('ix_leaderboard_rank', 'period', 'bucket_start', 'total_score'),
+    )
+
 class UserProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -65,6 +120,25 @@ class UserProgress(db.Model):
     last_study_tip = db.Column(db.Text)
     last_updated = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        db.Index('uq_user_progress_topic', 'user_id', 'category', 'topic', unique=True),
+    )
+
+class UserProgressDay(db.Model):
+    """فروق UserProgress مجمعة حسب يوم تفريغها (UTC) لتحليل نافذة زمنية"""
+    __tablename__ = 'user_progress_day'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    topic = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    total_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('uq_user_progress_day', 'user_id', 'day', 'category', 'topic', unique=True),
+    )
+
 class QuizSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -72,7 +146,20 @@ class QuizSession(db.Model):
     session_data = db.Column(db.JSON, nullable=False)
     subject_path = db.Column(db.JSON, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    questions = db.relationship('QuizSessionQuestion', backref='quiz_session', lazy=True)
+    # آخر تغيير للجلسة؛ الجلسة الخاملة أكثر من ACTIVE_SESSION_TTL اختبار متروك
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # رقم النسخة للتزامن المتفائل: كل UPDATE أو DELETE عبر ORM مشروط بالنسخة
+    # المقروءة ويرفع StaleDataError إن سبقه طلب متزامن
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    questions = db.relationship(
+        'QuizSessionQuestion',
+        backref='quiz_session',
+        lazy=True,
+        order_by='QuizSessionQuestion.order',
+        cascade='all, delete-orphan'
+    )
+
+    __mapper_args__ = {'version_id_col': version}
 
 class QuizSessionQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -81,4 +168,5 @@ class QuizSessionQuestion(db.Model):
     order = db.Column(db.Integer, nullable=False)
     user_answer = db.Column(db.String(255), nullable=True)
     is_correct = db.Column(db.Boolean, default=False)
-    is_answered = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    is_answered = db.Column(db.Boolean, default=False)
+    question = db.relationship('Question', lazy=True)
\ No newline at end of file
@@ -0,0 +1,287 @@
+# near_duplicates.py
+import hashlib
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, inspect, update
+from sqlalchemy.orm import Session
+
+from arabic_text import normalize_text
+from config import Config
+from extensions import db
+from models import Question
+from question_pool import question_pool
+
+NUM_BINS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_BINS // BANDS
+SHINGLE_SIZE = 4
+# نطاق يشترك فيه عدد كبير من الأسئلة يمثل قالبًا شائعًا ('ما هي وظيفة ...')
+# لا تشابهًا فعليًا، فيُتجاهل عند البحث كما تُتجاهل كلمات التوقف
+MAX_BAND_CANDIDATES = 64
+
+_BIN_SHIFT = 64 - 6  # أعلى 6 بتات تحدد الخانة (64 خانة)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = _VALUE_MASK + 1
+
+TopicKey = Tuple[str, str]
+
+
+def shingles(question: Dict) -> set:
+    """مقاطع حرفية متداخلة من نص السؤال والخيارات بعد التوحيد.
+
+    الخيارات تُرتب قبل الدمج حتى لا يؤثر ترتيبها في التشابه.
+    """
+    options = sorted(normalize_text(question.get(f'option_{key}') or '') for key in 'abcd')
+    text = ' '.join([normalize_text(question.get('question_text') or '')] + options)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(question: Dict) -> array:
+    """بصمة MinHash بتبديل واحد (one-permutation hashing) مع ملء الخانات الفارغة.
+
+    تجزئة واحدة لكل مقطع بدلًا من 64 تجزئة، فيبقى الحساب في حدود أجزاء
+    من المللي ثانية.
+    """
+    sig = [_EMPTY] * NUM_BINS
+    for shingle in shingles(question):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot = value >> _BIN_SHIFT
+        value &= _VALUE_MASK
+        if value < sig[slot]:
+            sig[slot] = value
+    # الخانة الفارغة تأخذ قيمة أقرب خانة ممتلئة بعدها (دورانيًا) مع إزاحة بالمسافة
+    filled = [slot for slot in range(NUM_BINS) if sig[slot] != _EMPTY]
+    if filled and len(filled) < NUM_BINS:
+        dense = list(sig)
+        for slot in range(NUM_BINS):
+            if sig[slot] == _EMPTY:
+                distance = next(d for d in range(1, NUM_BINS) if sig[(slot + d) % NUM_BINS] != _EMPTY)
+                dense[slot] = sig[(slot + distance) % NUM_BINS] + distance * _EMPTY
+        sig = dense
+    return array('Q', sig)
+
+
+def similarity(first: array, second: array) -> float:
+    """تقدير تشابه جاكارد من نسبة الخانات المتطابقة."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_BINS
+
+
+def _band_keys(sig: array) -> List[int]:
+    return [hash(tuple(sig[i:i + ROWS_PER_BAND])) for i in range(0, NUM_BINS, ROWS_PER_BAND)]
+
+
+class TopicIndex:
+    """فهرس LSH لأسئلة موضوع واحد: كل نطاق من البصمة يوجّه إلى معرّفات مرشحة."""
+
+    def __init__(self):
+        self.signatures: Dict[int, array] = {}
+        self.bands: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+
+    def add(self, qid: int, sig: array) -> None:
+        if qid in self.signatures:
+            return
+        self.signatures[qid] = sig
+        for band, key in zip(self.bands, _band_keys(sig)):
+            band.setdefault(key, []).append(qid)
+
+    def remove(self, qid: int) -> None:
+        sig = self.signatures.pop(qid, None)
+        if sig is None:
+            return
+        for band, key in zip(self.bands, _band_keys(sig)):
+            ids = band.get(key)
+            if ids and qid in ids:
+                ids.remove(qid)
+                if not ids:
+                    del band[key]
+
+    def find(self, sig: array, threshold: float) -> Optional[Tuple[int, float]]:
+        candidates = set()
+        for band, key in zip(self.bands, _band_keys(sig)):
+            ids = band.get(key, ())
+            if len(ids) <= MAX_BAND_CANDIDATES:
+                candidates.update(ids)
+        best = None
+        for qid in candidates:
+            score = similarity(sig, self.signatures[qid])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (qid, score)
+        return best
+
+
+class NearDuplicateIndex:
+    """فهرس الأسئلة شبه المكررة مقسّم حسب (المادة، الموضوع).
+
+    يُحمَّل كل موضوع عند أول استخدام من الأسئلة الأصلية فقط (غير المعلّمة
+    كمكررة)، ثم يُحدَّث مع كل إدراج أو حذف بعد الـ commit، ويُسقط الموضوع عند
+    تعديل أحد أسئلته.
+    """
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else Config.NEAR_DUPLICATE_THRESHOLD
+        self._topics: Dict[TopicKey, TopicIndex] = {}
+        self._lock = threading.Lock()
+
+    def _load_topic(self, key: TopicKey) -> TopicIndex:
+        category, topic = key
+        index = TopicIndex()
+        rows = db.session.query(
+            Question.id, Question.question_text,
+            Question.option_a, Question.option_b, Question.option_c, Question.option_d
+        ).filter_by(category=category, topic=topic, duplicate_of_id=None)
+        for row in rows:
+            index.add(row.id, signature(row._asdict()))
+        return index
+
+    def _get_topic(self, key: TopicKey) -> TopicIndex:
+        with self._lock:
+            index = self._topics.get(key)
+        if index is None:
+            index = self._load_topic(key)
+            with self._lock:
+                index = self._topics.setdefault(key, index)
+        return index
+
+    def find(self, question: Dict, sig: Optional[array] = None) -> Optional[Tuple[int, float]]:
+        """أقرب سؤال أصلي يتجاوز عتبة التشابه: (المعرّف، التشابه) أو None."""
+        index = self._get_topic((question.get('category'), question.get('topic')))
+        with self._lock:
+            return index.find(sig or signature(question), self.threshold)
+
+    def add(self, key: TopicKey, qid: int, sig: array) -> None:
+        with self._lock:
+            index = self._topics.get(key)
+            if index:
+                index.add(qid, sig)
+
+    def remove(self, key: TopicKey, qid: int) -> None:
+        with self._lock:
+            index = self._topics.get(key)
+            if index:
+                index.remove(qid)
+
+    def replace(self, topics: Dict[TopicKey, TopicIndex]) -> None:
+        with self._lock:
+            self._topics = topics
+
+    def invalidate(self, category: str = None, topic: str = None) -> None:
+        with self._lock:
+            if category is None:
+                self._topics.clear()
+            else:
+                self._topics.pop((category, topic), None)
+
+
+near_duplicate_index = NearDuplicateIndex()
+
+
+def recluster(batch_size: int = 1000, threshold: Optional[float] = None) -> Dict[str, int]:
+    """إعادة تجميع البنك كله: كل سؤال يُربط بأقدم سؤال يشبهه في موضوعه.
+
+    الأسئلة تُقرأ بالترتيب حسب المعرّف على دفعات، وتُكتب علامات
+    duplicate_of_id المتغيرة فقط بتحديث جماعي لكل دفعة.
+    """
+    threshold = threshold if threshold is not None else near_duplicate_index.threshold
+    topics: Dict[TopicKey, TopicIndex] = {}
+    stats = {'scanned': 0, 'duplicates': 0, 'changed': 0}
+    stmt = update(Question.__table__).where(Question.__table__.c.id == bindparam('qid'))\
+        .values(duplicate_of_id=bindparam('dup'))
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Question.id, Question.category, Question.topic, Question.duplicate_of_id,
+            Question.question_text, Question.option_a, Question.option_b,
+            Question.option_c, Question.option_d
+        ).filter(Question.id > last_id).order_by(Question.id).limit(batch_size).all()
+        if not rows:
+            break
+        changes = []
+        for row in rows:
+            stats['scanned'] += 1
+            topic_index = topics.setdefault((row.category, row.topic), TopicIndex())
+            sig = signature(row._asdict())
+            match = topic_index.find(sig, threshold)
+            duplicate_of = match[0] if match else None
+            if duplicate_of is None:
+                topic_index.add(row.id, sig)
+            else:
+                stats['duplicates'] += 1
+            if duplicate_of != row.duplicate_of_id:
+                changes.append({'qid': row.id, 'dup': duplicate_of})
+        if changes:
+            db.session.execute(stmt, changes)
+            stats['changed'] += len(changes)
+        db.session.commit()
+        last_id = rows[-1].id
+
+    # التحديث الجماعي لا يمر بأحداث ORM
+    question_pool.invalidate()
+    near_duplicate_index.replace(topics)
+    return stats
+
+
+# --- مزامنة الفهرس مع تغييرات جدول الأسئلة بعد الـ commit ---
+
+def _pending(session: Session) -> list:
+    return session.info.setdefault('near_duplicate_changes', [])
+
+
+_SIGNATURE_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d')
+_INDEXED_FIELDS = _SIGNATURE_FIELDS + ('category', 'topic', 'duplicate_of_id')
+
+
+def _as_dict(question: Question) -> Dict:
+    return {name: getattr(question, name) for name in _SIGNATURE_FIELDS}
+
+
+def stage_inserted(session: Session, question: Question) -> None:
+    """تسجيل سؤال مُدرج ليُضاف إلى الفهرس بعد الـ commit؛ يُستدعى مباشرة للإدراج عبر Core."""
+    if question.duplicate_of_id is None:
+        _pending(session).append(
+            ('add', (question.category, question.topic), question.id, signature(_as_dict(question)))
+        )
+
+
+@event.listens_for(Question, 'after_insert')
+def _question_inserted(mapper, connection, target):
+    stage_inserted(inspect(target).session, target)
+
+
+@event.listens_for(Question, 'after_delete')
+def _question_deleted(mapper, connection, target):
+    _pending(inspect(target).session).append(('remove', (target.category, target.topic), target.id, None))
+
+
+@event.listens_for(Question, 'after_update')
+def _question_updated(mapper, connection, target):
+    state = inspect(target)
+    changed = [name for name in _INDEXED_FIELDS if state.attrs[name].history.has_changes()]
+    if not changed:
+        return
+    # تعديل النص أو الخيارات أو علامة التكرار أو الموضوع يجعل بصمات الموضوع قديمة
+    old_key = tuple(
+        (state.attrs[name].history.deleted or [getattr(target, name)])[0]
+        for name in ('category', 'topic')
+    )
+    for key in {old_key, (target.category, target.topic)}:
+        _pending(state.session).append(('invalidate', key, target.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_index_changes(session):
+    for action, key, qid, sig in session.info.pop('near_duplicate_changes', []):
+        if action == 'add':
+            near_duplicate_index.add(key, qid, sig)
+        elif action == 'invalidate':
+            near_duplicate_index.invalidate(*key)
+        else:
+            near_duplicate_index.remove(key, qid)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_index_changes(session):
+    session.info.pop('near_duplicate_changes', None)
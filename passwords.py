@@ -0,0 +1,168 @@
+# passwords.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Optional
+
+import bcrypt
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# معامل العمل لكل خوارزمية: log2(N) في scrypt، وعدد التكرارات في pbkdf2، وlog2 الجولات في bcrypt
+ALGORITHMS = {
+    'scrypt': 15,
+    'pbkdf2': 600000,
+    'bcrypt': 12,
+}
+
+
+class PasswordHasherBusy(Exception):
+    """كل عمال التجزئة مشغولون والطابور ممتلئ حتى انتهاء المهلة."""
+
+
+def method_for(algorithm: str, work_factor: int) -> str:
+    """بادئة البصمة المخزنة للإعدادات المعطاة، وتُقارن بها البصمات القديمة."""
+    if algorithm == 'scrypt':
+        return f'scrypt:{2 ** work_factor}:8:1'
+    if algorithm == 'pbkdf2':
+        return f'pbkdf2:sha256:{work_factor}'
+    if algorithm == 'bcrypt':
+        return f'$2b${work_factor:02d}$'
+    raise ValueError(f"خوارزمية تجزئة غير معروفة: {algorithm}")
+
+
+# الدالتان التاليتان تُنفذان داخل عمليات المجمع فتبقيان على مستوى الوحدة
+
+def hash_password(password: str, algorithm: str, work_factor: int) -> str:
+    if algorithm == 'bcrypt':
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(work_factor)).decode('ascii')
+    return generate_password_hash(password, method=method_for(algorithm, work_factor))
+
+
+def verify_password(stored: str, password: str) -> bool:
+    """مطابقة كلمة المرور مع بصمة بأي خوارزمية مدعومة."""
+    if not stored:
+        return False
+    if stored.startswith('$2'):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), stored.encode('ascii'))
+        except ValueError:
+            return False
+    return check_password_hash(stored, password)
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    """مهيئ عمال المجمع: الخروج إذا انتهت العملية الأم دون إغلاق المجمع (SIGTERM مثلًا)."""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class PasswordHasher:
+    """تجزئة كلمات المرور والتحقق منها في مجمع عمليات محدود.
+
+    دوال الاشتقاق تستهلك المعالج وتحجز الـ GIL، فتشغيلها في خيط الطلب
+    يوقف بقية خيوط العامل أثناء موجات الدخول. المجمع يُنشأ عند أول
+    استخدام في كل عملية (بعد تفرع خادم gunicorn مثلًا) بسياق spawn،
+    وعدد المهام المعلقة محدود فيرفع PasswordHasherBusy بدل تكديس
+    الطلبات بلا حد. مع PASSWORD_HASH_WORKERS=0 يجري كل شيء في خيط الطلب.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.configure()
+
+    def init_app(self, app) -> None:
+        self.configure(
+            algorithm=app.config.get('PASSWORD_HASH_ALGORITHM', 'scrypt'),
+            work_factor=app.config.get('PASSWORD_HASH_WORK_FACTOR'),
+            workers=app.config.get('PASSWORD_HASH_WORKERS', 0),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 64),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10.0)
+        )
+
+    def configure(self, algorithm: str = 'scrypt', work_factor: Optional[int] = None, workers: int = 0,
+                  max_pending: int = 64, timeout: float = 10.0) -> None:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"خوارزمية تجزئة غير معروفة: {algorithm}")
+        self.algorithm = algorithm
+        self.work_factor = work_factor or ALGORITHMS[algorithm]
+        self.method = method_for(self.algorithm, self.work_factor)
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(max_pending, workers, 1))
+        self.shutdown()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_exit_with_parent,
+                    initargs=(os.getpid(),)
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        slots = self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # المهمة تبقى في المجمع بعد انتهاء مهلة الانتظار، فلا يتحرر مكانها إلا بانتهائها
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            raise PasswordHasherBusy()
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.algorithm, self.work_factor)
+
+    def verify(self, stored: str, password: str) -> bool:
+        return self._run(verify_password, stored, password)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """البصمة أُنشئت بخوارزمية أو معامل عمل غير الحاليين."""
+        if not stored:
+            return False
+        if self.algorithm == 'bcrypt':
+            return not stored.startswith(self.method)
+        return stored.split('$', 1)[0] != self.method
+
+    def verify_and_update(self, user, password: str) -> bool:
+        """التحقق من كلمة مرور المستخدم وإعادة تجزئتها بالإعدادات الحالية عند الحاجة.
+
+        البصمة الجديدة تُسند إلى user.password_hash ويبقى الـ commit على المستدعي.
+        """
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+            logger.info(f"إعادة تجزئة كلمة مرور المستخدم {user.id} بالإعدادات {self.method}")
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,109 @@
+# progress_buffer.py
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
+
+from flask import current_app
+from sqlalchemy.orm.attributes import flag_modified
+
+from db_utils import upsert_rows
+from extensions import db
+from models import QuizSession, UserProgress, UserProgressDay
+from session_store import active_sessions
+
+# فاصل آمن بين المادة والموضوع في مفاتيح JSON
+_KEY_SEP = '\x1f'
+
+
+def _pending(quiz_session: QuizSession) -> Dict[str, list]:
+    return quiz_session.session_data.setdefault('progress', {})
+
+
+def record_answer(quiz_session: QuizSession, question, is_correct: bool) -> None:
+    """تسجيل إجابة في مخزن التقدم المؤقت داخل بيانات جلسة الاختبار.
+
+    تُحفظ الفروق مع الجلسة نفسها فلا يحتاج مسار الإجابة إلا إلى commit
+    واحد، وتُفرَّغ إلى UserProgress عند إنهاء الاختبار أو عند تجاوز حد
+    الحجم أو الزمن المحدد في الإعدادات.
+    """
+    data = quiz_session.session_data
+    add_pending(_pending(quiz_session), question, is_correct)
+    data['progress_count'] = data.get('progress_count', 0) + 1
+    data.setdefault('progress_since', time.time())
+    flag_modified(quiz_session, 'session_data')
+
+    config = current_app.config
+    if (data['progress_count'] >= config.get('PROGRESS_FLUSH_SIZE', 20)
+            or time.time() - data['progress_since'] >= config.get('PROGRESS_FLUSH_INTERVAL', 300)):
+        flush_progress(quiz_session)
+
+
+def add_pending(pending: Dict[str, list], question, is_correct: bool) -> None:
+    """إضافة إجابة إلى فروق التقدم المعلقة مجمعة حسب (المادة، الموضوع)."""
+    key = f"{question.category}{_KEY_SEP}{question.topic}"
+    correct, total = pending.get(key, [0, 0])
+    pending[key] = [correct + int(bool(is_correct)), total + 1]
+
+
+def upsert_progress(user_id: int, pending: Dict[str, list]) -> None:
+    """كتابة فروق التقدم المعلقة إلى UserProgress في دفعة upsert واحدة (دون commit).
+
+    الفروق نفسها تُجمع في UserProgressDay تحت يوم التفريغ بدفعة ثانية.
+    """
+    if not pending:
+        return
+    now = datetime.now(timezone.utc)
+    rows = []
+    for key, (correct, total) in pending.items():
+        category, topic = key.split(_KEY_SEP, 1)
+        rows.append({
+            'user_id': user_id,
+            'category': category,
+            'topic': topic,
+            'correct_count': correct,
+            'total_count': total,
+            'last_updated': now
+        })
+    upsert_rows(
+        UserProgress.__table__, rows,
+        key_columns=('user_id', 'category', 'topic'),
+        increment_columns=('correct_count', 'total_count'),
+        set_columns=('last_updated',)
+    )
+    day = now.date()
+    upsert_rows(
+        UserProgressDay.__table__,
+        [{'user_id': row['user_id'], 'category': row['category'], 'topic': row['topic'], 'day': day,
+          'correct_count': row['correct_count'], 'total_count': row['total_count']} for row in rows],
+        key_columns=('user_id', 'day', 'category', 'topic'),
+        increment_columns=('correct_count', 'total_count')
+    )
+
+
+def flush_progress(quiz_session: QuizSession) -> None:
+    """تفريغ الفروق المعلقة إلى UserProgress في دفعة upsert واحدة (دون commit)."""
+    pending = quiz_session.session_data.get('progress')
+    if not pending:
+        return
+    upsert_progress(quiz_session.user_id, pending)
+    for field in ('progress', 'progress_count', 'progress_since'):
+        quiz_session.session_data.pop(field, None)
+    flag_modified(quiz_session, 'session_data')
+
+
+def pending_progress(user_id: int, category: str) -> Tuple[int, int]:
+    """مجموع (الصحيح، الكلي) المعلق في جلسات المستخدم النشطة لمادة معينة."""
+    if active_sessions.enabled:
+        pending = [state.progress for state in active_sessions.store.for_user(user_id)]
+    else:
+        sessions = db.session.query(QuizSession.session_data).filter_by(user_id=user_id).all()
+        pending = [(data or {}).get('progress', {}) for (data,) in sessions]
+
+    correct = total = 0
+    prefix = f"{category}{_KEY_SEP}"
+    for progress in pending:
+        for key, (c, t) in progress.items():
+            if key.startswith(prefix):
+                correct += c
+                total += t
+    return correct, total
@@ -0,0 +1,203 @@
+# query_budget.py
+import functools
+import logging
+import os
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'warn', 'raise')
+
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_SKIPPED_FILES = {os.path.abspath(__file__)}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """عدد جمل SQL تجاوز الحد المسموح أو تكرر تحميل علاقة صفًا بصف."""
+
+
+class StatementLog:
+    """جمل SQL المنفذة أثناء نشاط السجل، مع العلاقة المحمّلة كسولًا إن وُجدت.
+
+    موقع الاستدعاء في الكود يُحسب فقط عند تكرار الجملة نفسها repeat_threshold
+    مرات، لأن استخراج مكدس الاستدعاءات مكلف نسبيًا.
+    """
+
+    def __init__(self, repeat_threshold: int = 0):
+        self.repeat_threshold = repeat_threshold
+        self.statements: List[str] = []
+        self.counts: Counter = Counter()
+        self.relationships: Dict[str, str] = {}
+        self.call_sites: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self.statements)
+
+    def record(self, statement: str, relationship: Optional[str]) -> None:
+        self.statements.append(statement)
+        self.counts[statement] += 1
+        if relationship:
+            self.relationships.setdefault(statement, relationship)
+        if self.repeat_threshold and self.counts[statement] == self.repeat_threshold:
+            self.call_sites[statement] = _call_site()
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """استعلامات SELECT المتكررة بمعاملات مختلفة: نمط N+1 المعتاد.
+
+        جمل الكتابة لا تُحسب، فالـ flush على SQLite يُدرج الصفوف واحدًا واحدًا.
+        """
+        if not self.repeat_threshold:
+            return []
+        return [
+            (sql, count) for sql, count in self.counts.most_common()
+            if count >= self.repeat_threshold and sql.lstrip()[:6].upper() == 'SELECT'
+        ]
+
+    def describe(self, statement: str, count: int) -> str:
+        where = self.relationships.get(statement) or 'استعلام'
+        site = self.call_sites.get(statement, '?')
+        return f"{count}× {where} عند {site}: {' '.join(statement.split())[:200]}"
+
+
+def _call_site() -> str:
+    """أقرب إطار من كود التطبيق نفسه (لا من المكتبات ولا من هذه الوحدة)."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith('<'):
+            # كود مولّد (مثل دوال SQLAlchemy المنشأة وقت التشغيل)
+            continue
+        filename = os.path.abspath(frame.filename)
+        if (filename.startswith(_ROOT) and filename not in _SKIPPED_FILES
+                and os.sep + 'site-packages' + os.sep not in filename):
+            return f"{os.path.relpath(filename, _ROOT)}:{frame.lineno} ({frame.name})"
+    return '?'
+
+
+_active: ContextVar[Tuple[StatementLog, ...]] = ContextVar('query_budget_logs', default=())
+_relationship: ContextVar[Optional[str]] = ContextVar('query_budget_relationship', default=None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_relationship(orm_execute_state):
+    if _active.get():
+        path = orm_execute_state.loader_strategy_path if orm_execute_state.is_relationship_load else None
+        _relationship.set(str(path.prop) if path is not None and path.prop is not None else None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    logs = _active.get()
+    if logs:
+        relationship = _relationship.get()
+        _relationship.set(None)
+        for log in logs:
+            log.record(statement, relationship)
+
+
+class QueryBudget:
+    """حد أقصى لعدد جمل SQL داخل كتلة أو دالة.
+
+        with QueryBudget(3):
+            client.get('/dashboard')
+
+    mode: 'raise' يرفع QueryBudgetExceeded، و'warn' يسجل تحذيرًا فقط.
+    الجمل المتكررة repeat_threshold مرات أو أكثر تُعد نمط N+1 وتُبلَّغ
+    بالعلاقة وموقع الاستدعاء حتى لو لم يُتجاوز الحد.
+    """
+
+    def __init__(self, max_statements: Optional[int] = None, label: str = 'الكتلة',
+                 mode: str = 'raise', repeat_threshold: int = 3):
+        if mode not in MODES:
+            raise ValueError(f"وضع غير معروف: {mode}")
+        self.max_statements = max_statements
+        self.label = label
+        self.mode = mode
+        self.log = StatementLog(repeat_threshold)
+        self._token = None
+
+    def __enter__(self) -> StatementLog:
+        self._token = _active.set(_active.get() + (self.log,))
+        return self.log
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _active.reset(self._token)
+        if exc_type is None:
+            self.check()
+
+    def problems(self) -> List[str]:
+        found = []
+        if self.max_statements is not None and len(self.log) > self.max_statements:
+            found.append(f"{len(self.log)} جملة SQL والحد {self.max_statements}")
+        found.extend(self.log.describe(sql, count) for sql, count in self.log.repeated())
+        return found
+
+    def check(self) -> None:
+        found = self.problems()
+        if not found or self.mode == 'off':
+            return
+        message = f"ميزانية الاستعلامات في {self.label}:\n  " + '\n  '.join(found)
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def _mode() -> str:
+    return current_app.config.get('QUERY_BUDGET_MODE', 'off') if has_app_context() else 'off'
+
+
+def query_budget(max_statements: int):
+    """تثبيت ميزانية جمل SQL لمسار، وتوضع مباشرة تحت @route لتشمل تحميل المستخدم.
+
+    لا تفعل شيئًا إلا إذا كان QUERY_BUDGET_MODE هو 'warn' أو 'raise'.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            mode = _mode()
+            if mode == 'off':
+                return view(*args, **kwargs)
+            budget = QueryBudget(
+                max_statements, label=request.endpoint, mode=mode,
+                repeat_threshold=current_app.config.get('QUERY_REPEAT_THRESHOLD', 3)
+            )
+            with budget:
+                return view(*args, **kwargs)
+        wrapper.query_budget = max_statements
+        return wrapper
+    return decorator
+
+
+def init_app(app: Flask) -> None:
+    """كاشف N+1 على مستوى الطلب كله في وضع التطوير، بما فيه عرض القوالب.
+
+    المسارات المزودة بـ @query_budget تُفحص بميزانيتها داخل المزخرف، فلا
+    يُعاد فحصها هنا.
+    """
+    if app.config.get('QUERY_BUDGET_MODE', 'off') == 'off':
+        return
+
+    @app.before_request
+    def _start_request_budget():
+        view = app.view_functions.get(request.endpoint)
+        if view is not None and hasattr(view, 'query_budget'):
+            return
+        budget = QueryBudget(
+            label=request.endpoint or request.path, mode='warn',
+            repeat_threshold=app.config.get('QUERY_REPEAT_THRESHOLD', 3)
+        )
+        budget.__enter__()
+        request.environ['query_budget'] = budget
+
+    @app.teardown_request
+    def _finish_request_budget(exc=None):
+        budget = request.environ.pop('query_budget', None)
+        if budget is not None:
+            _active.set(tuple(log for log in _active.get() if log is not budget.log))
+            budget.check()
@@ -0,0 +1,128 @@
+# question_bank.py
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from arabic_text import normalize_text
+from db_utils import insert_missing
+from extensions import db
+from models import Question
+from near_duplicates import TopicIndex, near_duplicate_index, signature, stage_inserted as stage_near_duplicate
+from question_pool import question_pool, stage_inserted as stage_pool_question
+
+QUESTION_FIELDS = (
+    'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+    'correct_answer', 'category', 'topic', 'difficulty', 'explanation'
+)
+
+# أسماء مستويات الصعوبة المقبولة في الطلبات وما يقابلها في البنك
+DIFFICULTY_ALIASES = {
+    'easy': 'سهل',
+    'medium': 'متوسط',
+    'hard': 'صعب',
+}
+
+
+def normalize_difficulty(value: str) -> str:
+    value = (value or 'متوسط').strip()
+    return DIFFICULTY_ALIASES.get(value.lower(), value)
+
+
+def content_hash(question: Dict) -> str:
+    """بصمة محتوى السؤال بعد التوحيد؛ لا تتأثر بالتشكيل أو بترتيب الخيارات."""
+    options = sorted(normalize_text(question.get(f'option_{key}', '')) for key in 'abcd')
+    parts = [normalize_text(question.get('question_text', ''))] + options
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def question_to_dict(question: Question) -> Dict:
+    data = {field: getattr(question, field) for field in QUESTION_FIELDS}
+    data['id'] = question.id
+    data['source'] = question.source
+    return data
+
+
+def fetch_from_bank(category: str, topic: str, difficulty: str, count: int) -> List[Question]:
+    """سحب أسئلة عشوائية من البنك دون الحاجة إلى الذكاء الاصطناعي."""
+    return question_pool.sample(category, topic, difficulty, count)
+
+
+def save_questions(questions: Iterable[Dict], source: str) -> Tuple[List[Question], int]:
+    """حفظ أسئلة متحقق منها في البنك مع تجاهل المكرر وشبه المكرر.
+
+    يعاد صف البنك المقابل لكل سؤال بترتيب الإدخال، سواء أُضيف الآن أو كان
+    موجودًا مسبقًا (أو كان له سؤال أصلي يشبهه)؛ الأسئلة المكررة في الدفعة
+    تقابل الصف نفسه. يعاد معها عدد ما أُضيف فعلًا. البصمة التي أدرجها طلب
+    متزامن تُقرأ بدل رفع خطأ التفرد. لا يتم الـ commit هنا.
+    """
+    questions = list(questions)
+    digests = [content_hash(question) for question in questions]
+    by_hash = {}
+    for digest, question in zip(digests, questions):
+        by_hash.setdefault(digest, question)
+    if not by_hash:
+        return [], 0
+
+    rows = {
+        row.content_hash: row
+        for row in Question.query.filter(Question.content_hash.in_(list(by_hash))).all()
+    }
+    # الأسئلة المضافة في هذه الدفعة لم تدخل الفهرس بعد (يُحدَّث بعد الـ commit)
+    batch_index = defaultdict(TopicIndex)
+    new_rows, aliases = [], {}
+    for digest, question in by_hash.items():
+        if digest in rows:
+            continue
+        sig = signature(question)
+        topic_key = (question.get('category'), question.get('topic'))
+        match = near_duplicate_index.find(question, sig)
+        if match:
+            rows[digest] = db.session.get(Question, match[0])
+            continue
+        local = batch_index[topic_key].find(sig, near_duplicate_index.threshold)
+        if local:
+            aliases[digest] = new_rows[local[0]]['content_hash']
+            continue
+        batch_index[topic_key].add(len(new_rows), sig)
+        new_rows.append(dict(
+            {field: question.get(field) for field in QUESTION_FIELDS},
+            source=source,
+            content_hash=digest
+        ))
+
+    inserted = {digest for (digest,) in insert_missing(Question.__table__, new_rows, ('content_hash',))}
+    if new_rows:
+        for row in Question.query.filter(Question.content_hash.in_([r['content_hash'] for r in new_rows])):
+            rows[row.content_hash] = row
+            if row.content_hash in inserted:
+                # الإدراج عبر Core لا يمر بأحداث ORM، لذا تُسجَّل الإضافة للفهارس يدويًا
+                stage_pool_question(db.session, row)
+                stage_near_duplicate(db.session, row)
+    for digest, original in aliases.items():
+        rows[digest] = rows[original]
+    return [rows[digest] for digest in digests], len(inserted)
+
+
+def backfill_content_hashes(batch_size: int = 1000) -> int:
+    """حساب البصمات للأسئلة القديمة التي لا تملك بصمة.
+
+    يُترك السؤال دون بصمة إذا كانت بصمته مستخدمة مسبقًا (مكرر).
+    """
+    updated = 0
+    seen = {digest for (digest,) in db.session.query(Question.content_hash)
+            .filter(Question.content_hash.isnot(None))}
+    last_id = 0
+    while True:
+        rows = Question.query.filter(Question.content_hash.is_(None), Question.id > last_id)\
+            .order_by(Question.id).limit(batch_size).all()
+        if not rows:
+            break
+        for row in rows:
+            digest = content_hash(question_to_dict(row))
+            if digest not in seen:
+                row.content_hash = digest
+                seen.add(digest)
+                updated += 1
+        last_id = rows[-1].id
+        db.session.commit()
+    return updated
@@ -0,0 +1,179 @@
+# question_pool.py
+import random
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Question
+
+BucketKey = Tuple[str, str, str]
+
+
+class _Bucket:
+    """معرّفات أسئلة فئة واحدة مع فهرس مواقعها للحذف في زمن ثابت."""
+
+    def __init__(self, ids: List[int]):
+        self.ids = list(ids)
+        self.positions = {qid: idx for idx, qid in enumerate(self.ids)}
+        self.loaded_at = time.monotonic()
+
+    def add(self, qid: int) -> None:
+        if qid in self.positions:
+            return
+        self.positions[qid] = len(self.ids)
+        self.ids.append(qid)
+
+    def remove(self, qid: int) -> None:
+        idx = self.positions.pop(qid, None)
+        if idx is None:
+            return
+        last = self.ids.pop()
+        if idx < len(self.ids):
+            self.ids[idx] = last
+            self.positions[last] = idx
+
+
+class QuestionPool:
+    """مخزن معرّفات الأسئلة في الذاكرة مقسّم حسب (المادة، الموضوع، الصعوبة).
+
+    يُحمَّل كل قسم مرة واحدة عبر الفهرس المركّب ثم يُسحب منه عدد الأسئلة
+    المطلوب في زمن يتناسب مع العدد لا مع حجم البنك، بدلًا من
+    ORDER BY random() الذي يفرز كل الصفوف المطابقة في كل اختبار.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[BucketKey, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ttl() -> float:
+        return current_app.config.get('QUESTION_POOL_TTL', 300)
+
+    def _load_bucket(self, key: BucketKey) -> _Bucket:
+        category, topic, difficulty = key
+        rows = db.session.query(Question.id).filter_by(
+            category=category,
+            topic=topic,
+            difficulty=difficulty,
+            duplicate_of_id=None
+        ).all()
+        return _Bucket(row.id for row in rows)
+
+    def _get_bucket(self, key: BucketKey) -> _Bucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket and time.monotonic() - bucket.loaded_at < self._ttl():
+                return bucket
+        # التحميل خارج القفل حتى لا تنتظر الفئات الأخرى استعلام قاعدة البيانات
+        bucket = self._load_bucket(key)
+        with self._lock:
+            self._buckets[key] = bucket
+        return bucket
+
+    def sample_ids(self, category: str, topic: str, difficulty: str, count: int) -> List[int]:
+        """سحب حتى count معرّفًا مختلفًا من القسم المطلوب."""
+        bucket = self._get_bucket((category, topic, difficulty))
+        with self._lock:
+            return random.sample(bucket.ids, min(count, len(bucket.ids)))
+
+    def sample(self, category: str, topic: str, difficulty: str, count: int) -> List[Question]:
+        """سحب أسئلة عشوائية وجلبها في استعلام IN واحد."""
+        key = (category, topic, difficulty)
+        for _ in range(2):
+            ids = self.sample_ids(category, topic, difficulty, count)
+            if not ids:
+                return []
+            rows = Question.query.filter(Question.id.in_(ids)).all()
+            by_id = {question.id: question for question in rows}
+            if len(by_id) == len(ids):
+                return [by_id[qid] for qid in ids]
+            # معرّفات حُذفت بطريقة لا تمر بأحداث ORM (مثل الحذف الجماعي)
+            self.invalidate(*key)
+        return [by_id[qid] for qid in ids if qid in by_id]
+
+    def add(self, key: BucketKey, qid: int) -> None:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.add(qid)
+
+    def remove(self, key: BucketKey, qid: int) -> None:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.remove(qid)
+
+    def invalidate(self, category: str = None, topic: str = None, difficulty: str = None) -> None:
+        """إسقاط قسم محدد، أو كل الأقسام عند عدم تمرير مفتاح."""
+        with self._lock:
+            if category is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop((category, topic, difficulty), None)
+
+
+question_pool = QuestionPool()
+
+
+# --- مزامنة المخزن مع تغييرات جدول الأسئلة ---
+# تُجمع التغييرات في جلسة قاعدة البيانات ولا تُطبَّق إلا بعد نجاح الـ commit
+
+def _bucket_key(question: Question) -> BucketKey:
+    return (question.category, question.topic, question.difficulty)
+
+
+def _pending(session: Session) -> list:
+    return session.info.setdefault('question_pool_changes', [])
+
+
+def stage_inserted(session: Session, question: Question) -> None:
+    """تسجيل سؤال مُدرج ليُضاف إلى المخزن بعد الـ commit؛ يُستدعى مباشرة للإدراج عبر Core."""
+    if question.duplicate_of_id is None:
+        _pending(session).append(('add', _bucket_key(question), question.id))
+
+
+@event.listens_for(Question, 'after_insert')
+def _question_inserted(mapper, connection, target):
+    stage_inserted(inspect(target).session, target)
+
+
+@event.listens_for(Question, 'after_delete')
+def _question_deleted(mapper, connection, target):
+    _pending(inspect(target).session).append(('remove', _bucket_key(target), target.id))
+
+
+@event.listens_for(Question, 'after_update')
+def _question_updated(mapper, connection, target):
+    state = inspect(target)
+    old_key = tuple(
+        (state.attrs[name].history.deleted or [getattr(target, name)])[0]
+        for name in ('category', 'topic', 'difficulty')
+    )
+    new_key = _bucket_key(target)
+    # الأسئلة المعلّمة كمكررة لا تدخل المخزن
+    was_active = (state.attrs.duplicate_of_id.history.deleted or [target.duplicate_of_id])[0] is None
+    is_active = target.duplicate_of_id is None
+    if old_key != new_key or was_active != is_active:
+        if was_active:
+            _pending(state.session).append(('remove', old_key, target.id))
+        if is_active:
+            _pending(state.session).append(('add', new_key, target.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pool_changes(session):
+    for action, key, qid in session.info.pop('question_pool_changes', []):
+        if action == 'add':
+            question_pool.add(key, qid)
+        else:
+            question_pool.remove(key, qid)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pool_changes(session):
+    session.info.pop('question_pool_changes', None)
@@ -0,0 +1,32 @@
+# question_schema.py
+from typing import Dict, Optional
+
+ANSWER_LETTERS = ('أ', 'ب', 'ج', 'د')
+DIFFICULTY_LEVELS = ('سهل', 'متوسط', 'صعب')
+
+TEXT_FIELDS = (
+    'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'category', 'topic'
+)
+
+
+def validation_error(question: Dict) -> Optional[str]:
+    """سبب رفض السؤال بصيغة 'السبب:الحقل'، أو None إذا كان صالحًا.
+
+    القواعد نفسها تُطبق على أسئلة الذكاء الاصطناعي والاستيراد.
+    """
+    if not isinstance(question, dict):
+        return 'invalid:question'
+    for key in TEXT_FIELDS + ('correct_answer', 'difficulty'):
+        if question.get(key) is None:
+            return f'missing:{key}'
+    for key in TEXT_FIELDS:
+        value = question[key]
+        if not isinstance(value, str):
+            return f'invalid:{key}'
+        if not value.strip():
+            return f'empty:{key}'
+    if question['correct_answer'] not in ANSWER_LETTERS:
+        return 'invalid:correct_answer'
+    if question['difficulty'] not in DIFFICULTY_LEVELS:
+        return 'invalid:difficulty'
+    return None
@@ -0,0 +1,538 @@
+# quiz_service.py
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+import metrics
+from extensions import db
+from leaderboard import record_result
+from models import Question, QuizResult, QuizSession, QuizSessionQuestion
+from progress_buffer import add_pending, flush_progress, record_answer, upsert_progress
+from session_snapshot import (SessionSnapshot, SnapshotItem, invalidate_session_snapshot, load_question_snapshot,
+                              load_session_snapshot)
+from session_store import ActiveSession, active_sessions
+from user_stats import record_quiz
+
+# اسم الوضع في session_data لجلسات الاختبار السريع (كل الأسئلة في رد واحد)
+FAST_MODE = 'fast'
+
+# مرات إعادة تطبيق الإجابة عند تعارض نسخة الجلسة قبل الرد بأنها مشغولة
+ANSWER_ATTEMPTS = 5
+# أقصى عدد من الجلسات المنتهية يُحفظ تقدمها في كل فحص
+CHECKPOINT_BATCH = 500
+
+QUIZ_ANSWERS = metrics.counter(
+    'quiz_answers_total', 'طلبات إجابة أسئلة الاختبار حسب النتيجة', ('outcome',)
+)
+
+
+def elapsed_seconds(started_at: Optional[datetime], now: Optional[datetime] = None) -> int:
+    """الثواني المنقضية منذ بداية الاختبار (تُعامل التواريخ المجردة على أنها UTC)."""
+    if started_at is None:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    return max(0, int((now - started_at).total_seconds()))
+
+
+def record_quiz_result(user_id: int, score: int, total_questions: int,
+                       time_taken: int, date_taken: Optional[datetime] = None) -> QuizResult:
+    """حفظ نتيجة اختبار وتحديث المجاميع المرتبطة بها في نفس المعاملة (دون commit)."""
+    date_taken = date_taken or datetime.now(timezone.utc)
+    quiz_result = QuizResult(
+        user_id=user_id,
+        score=score,
+        total_questions=total_questions,
+        time_taken=time_taken,
+        date_taken=date_taken
+    )
+    db.session.add(quiz_result)
+    record_result(user_id, score, date_taken)
+    record_quiz(user_id, score, date_taken)
+    return quiz_result
+
+
+# --- الوضع السريع: الاختبار كاملًا في رد واحد والإجابات في طلب واحد ---
+
+def _token_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='quiz-fast-mode')
+
+
+def sign_quiz_token(quiz_session: QuizSession) -> str:
+    """رمز موقّع يربط رمز الجلسة بصاحبها، فيُرفض المزوّر دون قراءة قاعدة البيانات."""
+    return _token_serializer().dumps({'s': quiz_session.session_token, 'u': quiz_session.user_id})
+
+
+def read_quiz_token(token: str) -> Optional[Tuple[str, int]]:
+    """(رمز الجلسة، معرف المستخدم) من رمز موقّع صالح لم تنتهِ مدته، وإلا None."""
+    try:
+        data = _token_serializer().loads(token, max_age=current_app.config.get('FAST_QUIZ_MAX_AGE', 7200))
+        return data['s'], int(data['u'])
+    except (BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def fast_quiz_payload(quiz_session: QuizSession, questions: List[Question]) -> Dict:
+    """الأسئلة والخيارات دون الإجابات الصحيحة، مع الرمز الموقّع لإرسال الإجابات."""
+    return {
+        'token': sign_quiz_token(quiz_session),
+        'difficulty': questions[0].difficulty if questions else None,
+        'questions': [{
+            'id': question.id,
+            'question_text': question.question_text,
+            'options': {
+                'أ': question.option_a,
+                'ب': question.option_b,
+                'ج': question.option_c,
+                'د': question.option_d
+            }
+        } for question in questions]
+    }
+
+
+def _grade_answers(user_id: int, question_ids: List[int], started_at: Optional[datetime],
+                   answers: Dict[int, str]) -> Tuple[QuizResult, List[Dict]]:
+    """تصحيح كل الإجابات وحفظ التقدم والنتيجة (دون commit).
+
+    الأسئلة التي لم تُرسل إجابتها تُحسب خاطئة. يعيد النتيجة وتفاصيل كل سؤال.
+    """
+    by_id = {question.id: question for question in Question.query.filter(Question.id.in_(question_ids))}
+
+    details, score, pending = [], 0, {}
+    for question_id in question_ids:
+        question = by_id.get(question_id)
+        if question is None:
+            # سؤال حُذف من البنك أثناء الاختبار
+            continue
+        answer = answers.get(question_id)
+        is_correct = answer == question.correct_answer
+        score += is_correct
+        add_pending(pending, question, is_correct)
+        details.append({
+            'question_id': question_id,
+            'user_answer': answer,
+            'correct_answer': question.correct_answer,
+            'is_correct': is_correct,
+            'explanation': question.explanation
+        })
+
+    upsert_progress(user_id, pending)
+    quiz_result = record_quiz_result(
+        user_id=user_id,
+        score=score,
+        total_questions=len(details),
+        time_taken=elapsed_seconds(started_at)
+    )
+    return quiz_result, details
+
+
+def grade_fast_quiz(quiz_session: QuizSession,
+                    answers: Dict[int, str]) -> Optional[Tuple[QuizResult, List[Dict]]]:
+    """تصحيح اختبار سريع من صفوف quiz_session وحذف جلسته في المعاملة الحالية (دون commit).
+
+    الجلسة تُحذف أولًا: إن سبق حذفها (إرسال مكرر أو متزامن) يعيد None ولا
+    يُكتب شيء.
+    """
+    claimed = db.session.execute(
+        QuizSession.__table__.delete().where(QuizSession.id == quiz_session.id)
+    )
+    if claimed.rowcount != 1:
+        return None
+    # الصف حُذف؛ لا يُكتب كائن الجلسة مجددًا عند الـ commit
+    db.session.expunge(quiz_session)
+    return _grade_answers(quiz_session.user_id, quiz_session.session_data['question_ids'],
+                          quiz_session.created_at, answers)
+
+
+def submit_fast_quiz(token: str, user_id: int, answers: Dict[int, str]) -> Dict:
+    """تصحيح اختبار الوضع السريع كاملًا وحفظ التقدم والنتيجة مع commit.
+
+    يرفع AnswerRejected('not_found') إن لم تكن الجلسة اختبارًا سريعًا نشطًا
+    لهذا المستخدم، وAnswerRejected('conflict') إن أنهاه طلب متزامن.
+    """
+    if active_sessions.enabled:
+        state = active_sessions.store.get(token)
+        if state is None or state.user_id != user_id or state.mode != FAST_MODE:
+            raise AnswerRejected('not_found')
+        state = active_sessions.store.pop(token)
+        if state is None:
+            raise AnswerRejected('conflict')
+        with _write_back(state):
+            quiz_result, details = _grade_answers(user_id, state.question_ids, state.created_at, answers)
+            summary = _fast_summary(quiz_result, details)
+        return summary
+
+    quiz_session = QuizSession.query.filter_by(session_token=token, user_id=user_id).first()
+    if quiz_session is None or quiz_session.session_data.get('mode') != FAST_MODE:
+        raise AnswerRejected('not_found')
+    graded = grade_fast_quiz(quiz_session, answers)
+    if graded is None:
+        raise AnswerRejected('conflict')
+    summary = _fast_summary(*graded)
+    db.session.commit()
+    return summary
+
+
+def _fast_summary(quiz_result: QuizResult, details: List[Dict]) -> Dict:
+    db.session.flush()
+    return {
+        'result_id': quiz_result.id,
+        'score': quiz_result.score,
+        'total_questions': quiz_result.total_questions,
+        'answers': details
+    }
+
+
+# --- دورة حياة الاختبار في المخزن المهيأ (صفوف quiz_session أو مخزن الجلسات النشطة) ---
+
+@contextmanager
+def _write_back(state: ActiveSession):
+    """commit الكتابات الدائمة لجلسة محجوزة من المخزن، وإعادتها إليه إن فشلت."""
+    try:
+        yield
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        active_sessions.store.create(state)
+        raise
+
+
+def checkpoint_expired_sessions(limit: int = CHECKPOINT_BATCH) -> int:
+    """حفظ تقدم الجلسات المنتهية دون إنهاء إلى UserProgress مع commit؛ يعيد عددها."""
+    if not active_sessions.enabled:
+        return _expire_idle_sessions(limit)
+    expired = active_sessions.store.pop_expired(limit)
+    if not expired:
+        return 0
+    try:
+        for state in expired:
+            upsert_progress(state.user_id, state.progress)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for state in expired:
+            active_sessions.store.create(state)
+        raise
+    return len(expired)
+
+
+def _expire_idle_sessions(limit: int) -> int:
+    """checkpoint_expired_sessions مع صفوف quiz_session: الجلسات التي لم تتغير منذ
+    ACTIVE_SESSION_TTL ثانية (اختبار متروك على هذا الجهاز أو غيره) يُحفظ تقدمها
+    المعلق وتُحذف. إن أجاب طلب متزامن عن إحداها تُترك الدفعة للدورة التالية.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config.get('ACTIVE_SESSION_TTL', 7200))
+    idle = QuizSession.query.options(selectinload(QuizSession.questions)).filter(
+        func.coalesce(QuizSession.updated_at, QuizSession.created_at) < cutoff
+    ).order_by(QuizSession.id).limit(limit).all()
+    if not idle:
+        return 0
+    tokens = [quiz_session.session_token for quiz_session in idle]
+    for quiz_session in idle:
+        upsert_progress(quiz_session.user_id, quiz_session.session_data.get('progress'))
+        db.session.delete(quiz_session)
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return 0
+    for token in tokens:
+        invalidate_session_snapshot(token)
+    return len(tokens)
+
+
+def create_quiz(token: str, user_id: int, questions: List[Question], subject_path: List[str],
+                previous_token: Optional[str] = None, mode: Optional[str] = None):
+    """إنشاء جلسة اختبار بأسئلتها (دون commit)، ويحمل الناتج session_token وuser_id.
+
+    مع صفوف quiz_session يُفرَّغ تقدم الاختبار السابق المتروك وتُحذف جلسته في
+    المعاملة نفسها. مع مخزن الجلسات النشطة لا يُكتب شيء في القاعدة الرئيسية؛
+    الاختبار المتروك يبقى حتى انتهاء مدته. في الحالتين يُحفظ تقدم الجلسات
+    المنتهية أو الخاملة دوريًا.
+    """
+    if active_sessions.checkpoint_due():
+        checkpoint_expired_sessions()
+    if active_sessions.enabled:
+        state = ActiveSession(
+            session_token=token,
+            user_id=user_id,
+            question_ids=[question.id for question in questions],
+            subject_path=subject_path,
+            started_at=time.time(),
+            mode=mode
+        )
+        active_sessions.store.create(state)
+        return state
+
+    previous_session = QuizSession.query.filter_by(session_token=previous_token, user_id=user_id).first()
+    if previous_session and mode == FAST_MODE:
+        # الاختبار السريع لا يحل محل اختبار المتصفح، فيبقى السابق قابلًا للإكمال
+        flush_progress(previous_session)
+    elif previous_session:
+        upsert_progress(user_id, previous_session.session_data.get('progress'))
+        db.session.delete(previous_session)
+        invalidate_session_snapshot(previous_token)
+
+    session_data = {
+        'current_index': 0,
+        'score': 0,
+        'time_spent': 0.0
+    }
+    if mode == FAST_MODE:
+        # الوضع السريع لا يكتب صفوف QuizSessionQuestion؛ الترتيب محفوظ في الجلسة
+        session_data.update(mode=FAST_MODE, question_ids=[question.id for question in questions])
+
+    quiz_session = QuizSession(
+        user_id=user_id,
+        session_data=session_data,
+        subject_path=subject_path,
+        session_token=token
+    )
+    db.session.add(quiz_session)
+    db.session.flush()
+
+    if mode != FAST_MODE:
+        # إضافة الأسئلة إلى الجلسة بجملة إدراج واحدة بدل إدراج لكل سؤال
+        db.session.execute(insert(QuizSessionQuestion), [
+            {'session_id': quiz_session.id, 'question_id': question.id, 'order': idx}
+            for idx, question in enumerate(questions)
+        ])
+    return quiz_session
+
+
+def load_quiz(token: str, user_id: int) -> Tuple[Optional[object], Optional[SessionSnapshot], int]:
+    """(الجلسة، لقطة الأسئلة، ترتيب السؤال الحالي)، أو (None, None, 0) إن لم توجد."""
+    if active_sessions.enabled:
+        state = active_sessions.store.get(token) if token else None
+        if state is None or state.user_id != user_id:
+            return None, None, 0
+        snapshot = load_question_snapshot(token, user_id, state.question_ids)
+        return state, snapshot, snapshot.next_order(state.current_index)
+
+    quiz_session, snapshot = load_session_snapshot(token, user_id)
+    if quiz_session is None:
+        return None, None, 0
+    return quiz_session, snapshot, quiz_session.session_data['current_index']
+
+
+def finish_quiz(token: str, user_id: int) -> Optional[int]:
+    """إنهاء الاختبار: حفظ النتيجة والتقدم المعلق وحذف الجلسة مع commit.
+
+    يعيد معرف النتيجة، أو None إن لم توجد الجلسة أو أنهاها طلب متزامن.
+    مع صفوف quiz_session يرفع StaleDataError إن غيّرت إجابة متزامنة الجلسة
+    بعد قراءتها.
+    """
+    if active_sessions.enabled:
+        state = active_sessions.store.get(token) if token else None
+        if state is None or state.user_id != user_id:
+            return None
+        state = active_sessions.store.pop(token)
+        if state is None:
+            return None
+        with _write_back(state):
+            snapshot = load_question_snapshot(token, user_id, state.question_ids)
+            # سؤال حُذف من البنك قبل الإجابة عنه لا يُحسب في عدد الأسئلة
+            skipped = sum(1 for item in snapshot.items if item.missing and str(item.order) not in state.answers)
+            upsert_progress(user_id, state.progress)
+            quiz_result = record_quiz_result(
+                user_id=user_id,
+                score=state.score,
+                total_questions=len(snapshot) - skipped,
+                time_taken=elapsed_seconds(state.created_at)
+            )
+            db.session.flush()
+            result_id = quiz_result.id
+        invalidate_session_snapshot(token)
+        return result_id
+
+    quiz_session, snapshot = load_session_snapshot(token, user_id)
+    if quiz_session is None:
+        return None
+    # حفظ نتيجة الاختبار وتحديث لوحة المتصدرين في نفس المعاملة
+    quiz_result = record_quiz_result(
+        user_id=user_id,
+        score=quiz_session.session_data['score'],
+        total_questions=len(snapshot),
+        time_taken=elapsed_seconds(quiz_session.created_at)
+    )
+    # تفريغ تقدم المستخدم المعلق في نفس المعاملة
+    flush_progress(quiz_session)
+    db.session.delete(quiz_session)
+    db.session.flush()
+    result_id = quiz_result.id
+    db.session.commit()
+    invalidate_session_snapshot(token)
+    return result_id
+
+
+# --- الإجابة عن سؤال واحد: مفتاحها (رمز الجلسة، ترتيب السؤال) ---
+
+class AnswerRejected(Exception):
+    """إجابة لا تُطبق. reason: not_found أو out_of_order أو conflict أو busy."""
+
+    def __init__(self, reason: str, expected_order: Optional[int] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.expected_order = expected_order
+
+
+@dataclass(frozen=True)
+class AnswerOutcome:
+    order: int
+    question_id: int
+    answer: str
+    is_correct: bool
+    correct_answer: str
+    explanation: Optional[str]
+    score: int
+    next_order: int
+    total: int
+    version: int
+    replayed: bool
+
+    def to_dict(self) -> Dict:
+        return dict(asdict(self), completed=self.next_order >= self.total)
+
+
+def _outcome(snapshot: SessionSnapshot, item: SnapshotItem, answer: str, is_correct: bool, replayed: bool,
+             score: int, next_order: int, version: int) -> AnswerOutcome:
+    return AnswerOutcome(
+        order=item.order,
+        question_id=item.question.id,
+        answer=answer,
+        is_correct=is_correct,
+        correct_answer=item.question.correct_answer,
+        explanation=item.question.explanation,
+        score=score,
+        next_order=next_order,
+        total=len(snapshot),
+        version=version,
+        replayed=replayed
+    )
+
+
+def _replay(quiz_session: QuizSession, snapshot: SessionSnapshot, item: SnapshotItem, answer: str) -> AnswerOutcome:
+    """رد سؤال مُجاب مسبقًا: النتيجة المسجلة للإجابة نفسها، أو conflict لإجابة مختلفة."""
+    row = db.session.execute(
+        select(QuizSessionQuestion.user_answer, QuizSessionQuestion.is_correct)
+        .where(QuizSessionQuestion.id == item.id)
+    ).one()
+    if row.user_answer != answer:
+        QUIZ_ANSWERS.inc(outcome='conflict')
+        raise AnswerRejected('conflict')
+    QUIZ_ANSWERS.inc(outcome='replayed')
+    data = quiz_session.session_data
+    return _outcome(snapshot, item, answer, bool(row.is_correct), True,
+                    data['score'], data['current_index'], quiz_session.version)
+
+
+def submit_answer(token: str, user_id: int, order: int, answer: str,
+                  loaded: Optional[Tuple[QuizSession, SessionSnapshot]] = None) -> AnswerOutcome:
+    """تسجيل إجابة السؤال ذي الترتيب order في جلسة الاختبار مع commit.
+
+    إعادة إرسال الإجابة نفسها (نقرة مزدوجة أو إعادة محاولة) تعيد النتيجة
+    المسجلة دون كتابة. صف السؤال يُحجز بـ UPDATE مشروط بأنه غير مُجاب،
+    وتحديث الجلسة مشروط بعمود version بدل قفل الصف؛ فإن سبقه طلب متزامن
+    تُلغى المعاملة كلها ويُعاد التطبيق على الحالة الجديدة. loaded جلسة
+    ولقطة محملتان مسبقًا تُستخدمان في المحاولة الأولى.
+    """
+    if active_sessions.enabled:
+        return _submit_active_answer(token, user_id, order, answer, loaded)
+
+    for attempt in range(ANSWER_ATTEMPTS):
+        quiz_session, snapshot = loaded if loaded and attempt == 0 else load_session_snapshot(token, user_id)
+        if quiz_session is None or not 0 <= order < len(snapshot):
+            raise AnswerRejected('not_found')
+        item = snapshot.items[order]
+        current_index = quiz_session.session_data['current_index']
+        if order < current_index:
+            return _replay(quiz_session, snapshot, item, answer)
+        if order > current_index:
+            QUIZ_ANSWERS.inc(outcome='out_of_order')
+            raise AnswerRejected('out_of_order', expected_order=current_index)
+
+        question = item.question
+        is_correct = answer == question.correct_answer
+        claimed = db.session.execute(
+            update(QuizSessionQuestion)
+            .where(QuizSessionQuestion.id == item.id, QuizSessionQuestion.is_answered.is_(False))
+            .values(user_answer=answer, is_correct=is_correct, is_answered=True)
+        )
+        if claimed.rowcount != 1:
+            # طلب متزامن سجّلها وحدّث الجلسة في معاملته؛ القراءة التالية تعيد تحميلها
+            db.session.rollback()
+            return _replay(quiz_session, snapshot, item, answer)
+
+        data = quiz_session.session_data
+        score = data['score'] + int(is_correct)
+        # قاموس جديد بدل التعديل في المكان حتى يُكتشف التغيير دائمًا
+        quiz_session.session_data = dict(data, current_index=current_index + 1, score=score)
+        record_answer(quiz_session, question, is_correct)
+        outcome = _outcome(snapshot, item, answer, is_correct, False, score, current_index + 1,
+                           quiz_session.version + 1)
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            QUIZ_ANSWERS.inc(outcome='stale')
+            continue
+        invalidate_session_snapshot(token)
+        QUIZ_ANSWERS.inc(outcome='accepted')
+        return outcome
+
+    QUIZ_ANSWERS.inc(outcome='busy')
+    raise AnswerRejected('busy')
+
+
+def _submit_active_answer(token: str, user_id: int, order: int, answer: str,
+                          loaded: Optional[Tuple[ActiveSession, SessionSnapshot]] = None) -> AnswerOutcome:
+    """submit_answer على مخزن الجلسات النشطة: الإجابة والنتيجة والتقدم المعلق
+    في حالة الجلسة تُكتب بمقارنة وتبديل على نسختها، ولا تمس القاعدة الرئيسية."""
+    for attempt in range(ANSWER_ATTEMPTS):
+        if loaded and attempt == 0:
+            state, snapshot = loaded
+        else:
+            state, snapshot, _ = load_quiz(token, user_id)
+        if state is None or not 0 <= order < len(snapshot):
+            raise AnswerRejected('not_found')
+        item = snapshot.items[order]
+        if item.missing:
+            raise AnswerRejected('not_found')
+
+        recorded = state.answers.get(str(order))
+        if recorded is not None:
+            if recorded[0] != answer:
+                QUIZ_ANSWERS.inc(outcome='conflict')
+                raise AnswerRejected('conflict')
+            QUIZ_ANSWERS.inc(outcome='replayed')
+            return _outcome(snapshot, item, answer, recorded[1], True,
+                            state.score, snapshot.next_order(state.current_index), state.version)
+        # الأسئلة المحذوفة من البنك بعد المؤشر تُتخطى
+        current_index = snapshot.next_order(state.current_index)
+        if order != current_index:
+            QUIZ_ANSWERS.inc(outcome='out_of_order')
+            raise AnswerRejected('out_of_order', expected_order=current_index)
+
+        is_correct = answer == item.question.correct_answer
+        state.answers[str(order)] = [answer, is_correct]
+        state.current_index = order + 1
+        state.score += int(is_correct)
+        add_pending(state.progress, item.question, is_correct)
+        if not active_sessions.store.replace(state):
+            QUIZ_ANSWERS.inc(outcome='stale')
+            continue
+        QUIZ_ANSWERS.inc(outcome='accepted')
+        return _outcome(snapshot, item, answer, is_correct, False,
+                        state.score, snapshot.next_order(state.current_index), state.version)
+
+    QUIZ_ANSWERS.inc(outcome='busy')
+    raise AnswerRejected('busy')
@@ -1,16 +1,25 @@
 # routes.py
-from flask import session, Blueprint
-from flask import render_template, redirect, url_for, flash, request
+from flask import session, Blueprint, current_app
+from flask import render_template, redirect, url_for, flash, request, Response, jsonify
 from flask_login import login_required, current_user, login_user, logout_user
-from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 import logging
 import secrets
 
-from extensions import db, login_manager
-from models import User, QuizSession, QuizResult, Question, UserProgress, QuizSessionQuestion
+from extensions import db
+from models import User, QuizSession, QuizResult, UserProgress, QuizSessionQuestion
 from forms import RegistrationForm, LoginForm, QuizSelectionForm, UpdateProfileForm
-from hierarchy import SUBJECT_TREE
+from hierarchy_index import LEVELS, SUBJECTS, TREE_ETAG, TREE_JSON, child_names, is_valid_path
+from question_pool import question_pool
+from progress_buffer import pending_progress
+from leaderboard import PERIODS as LEADERBOARD_PERIODS, top_entries
+from quiz_service import (FAST_MODE, AnswerRejected, create_quiz, fast_quiz_payload, finish_quiz,
+                          load_quiz, submit_answer)
+from weak_topics import get_weak_topics
+from query_budget import query_budget
+from passwords import PasswordHasherBusy, password_hasher
+import metrics
 
 # --- تهيئة الـ Blueprints ---
 main_bp = Blueprint('main', __name__)
@@ -29,59 +38,31 @@ def generate_session_token():
 
 def validate_hierarchy(form_data):
     """التحقق من صحة التدرج الهرمي."""
-    current_level = SUBJECT_TREE
-    try:
-        for level in ['subject', 'specialization', 'topic', 'sub_topic']:
-            if not form_data.get(level):
-                continue
-            value = form_data[level]
-            if value not in current_level:
-                return False
-            current_level = current_level[value]
-        return True
-    except Exception as e:
-        logger.error(f"خطأ في التحقق من التدرج: {str(e)}")
-        return False
+    return is_valid_path(form_data.get(level) for level in LEVELS)
 
 def calculate_adaptive_difficulty(user_id, subject):
     """حساب الصعوبة التكيفية بناءً على أداء المستخدم."""
-    progress = UserProgress.query.filter_by(user_id=user_id, category=subject).first()
-    if not progress or progress.total_count < 5:
+    correct_count, total_count = db.session.query(
+        db.func.coalesce(db.func.sum(UserProgress.correct_count), 0),
+        db.func.coalesce(db.func.sum(UserProgress.total_count), 0)
+    ).filter_by(user_id=user_id, category=subject).one()
+    # إضافة الإجابات التي لم تُفرَّغ بعد من جلسات المستخدم النشطة
+    pending_correct, pending_total = pending_progress(user_id, subject)
+    correct_count += pending_correct
+    total_count += pending_total
+    if total_count < 5:
         return 'متوسط'
-    success_rate = progress.correct_count / progress.total_count
+    success_rate = correct_count / total_count
     if success_rate > 0.8:
         return 'صعب'
     elif success_rate < 0.4:
         return 'سهل'
     return 'متوسط'
 
-def update_user_progress(user_id, question, is_correct):
-    """تحديث تقدم المستخدم في قاعدة البيانات."""
-    progress = UserProgress.query.filter_by(
-        user_id=user_id,
-        category=question.category,
-        topic=question.topic
-    ).first()
-
-    if not progress:
-        progress = UserProgress(
-            user_id=user_id,
-            category=question.category,
-            topic=question.topic,
-            correct_count=0,
-            total_count=0
-        )
-        db.session.add(progress)
-
-    progress.total_count += 1
-    if is_correct:
-        progress.correct_count += 1
-    progress.last_updated = datetime.now(timezone.utc)
-    db.session.commit()
-
 # --- مسارات المصادقة ---
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@query_budget(3)
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
@@ -92,16 +73,22 @@ def register():
             flash('اسم المستخدم أو البريد الإلكتروني موجود مسبقًا', 'danger')
             return redirect(url_for('auth.register'))
 
+        try:
+            password_hash = password_hasher.hash(form.password.data)
+        except PasswordHasherBusy:
+            flash('الخادم مشغول حاليًا، يرجى المحاولة بعد قليل', 'warning')
+            return render_template('register.html', form=form), 503
+
         new_user = User(
             username=form.username.data,
             email=form.email.data,
-            password_hash=generate_password_hash(form.password.data)
+            password_hash=password_hash
         )
         try:
             db.session.add(new_user)
             db.session.commit()
             flash('تم التسجيل بنجاح! يمكنك تسجيل الدخول الآن', 'success')
-            return redirect(url_for('auth_bp.login'))
+            return redirect(url_for('auth.login'))
         except Exception as e:
             db.session.rollback()
             logger.error(f"فشل التسجيل: {str(e)}")
@@ -109,11 +96,20 @@ def register():
     return render_template('register.html', form=form)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@query_budget(5)
 def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and check_password_hash(user.password_hash, form.password.data):
+        try:
+            authenticated = user is not None and password_hasher.verify_and_update(user, form.password.data)
+        except PasswordHasherBusy:
+            flash('الخادم مشغول حاليًا، يرجى المحاولة بعد قليل', 'warning')
+            return render_template('login.html', form=form), 503
+        if authenticated:
+            if db.session.is_modified(user):
+                # حفظ البصمة المعاد حسابها بعد تغيير إعدادات التجزئة
+                db.session.commit()
             login_user(user)
             flash('تم تسجيل الدخول بنجاح!', 'success')
             return redirect(url_for('main.home'))
@@ -121,31 +117,47 @@ def login():
     return render_template('login.html', form=form)
 
 @auth_bp.route('/logout')
+@query_budget(1)
 @login_required
 def logout():
     logout_user()
     flash('تم تسجيل الخروج بنجاح', 'success')
-    return redirect(url_for('main_bp.home'))
+    return redirect(url_for('main.home'))
 
 @auth_bp.route('/profile', methods=['GET', 'POST'])
+# مزامنة ذاكرة المستخدمين، وجلب الصف وتحديثه، وتسجيل حدث الإسقاط وتقليم القديم منها
+@query_budget(5)
 @login_required
 def profile():
     form = UpdateProfileForm(obj=current_user)
     if form.validate_on_submit():
-        current_user.username = form.username.data
-        current_user.email = form.email.data
+        # current_user نسخة مخزنة للقراءة فقط؛ التعديل على صف المستخدم نفسه
+        user = db.session.get(User, current_user.id)
+        user.username = form.username.data
+        user.email = form.email.data
         db.session.commit()
         flash('تم تحديث البيانات الشخصية بنجاح', 'success')
-        return redirect(url_for('auth_bp.profile'))
+        return redirect(url_for('auth.profile'))
     return render_template('profile.html', form=form)
 
 # --- المسارات الرئيسية ---
 
 @main_bp.route('/')
+@query_budget(1)
 def home():
     return render_template('index.html')
 
+@main_bp.route('/metrics')
+@query_budget(0)
+def prometheus_metrics():
+    """مقاييس العملية بصيغة Prometheus النصية"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @main_bp.route('/dashboard')
+@query_budget(2)
 @login_required
 def dashboard():
     try:
@@ -157,29 +169,38 @@ def dashboard():
         return redirect(url_for('main.home'))
 
 @main_bp.route('/leaderboard')
+@query_budget(2)
 @login_required
 def leaderboard():
     try:
-        top_users = User.query.join(QuizResult, User.id == QuizResult.user_id)\
-            .group_by(User.id)\
-            .order_by(db.func.sum(QuizResult.score).desc())\
-            .limit(10)\
-            .all()
-        return render_template('leaderboard.html', top_users=top_users)
+        period = request.args.get('period', 'all')
+        if period not in LEADERBOARD_PERIODS:
+            period = 'all'
+        entries = top_entries(period, limit=10)
+        return render_template('leaderboard.html', entries=entries, period=period)
     except Exception as e:
         logger.error(f"خطأ في تحميل قائمة المتصدرين: {str(e)}", exc_info=True)
         flash('حدث خطأ أثناء تحميل قائمة المتصدرين', 'danger')
-        return redirect(url_for('main_bp.home'))
+        return redirect(url_for('main.home'))
 
 # --- مسارات الاختبارات ---
 
 @quiz_bp.route('/selection', methods=['GET', 'POST'])
+@query_budget(1)
 @login_required
 def selection():
     form = QuizSelectionForm()
-    form.subject.choices = [(subj, subj) for subj in SUBJECT_TREE.keys()]
+    form.subject.choices = [(subj, subj) for subj in SUBJECTS]
 
     if request.method == 'POST':
+        # خيارات المستويات الفرعية حسب المسار المرسل، وإلا يُرفض أي اختيار فيها
+        form.specialization.choices = [(name, name) for name in child_names([form.subject.data])]
+        form.topic.choices = [
+            (name, name) for name in child_names([form.subject.data, form.specialization.data])
+        ]
+        form.sub_topic.choices = [('', '')] + [
+            (name, name) for name in child_names([form.subject.data, form.specialization.data, form.topic.data])
+        ]
         # التحقق من صحة البيانات وحفظها
         if form.validate_on_submit():
             # حفظ بيانات الاختيار والانتقال إلى بدء الاختبار
@@ -199,98 +220,116 @@ def selection():
         form.sub_topic.choices = [('', 'اختر الموضوع أولاً')]
 
 
-    return render_template('selection.html', form=form, subject_tree=SUBJECT_TREE)
+    return render_template('selection.html', form=form,
+                           hierarchy_url=url_for('quiz.hierarchy', v=TREE_ETAG))
+
+@quiz_bp.route('/hierarchy.json')
+@query_budget(0)
+def hierarchy():
+    """شجرة المواد بصيغة JSON مع ETag ثابت وتخزين مؤقت طويل."""
+    response = Response(TREE_JSON, mimetype='application/json')
+    response.set_etag(TREE_ETAG)
+    # الرابط يحمل بصمة الشجرة، فأي تغيير فيها ينتج رابطًا جديدًا
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
 
 @quiz_bp.route('/start', methods=['GET'])
+# مع مزامنة ذاكرة المستخدمين وفحص الجلسات الخاملة الدوري وحذف الاختبار السابق المتروك
+# وتفريغ تقدمه إلى UserProgress وUserProgressDay
+@query_budget(14)
 @login_required
 def start_quiz():
-    """بدء اختبار جديد مع التركيز على الأخطاء السابقة."""
+    """بدء اختبار جديد مع التركيز على الأخطاء السابقة.
+
+    مع ?mode=fast يُعاد الاختبار كاملًا بصيغة JSON دون الإجابات، ويرسل
+    العميل كل الإجابات في طلب واحد إلى /api/v1/quiz/<token>/answers.
+    """
+    fast_mode = request.args.get('mode') == FAST_MODE
     try:
         form_data = session.get('quiz_selection')
         if not form_data:
-            flash('يرجى اختيار تفاصيل الاختبار أولاً', 'danger')
-            return redirect(url_for('quiz.selection'))
+            return _start_failed(fast_mode, 'يرجى اختيار تفاصيل الاختبار أولاً', 'danger', 'quiz.selection')
 
         # التحقق من صحة التدرج الهرمي
         if not validate_hierarchy(form_data):
-            flash('مسار الموضوع غير صالح', 'danger')
-            return redirect(url_for('quiz.selection'))
+            return _start_failed(fast_mode, 'مسار الموضوع غير صالح', 'danger', 'quiz.selection')
 
         # حساب الصعوبة التكيفية
         form_data['difficulty'] = calculate_adaptive_difficulty(current_user.id, form_data['subject'])
 
         # جلب الأسئلة ذات الصلة
-        questions = Question.query.filter_by(
-            category=form_data['subject'],
-            topic=form_data['topic'],
-            difficulty=form_data['difficulty']
-        ).order_by(db.func.random()).limit(form_data['count']).all()
+        questions = question_pool.sample(
+            form_data['subject'],
+            form_data['topic'],
+            form_data['difficulty'],
+            form_data['count']
+        )
 
         if not questions:
-            flash('لا توجد أسئلة متاحة لهذا الاختبار. الرجاء اختيار إعدادات مختلفة.', 'warning')
-            return redirect(url_for('quiz.selection'))
-
-        # إنشاء جلسة الاختبار
-        new_session = QuizSession(
-            user_id=current_user.id,
-            session_data={
-                'current_index': 0,
-                'score': 0,
-                'time_spent': 0.0
-            },
+            return _start_failed(fast_mode, 'لا توجد أسئلة متاحة لهذا الاختبار. الرجاء اختيار إعدادات مختلفة.',
+                                 'warning', 'quiz.selection', 404)
+
+        # إنشاء جلسة الاختبار في المخزن المهيأ مع تفريغ تقدم الاختبار السابق المتروك
+        quiz = create_quiz(
+            generate_session_token(),
+            current_user.id,
+            questions,
             subject_path=[
                 form_data['subject'],
                 form_data.get('specialization', ''),
                 form_data.get('topic', ''),
                 form_data.get('sub_topic', '')
             ],
-            session_token=generate_session_token()
+            previous_token=session.get('quiz_session'),
+            mode=FAST_MODE if fast_mode else None
         )
-        db.session.add(new_session)
-        db.session.flush()
-
-        # إضافة الأسئلة إلى الجلسة
-        for idx, question in enumerate(questions):
-            session_question = QuizSessionQuestion(
-                session_id=new_session.id,
-                question_id=question.id,
-                order=idx
-            )
-            db.session.add(session_question)
+
+        if fast_mode:
+            payload = fast_quiz_payload(quiz, questions)
+            db.session.commit()
+            return jsonify({'success': True, 'data': payload}), 200
 
         db.session.commit()
-        session['quiz_session'] = new_session.session_token
+        session['quiz_session'] = quiz.session_token
 
         return redirect(url_for('quiz.show_question'))
     except Exception as e:
+        db.session.rollback()
         logger.error(f"خطأ في بدء الاختبار: {str(e)}", exc_info=True)
-        flash('فشل في بدء الاختبار، يرجى المحاولة لاحقًا', 'danger')
-        return redirect(url_for('main_bp.home'))
+        return _start_failed(fast_mode, 'فشل في بدء الاختبار، يرجى المحاولة لاحقًا', 'danger', 'main.home', 500)
+
+def _start_failed(fast_mode, message, category, endpoint, status=400):
+    """رد فشل بدء الاختبار: JSON في الوضع السريع، وإلا رسالة وإعادة توجيه."""
+    if fast_mode:
+        return jsonify({'success': False, 'error': message}), status
+    flash(message, category)
+    return redirect(url_for(endpoint))
 
 @quiz_bp.route('/question', methods=['GET', 'POST'])
+# الإجابة التي تبلغ حد التفريغ تضيف دفعتي upsert للتقدم اليومي والتراكمي
+@query_budget(6)
 @login_required
 def show_question():
     """عرض السؤال الحالي"""
     try:
-        quiz_session = QuizSession.query.filter_by(
-            session_token=session.get('quiz_session'),
-            user_id=current_user.id
-        ).first()
+        token = session.get('quiz_session')
+        quiz_session, snapshot, current_index = load_quiz(token, current_user.id)
 
         if not quiz_session:
             flash('لا يوجد اختبار نشط', 'warning')
-            return redirect(url_for('main_bp.dashboard'))
+            return redirect(url_for('main.dashboard'))
 
-        current_index = quiz_session.session_data['current_index']
-        session_questions = quiz_session.questions
-        if current_index >= len(session_questions):
+        if current_index >= len(snapshot):
             return redirect(url_for('quiz.submit_quiz'))
 
-        question = session_questions[current_index].question
+        current_item = snapshot.items[current_index]
+        question = current_item.question
         progress = {
             'current': current_index + 1,
-            'total': len(session_questions),
-            'percentage': ((current_index + 1) / len(session_questions)) * 100
+            'total': len(snapshot),
+            'percentage': ((current_index + 1) / len(snapshot)) * 100
         }
 
         if request.method == 'POST':
@@ -299,103 +338,87 @@ def show_question():
                 flash('يرجى اختيار إجابة', 'warning')
                 return redirect(url_for('quiz.show_question'))
 
-            is_correct = selected_option == question.correct_answer
-            session_questions[current_index].user_answer = selected_option
-            session_questions[current_index].is_correct = is_correct
-            session_questions[current_index].is_answered = True
-
-            quiz_session.session_data['current_index'] += 1
-            if is_correct:
-                quiz_session.session_data['score'] += 1
-
-            # تحديث تقدم المستخدم
-            update_user_progress(current_user.id, question, is_correct)
-
-            db.session.commit()
+            # ترتيب السؤال المعروض يجعل إعادة إرسال النموذج تكرارًا للإجابة نفسها
+            # لا إجابة للسؤال التالي؛ النماذج التي لا ترسله تجيب عن السؤال الحالي
+            order = request.form.get('order', current_index, type=int)
+            try:
+                submit_answer(token, current_user.id, order, selected_option, loaded=(quiz_session, snapshot))
+            except AnswerRejected as e:
+                db.session.rollback()
+                if e.reason == 'conflict':
+                    flash('تم تسجيل إجابة هذا السؤال مسبقًا', 'warning')
 
             return redirect(url_for('quiz.show_question'))
 
         return render_template('question.html',
                                question=question,
+                               order=current_item.order,
                                progress=progress)
 
     except Exception as e:
         logger.error(f"خطأ في عرض السؤال: {str(e)}")
         flash('حدث خطأ في تحميل السؤال', 'danger')
-        return redirect(url_for('main_bp.dashboard'))
+        return redirect(url_for('main.dashboard'))
 
 @quiz_bp.route('/submit', methods=['GET'])
+@query_budget(11)
 @login_required
 def submit_quiz():
     """إنهاء الاختبار وعرض النتائج"""
     try:
-        quiz_session = QuizSession.query.filter_by(
-            session_token=session.get('quiz_session'),
-            user_id=current_user.id
-        ).first()
-        if not quiz_session:
+        # حفظ النتيجة وتفريغ التقدم المعلق وحذف الجلسة في معاملة واحدة
+        result_id = finish_quiz(session.get('quiz_session'), current_user.id)
+        if result_id is None:
             flash('لا يوجد اختبار نشط', 'danger')
-            return redirect(url_for('main_bp.dashboard'))
-
-        total_questions = len(quiz_session.questions)
-        correct_answers = quiz_session.session_data['score']
-
-        # حفظ نتيجة الاختبار
-        quiz_result = QuizResult(
-            user_id=current_user.id,
-            score=correct_answers,
-            total_questions=total_questions,
-            time_taken=int((datetime.now(timezone.utc) - quiz_session.created_at).total_seconds()),
-            date_taken=datetime.now(timezone.utc)
-        )
-        db.session.add(quiz_result)
-
-        # حذف الجلسة
-        db.session.delete(quiz_session)
-        db.session.commit()
+            return redirect(url_for('main.dashboard'))
         session.pop('quiz_session', None)
         session.pop('quiz_selection', None)
 
         flash('تم إنهاء الاختبار بنجاح!', 'success')
-        return redirect(url_for('quiz.view_results', result_id=quiz_result.id))
+        return redirect(url_for('quiz.view_results', result_id=result_id))
 
+    except StaleDataError:
+        # إجابة متزامنة غيّرت الجلسة بعد قراءتها؛ الإنهاء يُعاد على الحالة الجديدة
+        db.session.rollback()
+        return redirect(url_for('quiz.submit_quiz'))
     except Exception as e:
         logger.error(f"خطأ في إنهاء الاختبار: {str(e)}", exc_info=True)
         flash('حدث خطأ أثناء إنهاء الاختبار', 'danger')
-        return redirect(url_for('main_bp.dashboard'))
+        return redirect(url_for('main.dashboard'))
 
 @quiz_bp.route('/results/<int:result_id>')
+@query_budget(3)
 @login_required
 def view_results(result_id):
     """عرض نتائج الاختبار مع تحليل الأخطاء."""
     quiz_result = QuizResult.query.get_or_404(result_id)
     if quiz_result.user_id != current_user.id:
         flash('ليس لديك صلاحية لعرض هذه النتائج', 'danger')
-        return redirect(url_for('main_bp.dashboard'))
+        return redirect(url_for('main.dashboard'))
 
-    # تحليل الأخطاء
-    incorrect_questions = QuizSessionQuestion.query.join(QuizSession).filter(
-        QuizSession.user_id == current_user.id,
-        QuizSessionQuestion.is_correct == False
-    ).all()
-    weak_topics = {}
-    for q in incorrect_questions:
-        topic = q.question.topic
-        weak_topics[topic] = weak_topics.get(topic, 0) + 1
+    # تحليل الأخطاء من عدادات التقدم الدائمة (جلسات الاختبار تُحذف عند الإنهاء)
+    weak_topics = dict(get_weak_topics(
+        current_user.id,
+        limit=current_app.config.get('WEAK_TOPICS_LIMIT', 5),
+        days=current_app.config.get('WEAK_TOPICS_DAYS') or None
+    ))
 
     return render_template('results.html', quiz_result=quiz_result, weak_topics=weak_topics)
 
 @quiz_bp.route('/review/<int:result_id>')
+@query_budget(3)
 @login_required
 def review_quiz(result_id):
     """مراجعة الاختبار مع شرح الأخطاء."""
     quiz_result = QuizResult.query.get_or_404(result_id)
     if quiz_result.user_id != current_user.id:
         flash('ليس لديك صلاحية لمراجعة هذا الاختبار', 'danger')
-        return redirect(url_for('main_bp.dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     # جلب الأسئلة والإجابات
-    quiz_questions = QuizSessionQuestion.query.join(QuizSession).filter(
+    quiz_questions = QuizSessionQuestion.query.options(
+        joinedload(QuizSessionQuestion.question)
+    ).join(QuizSession).filter(
         QuizSession.user_id == current_user.id,
         QuizResult.id == result_id
     ).all()
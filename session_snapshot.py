@@ -0,0 +1,163 @@
+# session_snapshot.py
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+from models import Question, QuizSession, QuizSessionQuestion
+
+
+@dataclass(frozen=True)
+class QuestionView:
+    """نسخة للقراءة فقط من بيانات السؤال المعروضة أثناء الاختبار."""
+    id: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: str
+    category: str
+    topic: str
+    difficulty: str
+    explanation: Optional[str]
+
+
+@dataclass(frozen=True)
+class SnapshotItem:
+    id: int
+    order: int
+    # None لسؤال حُذف من البنك أثناء الاختبار
+    question: Optional[QuestionView]
+
+    @property
+    def missing(self) -> bool:
+        return self.question is None
+
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """أسئلة جلسة الاختبار مرتبة حسب QuizSessionQuestion.order."""
+    session_id: int
+    user_id: int
+    items: Tuple[SnapshotItem, ...]
+
+    def __len__(self):
+        return len(self.items)
+
+    def next_order(self, order: int) -> int:
+        """أول ترتيب من order فما بعده لسؤال غير محذوف، أو عدد العناصر."""
+        while order < len(self.items) and self.items[order].missing:
+            order += 1
+        return order
+
+
+class SnapshotCache:
+    """ذاكرة LRU محدودة للقطات الجلسات مفهرسة برمز الجلسة."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[SessionSnapshot]:
+        with self._lock:
+            snapshot = self._entries.get(token)
+            if snapshot is not None:
+                self._entries.move_to_end(token)
+            return snapshot
+
+    def put(self, token: str, snapshot: SessionSnapshot) -> None:
+        max_size = current_app.config.get('SESSION_SNAPSHOT_CACHE_SIZE', 1024)
+        with self._lock:
+            self._entries[token] = snapshot
+            self._entries.move_to_end(token)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+snapshot_cache = SnapshotCache()
+
+
+def _question_view(question) -> QuestionView:
+    return QuestionView(
+        id=question.id,
+        question_text=question.question_text,
+        option_a=question.option_a,
+        option_b=question.option_b,
+        option_c=question.option_c,
+        option_d=question.option_d,
+        correct_answer=question.correct_answer,
+        category=question.category,
+        topic=question.topic,
+        difficulty=question.difficulty,
+        explanation=question.explanation
+    )
+
+
+def _build_snapshot(quiz_session: QuizSession) -> SessionSnapshot:
+    items = tuple(
+        SnapshotItem(id=row.id, order=row.order, question=_question_view(row.question))
+        for row in sorted(quiz_session.questions, key=lambda r: r.order)
+    )
+    return SessionSnapshot(session_id=quiz_session.id, user_id=quiz_session.user_id, items=items)
+
+
+def load_session_snapshot(token: str, user_id: int) -> Tuple[Optional[QuizSession], Optional[SessionSnapshot]]:
+    """تحميل جلسة الاختبار مع أسئلتها المرتبة.
+
+    عند وجود لقطة مخزنة يُقرأ صف الجلسة وحده (لحالة التقدم)، وإلا تُجلب
+    الجلسة وصفوف أسئلتها ونصوص الأسئلة في استعلام واحد.
+    """
+    if not token:
+        return None, None
+
+    snapshot = snapshot_cache.get(token)
+    if snapshot is not None and snapshot.user_id == user_id:
+        quiz_session = QuizSession.query.filter_by(session_token=token, user_id=user_id).first()
+        if quiz_session is not None and quiz_session.id == snapshot.session_id:
+            return quiz_session, snapshot
+        snapshot_cache.invalidate(token)
+        return None, None
+
+    quiz_session = QuizSession.query.options(
+        joinedload(QuizSession.questions).joinedload(QuizSessionQuestion.question)
+    ).filter_by(session_token=token, user_id=user_id).first()
+    if quiz_session is None:
+        return None, None
+
+    snapshot = _build_snapshot(quiz_session)
+    snapshot_cache.put(token, snapshot)
+    return quiz_session, snapshot
+
+
+def load_question_snapshot(token: str, user_id: int, question_ids: List[int]) -> SessionSnapshot:
+    """لقطة أسئلة جلسة من مخزن الجلسات النشطة، مرتبة كترتيب question_ids.
+
+    لا صفوف QuizSessionQuestion لهذه الجلسات: معرف العنصر معرف السؤال،
+    وsession_id صفر. الأسئلة المحذوفة من البنك أثناء الاختبار تبقى في
+    مواضعها بلا سؤال، فلا تتغير ترتيبات الإجابات المسجلة في حالة الجلسة.
+    """
+    snapshot = snapshot_cache.get(token)
+    if snapshot is not None and snapshot.user_id == user_id:
+        return snapshot
+
+    by_id = {question.id: question for question in Question.query.filter(Question.id.in_(question_ids))}
+    items = tuple(
+        SnapshotItem(id=question_id, order=order,
+                     question=_question_view(by_id[question_id]) if question_id in by_id else None)
+        for order, question_id in enumerate(question_ids)
+    )
+    snapshot = SessionSnapshot(session_id=0, user_id=user_id, items=items)
+    snapshot_cache.put(token, snapshot)
+    return snapshot
+
+
+def invalidate_session_snapshot(token: str) -> None:
+    snapshot_cache.invalidate(token)
@@ -0,0 +1,282 @@
+# session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from flask import Flask
+
+# الخلفيات المتاحة؛ database تعني صفوف quiz_session في القاعدة الرئيسية دون مخزن
+BACKENDS = ('database', 'memory', 'sqlite')
+
+
+@dataclass
+class ActiveSession:
+    """حالة اختبار نشط تُحفظ خارج القاعدة الرئيسية حتى إنهائه أو انتهاء مدته.
+
+    answers مفاتيحها ترتيب السؤال نصًا (كمفاتيح JSON) وقيمها [الإجابة، صحيحة]،
+    وprogress فروق التقدم المعلقة بصيغة progress_buffer.
+    """
+    session_token: str
+    user_id: int
+    question_ids: List[int]
+    subject_path: List[str]
+    started_at: float
+    mode: Optional[str] = None
+    current_index: int = 0
+    score: int = 0
+    answers: Dict[str, list] = field(default_factory=dict)
+    progress: Dict[str, list] = field(default_factory=dict)
+    version: int = 1
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.started_at, timezone.utc)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str, version: int) -> 'ActiveSession':
+        return cls(**dict(json.loads(data), version=version))
+
+
+class SessionStore(ABC):
+    """واجهة مخزن الاختبارات النشطة.
+
+    التحديث مقارنة وتبديل على رقم النسخة كعمود version في quiz_session،
+    والإنهاء يحجز الجلسة بحذفها فلا يُنهيها طلبان. الجلسة التي لم تُكتب
+    منذ ttl ثانية تُعد منتهية: لا تعيدها get وتُسلَّم إلى pop_expired.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    def create(self, state: ActiveSession) -> None:
+        """حفظ جلسة جديدة، أو إعادة جلسة محجوزة فشل إنهاؤها."""
+
+    @abstractmethod
+    def get(self, token: str) -> Optional[ActiveSession]:
+        ...
+
+    @abstractmethod
+    def replace(self, state: ActiveSession) -> bool:
+        """كتابة state إن بقيت نسختها المخزنة state.version، وزيادتها؛ False إن سبقها تحديث آخر."""
+
+    @abstractmethod
+    def pop(self, token: str) -> Optional[ActiveSession]:
+        """حذف الجلسة وإعادتها؛ None إن حُذفت قبل ذلك."""
+
+    @abstractmethod
+    def for_user(self, user_id: int) -> List[ActiveSession]:
+        ...
+
+    @abstractmethod
+    def pop_expired(self, limit: int) -> List[ActiveSession]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """الجلسات في ذاكرة العملية: أسرع الخلفيات، لكنها لا تصلح إلا لعملية
+    خادم واحدة، وتضيع الاختبارات الجارية عند إعادة تشغيلها."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        # الرمز -> (النسخة، وقت الانتهاء، JSON)؛ النسخ المخزنة نصوص فلا تُعدَّل خارج replace
+        self._entries: Dict[str, tuple] = {}
+        self._by_user: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, token: str, now: float) -> Optional[ActiveSession]:
+        entry = self._entries.get(token)
+        if entry is None or entry[1] < now:
+            return None
+        return ActiveSession.from_json(entry[2], entry[0])
+
+    def _discard(self, token: str) -> Optional[tuple]:
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            user_id = json.loads(entry[2])['user_id']
+            tokens = self._by_user.get(user_id, set())
+            tokens.discard(token)
+            if not tokens:
+                self._by_user.pop(user_id, None)
+        return entry
+
+    def create(self, state: ActiveSession) -> None:
+        with self._lock:
+            self._entries[state.session_token] = (state.version, time.time() + self.ttl, state.to_json())
+            self._by_user.setdefault(state.user_id, set()).add(state.session_token)
+
+    def get(self, token: str) -> Optional[ActiveSession]:
+        with self._lock:
+            return self._load(token, time.time())
+
+    def replace(self, state: ActiveSession) -> bool:
+        with self._lock:
+            entry = self._entries.get(state.session_token)
+            if entry is None or entry[0] != state.version:
+                return False
+            state.version += 1
+            self._entries[state.session_token] = (state.version, time.time() + self.ttl, state.to_json())
+            return True
+
+    def pop(self, token: str) -> Optional[ActiveSession]:
+        with self._lock:
+            entry = self._discard(token)
+        return ActiveSession.from_json(entry[2], entry[0]) if entry else None
+
+    def for_user(self, user_id: int) -> List[ActiveSession]:
+        now = time.time()
+        with self._lock:
+            states = [self._load(token, now) for token in self._by_user.get(user_id, ())]
+        return [state for state in states if state is not None]
+
+    def pop_expired(self, limit: int) -> List[ActiveSession]:
+        now = time.time()
+        with self._lock:
+            tokens = [token for token, entry in self._entries.items() if entry[1] < now][:limit]
+            entries = [self._discard(token) for token in tokens]
+        return [ActiveSession.from_json(entry[2], entry[0]) for entry in entries]
+
+
+class SQLiteSessionStore(SessionStore):
+    """الجلسات في قاعدة SQLite جانبية بوضع WAL تتشاركها عمليات الخادم على
+    الجهاز نفسه وتبقى بعد إعادة التشغيل، دون أن تمس كتابات الإجابات القاعدة
+    الرئيسية. كل خيط يفتح اتصاله الخاص، ويُعاد فتحه بعد التفرع."""
+
+    def __init__(self, path: str, ttl: float):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS active_session ('
+            ' token TEXT PRIMARY KEY, user_id INTEGER NOT NULL, version INTEGER NOT NULL,'
+            ' expires_at REAL NOT NULL, data TEXT NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_active_session_user ON active_session (user_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_active_session_expires ON active_session (expires_at)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # isolation_level=None: كل جملة معاملة مستقلة، والتحديث المشروط يغني عن الأقفال
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # في وضع WAL يبقى الملف متسقًا بعد انقطاع الطاقة ويُفقد آخر ما كُتب فقط
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def create(self, state: ActiveSession) -> None:
+        self._conn().execute(
+            'INSERT OR REPLACE INTO active_session (token, user_id, version, expires_at, data) VALUES (?, ?, ?, ?, ?)',
+            (state.session_token, state.user_id, state.version, time.time() + self.ttl, state.to_json())
+        )
+
+    def get(self, token: str) -> Optional[ActiveSession]:
+        row = self._conn().execute(
+            'SELECT data, version FROM active_session WHERE token = ? AND expires_at >= ?', (token, time.time())
+        ).fetchone()
+        return ActiveSession.from_json(*row) if row else None
+
+    def replace(self, state: ActiveSession) -> bool:
+        version = state.version
+        state.version += 1
+        updated = self._conn().execute(
+            'UPDATE active_session SET data = ?, version = ?, expires_at = ? WHERE token = ? AND version = ?',
+            (state.to_json(), state.version, time.time() + self.ttl, state.session_token, version)
+        ).rowcount
+        if updated != 1:
+            state.version = version
+        return updated == 1
+
+    def pop(self, token: str) -> Optional[ActiveSession]:
+        row = self._conn().execute(
+            'DELETE FROM active_session WHERE token = ? RETURNING data, version', (token,)
+        ).fetchone()
+        return ActiveSession.from_json(*row) if row else None
+
+    def for_user(self, user_id: int) -> List[ActiveSession]:
+        rows = self._conn().execute(
+            'SELECT data, version FROM active_session WHERE user_id = ? AND expires_at >= ?', (user_id, time.time())
+        ).fetchall()
+        return [ActiveSession.from_json(*row) for row in rows]
+
+    def pop_expired(self, limit: int) -> List[ActiveSession]:
+        rows = self._conn().execute(
+            'DELETE FROM active_session WHERE token IN'
+            ' (SELECT token FROM active_session WHERE expires_at < ? LIMIT ?) RETURNING data, version',
+            (time.time(), limit)
+        ).fetchall()
+        return [ActiveSession.from_json(*row) for row in rows]
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class ActiveSessions:
+    """المخزن المهيأ من ACTIVE_SESSION_STORE، مع توقيت فحوص انتهاء الجلسات.
+
+    مع database (الافتراضي) يبقى enabled خطأ وتعمل الاختبارات على صفوف
+    quiz_session كما هي.
+    """
+
+    def __init__(self):
+        self.backend = 'database'
+        self.store: Optional[SessionStore] = None
+        self.checkpoint_interval = 60.0
+        self._next_checkpoint = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def init_app(self, app: Flask) -> None:
+        self.configure(
+            backend=app.config.get('ACTIVE_SESSION_STORE', 'database'),
+            path=app.config.get('ACTIVE_SESSION_STORE_PATH', 'active_sessions.db'),
+            ttl=app.config.get('ACTIVE_SESSION_TTL', 7200),
+            checkpoint_interval=app.config.get('ACTIVE_SESSION_CHECKPOINT_INTERVAL', 60)
+        )
+
+    def configure(self, backend: str = 'database', path: str = 'active_sessions.db', ttl: float = 7200,
+                  checkpoint_interval: float = 60) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"مخزن جلسات غير معروف: {backend}")
+        if self.store is not None:
+            self.store.close()
+        self.backend = backend
+        self.checkpoint_interval = checkpoint_interval
+        if backend == 'memory':
+            self.store = MemorySessionStore(ttl)
+        elif backend == 'sqlite':
+            self.store = SQLiteSessionStore(path, ttl)
+        else:
+            self.store = None
+
+    def checkpoint_due(self) -> bool:
+        """True مرة واحدة كل checkpoint_interval ثانية في هذه العملية."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_checkpoint:
+                return False
+            self._next_checkpoint = now + self.checkpoint_interval
+            return True
+
+
+active_sessions = ActiveSessions()
@@ -0,0 +1,346 @@
+# synthetic_data.py
+import hashlib
+import itertools
+import logging
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from extensions import db
+from hierarchy_index import leaf_paths
+from leaderboard import rebuild_leaderboard
+from models import (
+    LeaderboardEntry, Question, QuizResult, QuizSession, QuizSessionQuestion, User, UserProgress, UserProgressDay,
+    UserStats
+)
+from passwords import password_hasher
+from question_bank import content_hash
+from question_schema import ANSWER_LETTERS
+from question_pool import question_pool
+from user_stats import backfill_user_stats
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('سهل', 'متوسط', 'صعب')
+DIFFICULTY_WEIGHTS = (0.3, 0.5, 0.2)
+
+# كلمة مرور كل المستخدمين المولَّدين (تُحسب بصمتها مرة واحدة)
+PASSWORD = 'password'
+
+
+@dataclass
+class SeedConfig:
+    """أحجام البيانات المولَّدة؛ scale يضرب عدد المستخدمين وأسئلة كل قسم.
+
+    scale=100 يعطي تقريبًا 100 ألف مستخدم و800 ألف نتيجة و8 ملايين صف
+    في QuizSessionQuestion.
+    """
+    scale: float = 1.0
+    seed: int = 42
+    users_per_scale: int = 1000
+    questions_per_bucket: int = 20
+    quizzes_per_user: float = 8.0
+    questions_per_quiz: int = 10
+    # أس توزيع Zipf لشعبية المواضيع، وأس Pareto لنشاط المستخدمين (أصغر = أكثر انحرافًا)
+    topic_skew: float = 1.1
+    activity_skew: float = 1.3
+    max_quizzes_per_user: int = 500
+    days: int = 180
+    anchor: Optional[datetime] = None
+    batch_size: int = 10000
+
+    @property
+    def users(self) -> int:
+        return max(1, int(self.users_per_scale * self.scale))
+
+    @property
+    def bucket_size(self) -> int:
+        return max(self.questions_per_quiz, int(self.questions_per_bucket * self.scale))
+
+
+@dataclass
+class SeedStats:
+    users: int = 0
+    questions: int = 0
+    results: int = 0
+    sessions: int = 0
+    session_questions: int = 0
+    progress: int = 0
+    progress_days: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return (self.users + self.questions + self.results + self.sessions
+                + self.session_questions + self.progress + self.progress_days)
+
+
+class _BatchWriter:
+    """إدراج صفوف جدول على دفعات عبر Core مع commit بعد كل دفعة."""
+
+    def __init__(self, table, batch_size: int, parents: Sequence['_BatchWriter'] = ()):
+        self.table = table
+        self.batch_size = batch_size
+        # جداول تشير إليها صفوف هذا الجدول وتُدرج قبله دائمًا
+        self.parents = parents
+        self.rows: List[Dict] = []
+        self.written = 0
+
+    def add(self, row: Dict) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for parent in self.parents:
+            parent.flush()
+        if self.rows:
+            db.session.execute(self.table.insert(), self.rows)
+            db.session.commit()
+            self.written += len(self.rows)
+            self.rows = []
+
+
+def _next_id(model) -> int:
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _topics() -> List[Tuple[str, str, str]]:
+    """(المادة، التخصص، الموضوع) لكل موضوع في الشجرة مرتبة ترتيبًا ثابتًا."""
+    seen = {}
+    for path in leaf_paths():
+        topic = path[2] if len(path) > 2 else path[-1]
+        seen.setdefault((path[0], topic), path[1] if len(path) > 1 else '')
+    return sorted((category, specialization, topic) for (category, topic), specialization in seen.items())
+
+
+def _zipf_cum_weights(count: int, skew: float) -> List[float]:
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def _quiz_count(rng: random.Random, config: SeedConfig) -> int:
+    """عدد اختبارات المستخدم من توزيع Pareto: قلة نشطة جدًا وأغلبية قليلة النشاط."""
+    alpha = config.activity_skew
+    mean_scale = config.quizzes_per_user * (alpha - 1) / alpha if alpha > 1 else config.quizzes_per_user
+    return min(config.max_quizzes_per_user, int(rng.paretovariate(alpha) * mean_scale))
+
+
+def _seed_users(rng: random.Random, config: SeedConfig, stats: SeedStats) -> Tuple[int, List[float]]:
+    first_id = _next_id(User)
+    password_hash = password_hasher.hash(PASSWORD)
+    anchor = config.anchor
+    writer = _BatchWriter(User.__table__, config.batch_size)
+    skills = []
+    for offset in range(config.users):
+        user_id = first_id + offset
+        writer.add({
+            'id': user_id,
+            'username': f'seed{config.seed}_{user_id}',
+            'email': f'seed{config.seed}_{user_id}@example.com',
+            'password_hash': password_hash,
+            'created_at': anchor - timedelta(days=config.days + rng.randrange(config.days)),
+            'is_admin': False
+        })
+        # احتمال إجابة المستخدم إجابة صحيحة
+        skills.append(rng.betavariate(5, 3))
+    writer.flush()
+    stats.users = writer.written
+    return first_id, skills
+
+
+def _seed_questions(rng: random.Random, config: SeedConfig, topics,
+                    stats: SeedStats) -> Dict[Tuple[int, str], List[Tuple[int, str]]]:
+    """bucket_size سؤال لكل (موضوع، صعوبة)؛ يعيد (المعرف، الإجابة الصحيحة) لكل قسم."""
+    next_id = _next_id(Question)
+    writer = _BatchWriter(Question.__table__, config.batch_size)
+    buckets: Dict[Tuple[int, str], List[Tuple[int, str]]] = {}
+    for index, (category, _, topic) in enumerate(topics):
+        for difficulty in DIFFICULTIES:
+            ids = buckets[(index, difficulty)] = []
+            for _ in range(config.bucket_size):
+                answer = rng.choice(ANSWER_LETTERS)
+                row = {
+                    'id': next_id,
+                    'question_text': f'سؤال تجريبي {next_id} في {topic} ({config.seed})',
+                    'option_a': f'الخيار الأول {next_id}',
+                    'option_b': f'الخيار الثاني {next_id}',
+                    'option_c': f'الخيار الثالث {next_id}',
+                    'option_d': f'الخيار الرابع {next_id}',
+                    'correct_answer': answer,
+                    'category': category,
+                    'topic': topic,
+                    'difficulty': difficulty,
+                    'explanation': None,
+                    'source': 'synthetic',
+                    'duplicate_of_id': None
+                }
+                row['content_hash'] = content_hash(row)
+                writer.add(row)
+                ids.append((next_id, answer))
+                next_id += 1
+    writer.flush()
+    stats.questions = writer.written
+    return buckets
+
+
+def _seed_activity(rng: random.Random, config: SeedConfig, topics, buckets, first_user_id: int,
+                   skills: Sequence[float], stats: SeedStats) -> None:
+    """نتائج الاختبارات وجلساتها وأسئلتها، مع مجاميع UserProgress لكل (مستخدم، موضوع)
+    وUserProgressDay لكل يوم اختبار."""
+    topic_order = list(range(len(topics)))
+    rng.shuffle(topic_order)
+    topic_weights = _zipf_cum_weights(len(topic_order), config.topic_skew)
+    difficulty_weights = list(itertools.accumulate(DIFFICULTY_WEIGHTS))
+    period = config.days * 86400
+
+    results = _BatchWriter(QuizResult.__table__, config.batch_size)
+    sessions = _BatchWriter(QuizSession.__table__, config.batch_size)
+    session_questions = _BatchWriter(QuizSessionQuestion.__table__, config.batch_size, parents=(sessions,))
+    progress_rows = _BatchWriter(UserProgress.__table__, config.batch_size)
+    progress_day_rows = _BatchWriter(UserProgressDay.__table__, config.batch_size)
+    result_id, session_id, session_question_id = _next_id(QuizResult), _next_id(QuizSession), _next_id(QuizSessionQuestion)
+    per_quiz = config.questions_per_quiz
+
+    for offset, skill in enumerate(skills):
+        user_id = first_user_id + offset
+        progress = defaultdict(lambda: [0, 0, None])
+        progress_days = defaultdict(lambda: [0, 0])
+        # المستخدم يركز على مواضيع قليلة: أغلب اختباراته من مفضلاته
+        favourites = rng.choices(topic_order, cum_weights=topic_weights, k=3)
+        for _ in range(_quiz_count(rng, config)):
+            topic_index = rng.choice(favourites) if rng.random() < 0.7 else \
+                rng.choices(topic_order, cum_weights=topic_weights)[0]
+            difficulty = rng.choices(DIFFICULTIES, cum_weights=difficulty_weights)[0]
+            category, specialization, topic = topics[topic_index]
+            # الاختبارات الأحدث أكثر: التربيع يقرّب التواريخ من نقطة الإرساء
+            taken_at = config.anchor - timedelta(seconds=int(period * rng.random() ** 2))
+            answers = []
+            for question_id, answer in rng.sample(buckets[(topic_index, difficulty)], per_quiz):
+                if rng.random() >= skill:
+                    answer = rng.choice([letter for letter in ANSWER_LETTERS if letter != answer])
+                    answers.append((question_id, answer, False))
+                else:
+                    answers.append((question_id, answer, True))
+            score = sum(correct for _, _, correct in answers)
+
+            sessions.add({
+                'id': session_id,
+                'user_id': user_id,
+                'session_token': hashlib.sha256(f'{config.seed}:{session_id}'.encode()).hexdigest(),
+                'session_data': {'current_index': per_quiz, 'score': score, 'time_spent': 0.0},
+                'subject_path': [category, specialization, topic, ''],
+                'created_at': taken_at.replace(tzinfo=None)
+            })
+            for order, (question_id, answer, correct) in enumerate(answers):
+                session_questions.add({
+                    'id': session_question_id,
+                    'session_id': session_id,
+                    'question_id': question_id,
+                    'order': order,
+                    'user_answer': answer,
+                    'is_correct': correct,
+                    'is_answered': True
+                })
+                session_question_id += 1
+            results.add({
+                'id': result_id,
+                'user_id': user_id,
+                'score': score,
+                'total_questions': per_quiz,
+                'time_taken': per_quiz * rng.randint(10, 60),
+                'date_taken': taken_at
+            })
+            session_id += 1
+            result_id += 1
+
+            entry = progress[(category, topic)]
+            entry[0] += score
+            entry[1] += per_quiz
+            entry[2] = max(entry[2] or taken_at, taken_at)
+            day_entry = progress_days[(category, topic, taken_at.date())]
+            day_entry[0] += score
+            day_entry[1] += per_quiz
+
+        for (category, topic), (correct, total, updated) in progress.items():
+            progress_rows.add({
+                'user_id': user_id,
+                'category': category,
+                'topic': topic,
+                'correct_count': correct,
+                'total_count': total,
+                'last_updated': updated
+            })
+        for (category, topic, day), (correct, total) in progress_days.items():
+            progress_day_rows.add({
+                'user_id': user_id,
+                'category': category,
+                'topic': topic,
+                'day': day,
+                'correct_count': correct,
+                'total_count': total
+            })
+
+    for writer in (results, session_questions, progress_rows, progress_day_rows):
+        writer.flush()
+    stats.results = results.written
+    stats.sessions = sessions.written
+    stats.session_questions = session_questions.written
+    stats.progress = progress_rows.written
+    stats.progress_days = progress_day_rows.written
+
+
+SEEDED_MODELS = (UserProgressDay, UserProgress, QuizSessionQuestion, QuizSession, QuizResult, Question, User)
+
+
+def reset_tables() -> None:
+    """حذف كل صفوف الجداول التي يملؤها المولّد والجداول المشتقة منها."""
+    for model in (LeaderboardEntry, UserStats) + SEEDED_MODELS:
+        db.session.execute(model.__table__.delete())
+    db.session.commit()
+
+
+def _fast_load(enabled: bool) -> None:
+    """تخفيف ضمانات الكتابة في SQLite أثناء التحميل فقط؛ البيانات قابلة لإعادة التوليد."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return
+    db.session.commit()
+    db.session.execute(db.text(f"PRAGMA synchronous = {'OFF' if enabled else 'FULL'}"))
+
+
+def seed_dataset(config: SeedConfig, reset: bool = False, aggregates: bool = True) -> SeedStats:
+    """توليد مجموعة بيانات اصطناعية حتمية من config.seed.
+
+    نفس البذرة ونفس نقطة الإرساء (anchor) على قاعدة فارغة تعطي نفس الصفوف
+    بالمعرفات نفسها. الأسئلة تغطي كل مواضيع الشجرة وكل الصعوبات، وشعبية
+    المواضيع تتبع Zipf ونشاط المستخدمين يتبع Pareto. مع aggregates تُعاد
+    بناء إحصاءات المستخدمين ولوحة المتصدرين من النتائج المولَّدة.
+    """
+    if config.anchor is None:
+        config.anchor = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(config.seed)
+    stats = SeedStats()
+    started = time.perf_counter()
+    if reset:
+        reset_tables()
+
+    _fast_load(True)
+    try:
+        topics = _topics()
+        first_user_id, skills = _seed_users(rng, config, stats)
+        logger.info(f"المستخدمون: {stats.users}")
+        buckets = _seed_questions(rng, config, topics, stats)
+        logger.info(f"الأسئلة: {stats.questions} في {len(topics)} موضوع")
+        _seed_activity(rng, config, topics, buckets, first_user_id, skills, stats)
+        logger.info(f"النتائج: {stats.results} | أسئلة الجلسات: {stats.session_questions}")
+        if aggregates:
+            backfill_user_stats(batch_size=config.batch_size)
+            rebuild_leaderboard(batch_size=config.batch_size)
+            db.session.commit()
+    finally:
+        _fast_load(False)
+    question_pool.invalidate()
+    stats.elapsed = time.perf_counter() - started
+    return stats
@@ -0,0 +1,150 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# الإعدادات تُقرأ عند استيراد config، فتُضبط قبل استيراد التطبيق
+_WORKDIR = tempfile.mkdtemp(prefix='quiz-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_WORKDIR, 'test.db')
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')
+# ميزانيات المسارات تُفرض في الاختبارات فيفشل أي مسار يتجاوزها
+os.environ['QUERY_BUDGET_MODE'] = 'raise'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['ACTIVE_SESSION_STORE'] = 'database'
+
+from app import app as flask_app  # noqa: E402
+from extensions import db  # noqa: E402
+from hierarchy_index import leaf_paths  # noqa: E402
+from models import Question, User  # noqa: E402
+from near_duplicates import near_duplicate_index  # noqa: E402
+from query_budget import QueryBudget  # noqa: E402
+from question_pool import question_pool  # noqa: E402
+from question_schema import ANSWER_LETTERS  # noqa: E402
+from session_snapshot import snapshot_cache  # noqa: E402
+from session_store import active_sessions  # noqa: E402
+from user_cache import user_cache  # noqa: E402
+
+# مسار أول موضوع في الشجرة؛ أسئلة الاختبارات كلها فيه
+QUIZ_PATH = leaf_paths(('العلوم',))[0]
+
+
+def _reset_process_state() -> None:
+    """المخازن المؤقتة على مستوى العملية تحمل معرفات من قاعدة الاختبار السابق."""
+    question_pool.invalidate()
+    near_duplicate_index.invalidate()
+    with snapshot_cache._lock:
+        snapshot_cache._entries.clear()
+    user_cache.init_app(flask_app)
+    # القاعدة الجديدة فارغة من أحداث الإسقاط، فلا حاجة لاستعلام نقطة البداية
+    # الذي يسبق أول تخزين في العملية ويتجاوز ميزانية أول طلب فيها
+    user_cache._last_event_id = 0
+    user_cache._next_sync = 0.0
+    active_sessions.configure('database')
+
+
+@pytest.fixture
+def app():
+    """التطبيق على قاعدة فارغة تُنشأ لكل اختبار وتُحذف بعده."""
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    _reset_process_state()
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+    _reset_process_state()
+
+
+@pytest.fixture
+def query_budget(app):
+    """QueryBudget في وضع raise: with query_budget(2): ... يفشل عند تجاوز الحد أو عند نمط N+1."""
+    def budget(max_statements=None, label='الاختبار', repeat_threshold=3):
+        return QueryBudget(max_statements, label=label, mode='raise', repeat_threshold=repeat_threshold)
+    return budget
+
+
+@pytest.fixture
+def make_user(app):
+    """إنشاء مستخدم وإرجاع معرفه."""
+    created = []
+
+    def make(username=None):
+        username = username or f'user{len(created)}'
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', password_hash='')
+            db.session.add(user)
+            db.session.commit()
+            created.append(user.id)
+            return user.id
+    return make
+
+
+@pytest.fixture
+def make_client(app):
+    """عميل اختبار، مسجَّل الدخول باسم user_id إن مُرِّر."""
+    def make(user_id=None):
+        client = app.test_client()
+        if user_id is not None:
+            with client.session_transaction() as flask_session:
+                flask_session['_user_id'] = str(user_id)
+                flask_session['_fresh'] = True
+        return client
+    return make
+
+
+@pytest.fixture
+def auth_client(make_user, make_client):
+    return make_client(make_user())
+
+
+@pytest.fixture
+def seed_questions(app):
+    """إضافة count سؤالًا في QUIZ_PATH بصعوبة متوسطة؛ الإجابة الصحيحة تدور على الحروف."""
+    def seed(count, difficulty='متوسط'):
+        with app.app_context():
+            questions = [
+                Question(
+                    question_text=f'سؤال {index}',
+                    option_a='أ', option_b='ب', option_c='ج', option_d='د',
+                    correct_answer=ANSWER_LETTERS[index % len(ANSWER_LETTERS)],
+                    category=QUIZ_PATH[0],
+                    topic=QUIZ_PATH[2],
+                    difficulty=difficulty,
+                    explanation=f'شرح {index}'
+                )
+                for index in range(count)
+            ]
+            db.session.add_all(questions)
+            db.session.commit()
+            return [question.id for question in questions]
+    return seed
+
+
+@pytest.fixture
+def start_quiz(seed_questions):
+    """بدء اختبار من count سؤالًا لعميل مسجَّل الدخول وإرجاع رمز جلسته."""
+    def start(client, count=5):
+        seed_questions(count)
+        client.post('/selection', data={
+            'subject': QUIZ_PATH[0],
+            'specialization': QUIZ_PATH[1],
+            'topic': QUIZ_PATH[2],
+            'sub_topic': QUIZ_PATH[3] if len(QUIZ_PATH) > 3 else '',
+            'count': count,
+            'difficulty': 'متوسط'
+        })
+        response = client.get('/start')
+        assert response.headers.get('Location', '').endswith('/question'), response.status_code
+        with client.session_transaction() as flask_session:
+            return flask_session['quiz_session']
+    return start
+
+
+@pytest.fixture
+def stub_deepseek():
+    """خادم DeepSeek محلي في خيط خلفي؛ زمن الاستجابة والأعطال عبر stub.set_faults."""
+    from benchmarks.stub_deepseek import StubDeepSeek
+    with StubDeepSeek(seed=0) as stub:
+        yield stub
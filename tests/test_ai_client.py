@@ -0,0 +1,181 @@
+# tests/test_ai_client.py
+import math
+import threading
+import time
+
+import pytest
+import requests
+
+from ai_client import AIClient
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, AdaptiveLimiter, CircuitBreaker, CircuitOpenError
+
+LATENCY = 0.2
+
+
+@pytest.fixture
+def make_ai_client(stub_deepseek):
+    clients = []
+
+    def make(max_concurrency):
+        client = AIClient(base_url=stub_deepseek.base_url, pool_size=max_concurrency,
+                          max_concurrency=max_concurrency)
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _chat(client):
+    payload = {'messages': [{'role': 'user', 'content': 'أنشئ 1 أسئلة'}]}
+    return client.chat(payload, 'test').json()['choices'][0]['message']['content']
+
+
+def test_map_overlaps_calls_up_to_the_limit(stub_deepseek, make_ai_client):
+    stub_deepseek.set_faults(latency=LATENCY)
+    limit, calls = 4, 12
+    client = make_ai_client(limit)
+
+    started = time.perf_counter()
+    results = client.map(lambda _: _chat(client), range(calls))
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == calls and all(results)
+    assert stub_deepseek.peak_in_flight == limit
+    # دفعات متتالية بعدد الحد: ceil(N / limit) × زمن الاستجابة لا N × زمن الاستجابة
+    waves = math.ceil(calls / limit)
+    assert waves * LATENCY * 0.9 <= elapsed < (waves + 2) * LATENCY
+    assert elapsed < calls * LATENCY / 2
+
+
+def test_direct_calls_queue_behind_the_concurrency_limit(stub_deepseek, make_ai_client):
+    stub_deepseek.set_faults(latency=LATENCY)
+    limit, calls = 2, 6
+    client = make_ai_client(limit)
+    barrier = threading.Barrier(calls)
+    results, errors = [], []
+
+    def call():
+        barrier.wait()
+        try:
+            results.append(_chat(client))
+        except Exception as e:  # noqa: BLE001 - يُجمع ليفشل الاختبار برسالة واضحة
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=call) for _ in range(calls)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    assert errors == [] and len(results) == calls
+    # الطلبات الزائدة تنتظر مكانًا بدل أن تصل إلى الخدمة معًا
+    assert stub_deepseek.peak_in_flight == limit
+    assert elapsed >= math.ceil(calls / limit) * LATENCY * 0.9
+
+
+def test_stream_error_response_is_closed_before_raising(stub_deepseek, make_ai_client, monkeypatch):
+    stub_deepseek.set_faults(error_rate=1.0)
+    client = make_ai_client(1)
+    responses = []
+    post = client.session.post
+
+    def recording_post(*args, **kwargs):
+        responses.append(post(*args, **kwargs))
+        return responses[-1]
+    monkeypatch.setattr(client.session, 'post', recording_post)
+
+    with pytest.raises(requests.HTTPError):
+        list(client.chat_stream({'messages': [{'role': 'user', 'content': 'أنشئ 1 أسئلة'}]}, 'test'))
+
+    assert responses[0].status_code == 503
+    # الاتصال عاد إلى المجمع بدل أن يبقى محجوزًا بجسم لم يُقرأ
+    assert responses[0].raw.closed
+
+
+PROMPT = {'messages': [{'role': 'user', 'content': 'أنشئ 1 أسئلة'}]}
+
+
+@pytest.fixture
+def guarded_client(make_ai_client):
+    """عميل بقاطع يفتح بعد فشلين ويُجرب بعد 0.2 ثانية وحد تزامن يبدأ من 4."""
+    client = make_ai_client(4)
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client.limiter = AdaptiveLimiter(initial=4, min_limit=1, queue_timeout=0.5)
+    client.slow_call_threshold = 1.0
+    return client
+
+
+def test_breaker_opens_on_failures_and_recovers_through_half_open(stub_deepseek, guarded_client):
+    client = guarded_client
+    stub_deepseek.set_faults(error_rate=1.0)
+    for _ in range(2):
+        assert client.breaker.state == CLOSED
+        with pytest.raises(requests.HTTPError):
+            client.chat(PROMPT, 'test')
+    assert client.breaker.state == OPEN
+    # كل فشل يقسم حد التزامن على اثنين
+    assert client.limiter.snapshot()['limit'] == 1
+
+    sent = stub_deepseek.requests
+    with pytest.raises(CircuitOpenError):
+        client.chat(PROMPT, 'test')
+    assert stub_deepseek.requests == sent
+
+    time.sleep(0.25)
+    assert client.breaker.state == HALF_OPEN
+    # فشل طلب الاختبار يعيد فتح الدائرة
+    with pytest.raises(requests.HTTPError):
+        client.chat(PROMPT, 'test')
+    assert client.breaker.state == OPEN
+
+    time.sleep(0.25)
+    stub_deepseek.set_faults(error_rate=0.0)
+    assert _chat(client)
+    assert client.breaker.state == CLOSED
+    assert client.limiter.snapshot()['in_flight'] == 0
+
+
+def test_stream_holds_its_slot_and_reports_slowness_when_done(stub_deepseek, guarded_client):
+    client = guarded_client
+    client.slow_call_threshold = 0.2
+    stub_deepseek.set_faults(latency=0.4)
+
+    chunks = client.chat_stream(PROMPT, 'test')
+    assert next(chunks)
+    # التدفق الجاري يبقى محسوبًا على حد التزامن ولم يُحكم عليه بعد
+    assert client.limiter.snapshot()['in_flight'] == 1
+    assert client.breaker.snapshot()['consecutive_failures'] == 0
+
+    assert ''.join(chunks)
+    assert (client.limiter.snapshot()['in_flight'], client.limiter.snapshot()['limit']) == (0, 2)
+    assert client.breaker.snapshot()['consecutive_failures'] == 1
+
+    # الفشل الثاني (بطء التدفق كاملًا) يفتح الدائرة
+    list(client.chat_stream(PROMPT, 'test'))
+    assert client.breaker.state == OPEN
+
+
+def test_stream_read_timeout_counts_as_failure(stub_deepseek, guarded_client):
+    client = guarded_client
+    stub_deepseek.set_faults(latency=2.0)
+
+    with pytest.raises(requests.RequestException):
+        list(client.chat_stream(PROMPT, 'test', read_timeout=0.02))
+
+    assert client.breaker.snapshot()['consecutive_failures'] == 1
+    assert client.limiter.snapshot()['in_flight'] == 0
+
+
+def test_stream_closed_early_is_not_a_failure(stub_deepseek, guarded_client):
+    client = guarded_client
+    client.breaker.record_failure()
+
+    chunks = client.chat_stream(PROMPT, 'test')
+    assert next(chunks)
+    chunks.close()
+
+    assert client.breaker.snapshot()['consecutive_failures'] == 0
+    assert client.limiter.snapshot()['in_flight'] == 0
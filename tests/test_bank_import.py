@@ -0,0 +1,106 @@
+# tests/test_bank_import.py
+import csv
+import json
+
+from bank_import import RecentImports, import_file, import_questions
+from conftest import QUIZ_PATH
+from extensions import db
+from models import Question
+from near_duplicates import near_duplicate_index, signature
+from question_pool import question_pool
+
+TOPIC_KEY = (QUIZ_PATH[0], QUIZ_PATH[2])
+FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'difficulty')
+
+
+def _row(text, **overrides):
+    return dict({
+        'question_text': text,
+        'option_a': 'الميتوكوندريا', 'option_b': 'النواة', 'option_c': 'الريبوسوم', 'option_d': 'الجدار',
+        'correct_answer': 'a',
+        'difficulty': 'easy',
+    }, **overrides)
+
+
+ROWS = [
+    _row('ما العضية المسؤولة عن إنتاج الطاقة في الخلية؟'),
+    _row('ما العضية المسؤولة عن إنتاج الطاقة داخل الخلية؟'),   # شبه مكرر للأول
+    _row('ما العضية التي تحمل المادة الوراثية؟', correct_answer='b'),
+    _row('ما العضية التي تحمل المادة الوراثية؟', correct_answer='b'),  # مكرر تمامًا
+    _row('سؤال بلا إجابة صحيحة', correct_answer='z'),
+    _row('ما العضية التي تصنع البروتين؟', correct_answer='c'),
+]
+
+
+def _write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows))
+        handle.write('\n{not json\n')
+    return str(path)
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def _defaults():
+    return {'category': TOPIC_KEY[0], 'topic': TOPIC_KEY[1]}
+
+
+def test_jsonl_import_counts_and_reimport(app, tmp_path):
+    path = _write_jsonl(tmp_path / 'questions.jsonl', ROWS)
+    with app.app_context():
+        stats = import_file(path, batch_size=2, defaults=_defaults())
+
+        assert (stats.read, stats.inserted, stats.duplicates, stats.near_duplicates) == (7, 3, 1, 1)
+        assert dict(stats.rejected) == {'invalid:correct_answer': 1, 'invalid:row': 1}
+        assert Question.query.filter_by(source='import').count() == 3
+        assert {row.correct_answer for row in Question.query} == {'أ', 'ب', 'ج'}
+
+        # إعادة الاستيراد: كل سؤال صالح موجود مسبقًا
+        again = import_file(path, batch_size=2, defaults=_defaults())
+        assert (again.inserted, again.duplicates, again.near_duplicates) == (0, 4, 1)
+
+
+def test_csv_import_drops_touched_caches(app, tmp_path):
+    path = _write_csv(tmp_path / 'questions.csv', ROWS)
+    with app.app_context():
+        near_duplicate_index.find(dict(ROWS[0], **_defaults()))
+        assert question_pool.sample(*TOPIC_KEY, 'سهل', 5) == []
+
+        stats = import_file(path, defaults=_defaults())
+
+        assert (stats.read, stats.inserted, stats.duplicates, stats.near_duplicates, stats.invalid) == (
+            6, 3, 1, 1, 1)
+        # الفهرس المشترك لم تُضف إليه الأسئلة واحدًا واحدًا، بل أُسقط الموضوع ليُحمَّل من القاعدة
+        assert TOPIC_KEY not in near_duplicate_index._topics
+        assert len(question_pool.sample(*TOPIC_KEY, 'سهل', 5)) == 3
+        assert near_duplicate_index.find(dict(ROWS[1], **_defaults())) is not None
+
+
+def test_recent_imports_keep_only_the_window():
+    recent = RecentImports(window=2)
+    first, second, third = (signature(row) for row in (ROWS[0], ROWS[2], ROWS[5]))
+    recent.add(TOPIC_KEY, first)
+    recent.add(TOPIC_KEY, second)
+    assert recent.find(TOPIC_KEY, first, 0.75) is not None
+
+    recent.add(TOPIC_KEY, third)
+
+    assert len(recent) == 2
+    assert recent.find(TOPIC_KEY, first, 0.75) is None
+    assert recent.find(TOPIC_KEY, third, 0.75) is not None
+
+
+def test_near_duplicates_beyond_the_window_are_inserted(app):
+    rows = [dict(row, **_defaults()) for row in (ROWS[0], ROWS[2], ROWS[1])]
+    with app.app_context():
+        stats = import_questions(rows, batch_size=1, window=1)
+
+        # الدفعات تُعتمد قبل فحص ما بعدها، لكن فهرس البنك المشترك حُمِّل قبل إدراجها
+        assert (stats.inserted, stats.near_duplicates) == (3, 0)
+        assert db.session.query(Question).count() == 3
@@ -0,0 +1,33 @@
+# tests/test_commands.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from commands import checkpoint_command
+from extensions import db
+from models import QuizSession
+from session_store import active_sessions
+
+
+def test_checkpoint_refuses_the_memory_store(app):
+    active_sessions.configure('memory')
+
+    result = app.test_cli_runner().invoke(checkpoint_command)
+
+    assert result.exit_code == 1
+    assert 'ACTIVE_SESSION_STORE=memory' in result.output
+
+
+def test_checkpoint_expires_idle_database_sessions(app, auth_client, start_quiz):
+    token = start_quiz(auth_client, count=2)
+    with app.app_context():
+        stale = datetime.utcnow() - timedelta(seconds=app.config['ACTIVE_SESSION_TTL'] + 60)
+        db.session.execute(update(QuizSession).where(QuizSession.session_token == token).values(updated_at=stale))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(checkpoint_command)
+
+    assert result.exit_code == 0
+    assert 'تم حفظ تقدم 1 اختبار' in result.output
+    with app.app_context():
+        assert QuizSession.query.count() == 0
@@ -0,0 +1,40 @@
+# tests/test_instrumentation.py
+import logging
+
+from instrumentation import instrumentation
+
+
+def _samples(text):
+    """أسطر القيم في نص Prometheus: الاسم مع التسميات ← القيمة."""
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_route_is_timed_counted_and_logged_when_slow(app, make_user, make_client, query_budget, monkeypatch,
+                                                      caplog):
+    # كل طلب يُعد بطيئًا فيُسجَّل مع أول جملة منه فقط
+    monkeypatch.setattr(instrumentation, 'slow_threshold', 1e-9)
+    monkeypatch.setattr(instrumentation, 'capture_limit', 1)
+    user_id = make_user()
+    auth_client = make_client(user_id)
+    before = _samples(auth_client.get('/metrics').get_data(as_text=True))
+    endpoint = 'endpoint="api.users_api.get_user_weak_topics"'
+    duration = f'quiz_http_request_duration_seconds_count{{{endpoint},method="GET",status="200"}}'
+    statements = f'quiz_http_request_statements_sum{{{endpoint}}}'
+
+    budget = query_budget()
+    with caplog.at_level(logging.WARNING, logger='instrumentation'), budget:
+        assert auth_client.get(f'/api/v1/users/{user_id}/weak-topics').status_code == 200
+    executed = len(budget.log)
+    after = _samples(auth_client.get('/metrics').get_data(as_text=True))
+
+    # تحميل المستخدم ثم تجميع المواضيع
+    assert executed >= 2
+    assert int(after[duration]) - int(before.get(duration, 0)) == 1
+    assert int(after[statements]) - int(before.get(statements, 0)) == executed
+    assert f'quiz_http_request_db_seconds_count{{{endpoint}}}' in after
+
+    slow = [record.getMessage() for record in caplog.records if '/weak-topics' in record.getMessage()]
+    assert len(slow) == 1
+    assert f'{executed} جملة SQL' in slow[0]
+    assert slow[0].count('\n  ') == 2
+    assert slow[0].endswith(f'... و{executed - 1} جمل أخرى')
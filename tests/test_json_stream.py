@@ -0,0 +1,98 @@
+# tests/test_json_stream.py
+import json
+
+import pytest
+
+from ai_helper import DeepSeekAI
+from json_stream import ObjectStreamParser, salvage_objects
+from question_schema import ANSWER_LETTERS
+
+
+def _question(index):
+    return {
+        'question_text': f'ما ناتج {index} + {index}؟',
+        'option_a': str(index), 'option_b': str(2 * index), 'option_c': '0', 'option_d': '1',
+        'correct_answer': ANSWER_LETTERS[1],
+        'category': 'الرياضيات', 'topic': 'الجمع', 'difficulty': 'سهل',
+    }
+
+
+def _response(questions):
+    return json.dumps({'questions': questions}, ensure_ascii=False)
+
+
+def test_truncated_response_keeps_complete_objects():
+    text = _response([_question(1), _question(2), _question(3)])
+    # الرد يُقطع في منتصف الكائن الثالث كما عند بلوغ max_tokens
+    cut = text.index(json.dumps(_question(3), ensure_ascii=False)) + 20
+
+    objects, errors = salvage_objects(text[:cut])
+
+    assert objects == [_question(1), _question(2)]
+    assert errors == 0
+
+
+@pytest.mark.parametrize('text', [
+    'ما قيمة {x} في المجموعة [1, 2]؟',
+    'قال المعلم: "}]" ثم انصرف',
+    'المسار C:\\\\ينتهي بشرطة',
+    '\\"{',
+])
+def test_braces_and_escaped_quotes_inside_strings(text):
+    question = dict(_question(1), question_text=text)
+    raw = '```json\n' + _response([question, _question(2)]) + '\n```'
+
+    objects, errors = salvage_objects(raw)
+
+    assert objects == [question, _question(2)]
+    assert errors == 0
+
+
+def test_parser_emits_each_object_when_its_brace_closes():
+    text = _response([_question(1), _question(2)])
+    parser = ObjectStreamParser()
+    emitted = []
+    for position, char in enumerate(text):
+        for obj in parser.feed(char):
+            emitted.append((obj, position))
+
+    first_end = text.index('}')
+    assert [obj for obj, _ in emitted] == [_question(1), _question(2)]
+    assert emitted[0][1] == first_end
+    assert parser.errors == 0
+
+
+def test_malformed_object_is_counted_and_skipped():
+    raw = '[{"question_text": "ناقص" "option_a": 1}, ' + json.dumps(_question(2), ensure_ascii=False) + ']'
+
+    objects, errors = salvage_objects(raw)
+
+    assert objects == [_question(2)]
+    assert errors == 1
+
+
+def test_generate_questions_requests_only_the_deficit(monkeypatch):
+    ai = DeepSeekAI()
+    monkeypatch.setattr('ai_helper.backoff_delay', lambda attempt: 0)
+    full = _response([_question(1), _question(2), _question(3)])
+    replies = [
+        full[:full.index(json.dumps(_question(3), ensure_ascii=False)) + 20],
+        # التكرار يُرفض ويبقى النقص سؤالًا واحدًا
+        _response([_question(2)]),
+        _response([_question(3)]),
+    ]
+    prompts = []
+
+    def send(prompt, labels=None):
+        prompts.append(prompt)
+        return replies[len(prompts) - 1]
+    monkeypatch.setattr(ai, '_send_api_request', send)
+
+    questions = ai.generate_questions({'category': 'الرياضيات', 'topic': 'الجمع', 'difficulty': 'سهل'}, count=3)
+
+    assert questions == [_question(1), _question(2), _question(3)]
+    assert len(prompts) == 3
+    assert 'قم بإنشاء 3 أسئلة' in prompts[0]
+    for prompt in prompts[1:]:
+        assert 'قم بإنشاء 1 أسئلة' in prompt
+        assert _question(1)['question_text'] in prompt and _question(2)['question_text'] in prompt
@@ -0,0 +1,24 @@
+# tests/test_metrics.py
+import metrics
+from hierarchy_index import leaf_paths
+
+SUBJECT, _, TOPIC, _ = leaf_paths(('العلوم',))[0]
+
+
+def test_ai_labels_keep_known_values_and_normalize_difficulty():
+    labels = metrics.ai_labels('generate', {'category': SUBJECT, 'topic': TOPIC, 'difficulty': 'Hard'})
+    assert labels == {'operation': 'generate', 'category': SUBJECT, 'topic': TOPIC, 'difficulty': 'صعب'}
+
+
+def test_ai_labels_map_unknown_request_values_to_other():
+    labels = metrics.ai_labels('generate', {'subject': 'x' * 40, 'topic': ['قائمة'], 'difficulty': 'مستحيل'})
+    assert labels == {'operation': 'generate', 'category': 'other', 'topic': 'other', 'difficulty': 'other'}
+    # موضوع موجود في الشجرة لكن تحت مادة أخرى
+    assert metrics.ai_labels('generate', {'category': 'other', 'topic': TOPIC})['topic'] == 'other'
+
+
+def test_request_values_cannot_grow_metric_series():
+    before = len(metrics.AI_RETRIES.samples())
+    for index in range(50):
+        metrics.AI_RETRIES.inc(**metrics.ai_labels('quiz', {'subject': f'مادة {index}', 'topic': f'موضوع {index}'}))
+    assert len(metrics.AI_RETRIES.samples()) <= before + 1
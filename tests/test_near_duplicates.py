@@ -0,0 +1,125 @@
+# tests/test_near_duplicates.py
+from array import array
+
+import pytest
+
+from conftest import QUIZ_PATH
+from extensions import db
+from models import Question
+from near_duplicates import NUM_BINS, TopicIndex, near_duplicate_index, recluster, signature, similarity
+
+TOPIC_KEY = (QUIZ_PATH[0], QUIZ_PATH[2])
+
+
+def _variant(base: array, changed: int) -> array:
+    """نسخة من البصمة تختلف في أول changed خانة، فتبقى النطاقات الأخيرة متطابقة."""
+    return array('Q', [value + 1 if slot < changed else value for slot, value in enumerate(base)])
+
+
+@pytest.mark.parametrize('changed, found', [(16, True), (17, False)])
+def test_topic_index_find_at_the_threshold(changed, found):
+    base = array('Q', range(NUM_BINS))
+    threshold = (NUM_BINS - 16) / NUM_BINS
+    index = TopicIndex()
+    index.add(1, base)
+
+    match = index.find(_variant(base, changed), threshold)
+
+    assert (match is not None) == found
+    if found:
+        assert match == (1, threshold)
+
+
+def test_removed_signature_is_not_found():
+    base = array('Q', range(NUM_BINS))
+    index = TopicIndex()
+    index.add(1, base)
+    index.remove(1)
+
+    assert index.find(base, 0.5) is None
+    assert all(not band for band in index.bands)
+
+
+def _question(text, **overrides):
+    return dict({
+        'question_text': text,
+        'option_a': 'الميتوكوندريا', 'option_b': 'النواة', 'option_c': 'الريبوسوم', 'option_d': 'الجدار',
+        'correct_answer': 'أ',
+        'category': TOPIC_KEY[0],
+        'topic': TOPIC_KEY[1],
+        'difficulty': 'متوسط',
+    }, **overrides)
+
+
+ORIGINAL = _question('ما العضية المسؤولة عن إنتاج الطاقة في الخلية؟')
+REWORDED = _question('ما العضية المسؤولة عن إنتاج الطاقة داخل الخلية؟')
+
+
+def _add(question):
+    row = Question(**question)
+    db.session.add(row)
+    db.session.commit()
+    return row.id
+
+
+def test_index_follows_inserts_after_commit_only(app):
+    with app.app_context():
+        assert near_duplicate_index.find(ORIGINAL) is None
+        original_id = _add(ORIGINAL)
+        db.session.add(Question(**_question('سؤال يُلغى')))
+        db.session.flush()
+        db.session.rollback()
+
+        match = near_duplicate_index.find(REWORDED)
+
+        assert match is not None and match[0] == original_id
+        assert match[1] >= near_duplicate_index.threshold
+        assert near_duplicate_index.find(_question('سؤال يُلغى')) is None
+
+
+def test_index_add_respects_the_threshold(app, monkeypatch):
+    score = similarity(signature(ORIGINAL), signature(REWORDED))
+    with app.app_context():
+        near_duplicate_index.find(ORIGINAL)
+        near_duplicate_index.add(TOPIC_KEY, 7, signature(ORIGINAL))
+
+        monkeypatch.setattr(near_duplicate_index, 'threshold', score)
+        assert near_duplicate_index.find(REWORDED) == (7, score)
+        monkeypatch.setattr(near_duplicate_index, 'threshold', score + 1 / NUM_BINS)
+        assert near_duplicate_index.find(REWORDED) is None
+
+
+def test_edited_question_invalidates_its_topic(app):
+    with app.app_context():
+        original_id = _add(ORIGINAL)
+        assert near_duplicate_index.find(REWORDED)[0] == original_id
+
+        row = db.session.get(Question, original_id)
+        row.question_text = 'ما الغاز الذي تطلقه النباتات أثناء البناء الضوئي؟'
+        db.session.commit()
+
+        # البصمة القديمة لا تبقى في الفهرس بعد تعديل النص
+        assert TOPIC_KEY not in near_duplicate_index._topics
+        assert near_duplicate_index.find(REWORDED) is None
+
+        row.duplicate_of_id = original_id
+        db.session.commit()
+        assert TOPIC_KEY not in near_duplicate_index._topics
+
+
+def test_recluster_marks_duplicates_at_the_threshold(app):
+    score = similarity(signature(ORIGINAL), signature(REWORDED))
+    with app.app_context():
+        original_id = _add(ORIGINAL)
+        reworded_id = _add(REWORDED)
+        other_id = _add(_question('ما وحدة قياس الشغل؟'))
+
+        stats = recluster(threshold=score)
+        assert stats == {'scanned': 3, 'duplicates': 1, 'changed': 1}
+        marks = dict(db.session.query(Question.id, Question.duplicate_of_id))
+        assert marks == {original_id: None, reworded_id: original_id, other_id: None}
+
+        # فوق التشابه المقيس بخانة واحدة: تُزال العلامة
+        stats = recluster(threshold=score + 1 / NUM_BINS)
+        assert stats == {'scanned': 3, 'duplicates': 0, 'changed': 1}
+        assert db.session.get(Question, reworded_id).duplicate_of_id is None
@@ -0,0 +1,27 @@
+# tests/test_passwords.py
+import time
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def pooled_hasher():
+    hasher = PasswordHasher()
+    hasher.configure(workers=1, max_pending=1, timeout=0.5)
+    # تشغيل العملية العاملة قبل القياس
+    hasher._run(time.sleep, 0)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes(pooled_hasher):
+    with pytest.raises(PasswordHasherBusy):
+        pooled_hasher._run(time.sleep, 2.0)
+
+    # المهمة ما زالت تعمل في المجمع، فالمكان الوحيد محجوز حتى تنتهي
+    assert not pooled_hasher._slots.acquire(blocking=False)
+
+    time.sleep(2.0)
+    assert pooled_hasher._run(time.sleep, 0) is None
@@ -0,0 +1,91 @@
+# tests/test_progress_buffer.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from conftest import QUIZ_PATH
+from extensions import db
+from models import QuizSession, QuizSessionQuestion, UserProgress, UserProgressDay
+from progress_buffer import pending_progress
+from quiz_service import checkpoint_expired_sessions
+from session_store import active_sessions
+from user_cache import user_cache
+
+SELECTION = {
+    'subject': QUIZ_PATH[0],
+    'specialization': QUIZ_PATH[1],
+    'topic': QUIZ_PATH[2],
+    'sub_topic': QUIZ_PATH[3] if len(QUIZ_PATH) > 3 else '',
+    'count': 3,
+    'difficulty': 'متوسط'
+}
+
+
+def _progress(user_id):
+    """(المفرغ إلى UserProgress، المعلق في الجلسات) لمادة الاختبار."""
+    flushed = db.session.query(
+        db.func.coalesce(db.func.sum(UserProgress.total_count), 0)
+    ).filter_by(user_id=user_id).scalar()
+    return flushed, pending_progress(user_id, QUIZ_PATH[0])[1]
+
+
+def test_starting_a_new_quiz_flushes_and_deletes_the_abandoned_one(app, make_user, make_client, start_quiz,
+                                                                   seed_questions):
+    user_id = make_user()
+    client = make_client(user_id)
+    previous = start_quiz(client, count=3)
+    assert client.post('/question', data={'answer': 'أ', 'order': 0}).status_code == 302
+    with app.app_context():
+        assert _progress(user_id) == (0, 1)
+
+    seed_questions(3)
+    client.post('/selection', data=SELECTION)
+    # أسوأ حالة لميزانية /start: مزامنة ذاكرة المستخدمين وفحص الجلسات الخاملة في الطلب نفسه
+    user_cache._next_sync = 0.0
+    active_sessions._next_checkpoint = 0.0
+    assert client.get('/start').status_code == 302
+    with client.session_transaction() as flask_session:
+        current = flask_session['quiz_session']
+
+    with app.app_context():
+        assert [row.session_token for row in QuizSession.query.all()] == [current]
+        assert QuizSessionQuestion.query.count() == 3
+        assert _progress(user_id) == (1, 0)
+    assert previous != current
+
+
+def test_checkpoint_expires_idle_database_sessions(app, make_user, make_client, start_quiz):
+    idle_user, active_user = make_user(), make_user()
+    tokens = {}
+    for user_id in (idle_user, active_user):
+        client = make_client(user_id)
+        tokens[user_id] = start_quiz(client, count=2)
+        assert client.post('/question', data={'answer': 'أ', 'order': 0}).status_code == 302
+
+    with app.app_context():
+        # اختبار متروك على جهاز آخر لم يتغير منذ أكثر من ACTIVE_SESSION_TTL
+        stale = datetime.utcnow() - timedelta(seconds=app.config['ACTIVE_SESSION_TTL'] + 60)
+        db.session.execute(
+            update(QuizSession).where(QuizSession.session_token == tokens[idle_user]).values(updated_at=stale)
+        )
+        db.session.commit()
+
+        assert checkpoint_expired_sessions() == 1
+
+        assert [row.session_token for row in QuizSession.query.all()] == [tokens[active_user]]
+        assert _progress(idle_user) == (1, 0)
+        assert _progress(active_user) == (0, 1)
+        assert checkpoint_expired_sessions() == 0
+
+
+def test_answer_that_reaches_the_flush_size_fits_its_budget(app, auth_client, start_quiz, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROGRESS_FLUSH_SIZE', 1)
+    start_quiz(auth_client, count=2)
+    assert auth_client.get('/question').status_code == 200
+    user_cache._next_sync = 0.0
+
+    assert auth_client.post('/question', data={'answer': 'أ', 'order': 0}).status_code == 302
+
+    with app.app_context():
+        assert UserProgressDay.query.count() == 1
+        assert _progress(QuizSession.query.one().user_id) == (1, 0)
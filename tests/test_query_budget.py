@@ -0,0 +1,47 @@
+# tests/test_query_budget.py
+import pytest
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import QuizResult
+from query_budget import QueryBudgetExceeded
+
+
+def _results_for_users(app, make_user, count):
+    user_ids = [make_user() for _ in range(count)]
+    with app.app_context():
+        db.session.add_all(QuizResult(user_id=user_id, score=1, total_questions=1) for user_id in user_ids)
+        db.session.commit()
+
+
+def test_detector_reports_lazy_relationship_and_call_site(app, make_user, query_budget):
+    _results_for_users(app, make_user, 3)
+    with app.app_context():
+        results = QuizResult.query.all()
+        with pytest.raises(QueryBudgetExceeded) as excinfo:
+            with query_budget():
+                [result.user.username for result in results]
+
+    message = str(excinfo.value)
+    assert '3×' in message
+    assert 'QuizResult.user' in message
+    assert 'tests/test_query_budget.py:' in message
+
+
+def test_eager_loading_passes_the_budget(app, make_user, query_budget):
+    _results_for_users(app, make_user, 3)
+    with app.app_context():
+        with query_budget(1) as log:
+            usernames = [result.user.username
+                         for result in QuizResult.query.options(joinedload(QuizResult.user)).all()]
+
+    assert len(usernames) == 3
+    assert len(log) == 1
+
+
+def test_budget_overrun_raises(app, query_budget):
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='2 جملة SQL والحد 1'):
+            with query_budget(1):
+                db.session.execute(db.text('SELECT 1'))
+                db.session.execute(db.text('SELECT 2'))
@@ -0,0 +1,65 @@
+# tests/test_question_bank.py
+from conftest import QUIZ_PATH
+from extensions import db
+from models import Question
+from near_duplicates import near_duplicate_index
+from question_bank import QUESTION_FIELDS, content_hash, fetch_from_bank, save_questions
+
+
+def _question(text, **overrides):
+    return dict({
+        'question_text': text,
+        'option_a': 'أ', 'option_b': 'ب', 'option_c': 'ج', 'option_d': 'د',
+        'correct_answer': 'أ',
+        'category': QUIZ_PATH[0],
+        'topic': QUIZ_PATH[2],
+        'difficulty': 'متوسط',
+        'explanation': None,
+    }, **overrides)
+
+
+def test_batch_duplicates_map_to_one_row_in_input_order(app):
+    first, second = _question('ما وحدة قياس القوة؟'), _question('ما أصغر وحدة في الكائن الحي؟')
+    with app.app_context():
+        # تحميل القسم قبل الحفظ: الإدراج عبر Core يجب أن يصل إلى المخزن بعد الـ commit
+        assert fetch_from_bank(QUIZ_PATH[0], QUIZ_PATH[2], 'متوسط', 5) == []
+
+        rows, inserted = save_questions([first, second, dict(first)], source='ai')
+        db.session.commit()
+
+        assert inserted == 2
+        assert [row.question_text for row in rows] == [first['question_text'], second['question_text'],
+                                                       first['question_text']]
+        assert rows[0] is rows[2] and rows[0].id != rows[1].id
+        assert Question.query.count() == 2
+        assert {row.id for row in fetch_from_bank(QUIZ_PATH[0], QUIZ_PATH[2], 'متوسط', 5)} == {
+            rows[0].id, rows[1].id}
+
+        # الحفظ مرة أخرى يعيد الصفوف المخزنة دون إضافة
+        again, inserted = save_questions([second], source='ai')
+        assert (inserted, again[0].id) == (0, rows[1].id)
+
+
+def test_hash_inserted_concurrently_is_read_instead_of_raising(app, monkeypatch):
+    question = _question('ما الغاز الذي تمتصه النباتات؟')
+    find = near_duplicate_index.find
+
+    def find_then_insert_concurrently(*args, **kwargs):
+        match = find(*args, **kwargs)
+        # طلب آخر يُدرج البصمة نفسها ويعتمدها بين الفحص والإدراج
+        with db.engine.begin() as connection:
+            connection.execute(Question.__table__.insert().values(
+                **{field: question[field] for field in QUESTION_FIELDS},
+                source='import', content_hash=digest))
+        return match
+
+    with app.app_context():
+        digest = content_hash(question)
+        monkeypatch.setattr(near_duplicate_index, 'find', find_then_insert_concurrently)
+
+        rows, inserted = save_questions([question], source='ai')
+        db.session.commit()
+
+        assert inserted == 0
+        assert (rows[0].source, rows[0].content_hash) == ('import', digest)
+        assert Question.query.count() == 1
@@ -0,0 +1,247 @@
+# tests/test_quiz_answers.py
+import threading
+from collections import Counter, defaultdict
+
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+
+from benchmarks.bench_answer_races import expected_answer, flush_loop
+from conftest import QUIZ_PATH
+from extensions import db
+from models import QuizSession, QuizSessionQuestion, UserProgress
+from progress_buffer import pending_progress
+from question_schema import ANSWER_LETTERS
+from quiz_service import ANSWER_ATTEMPTS, QUIZ_ANSWERS, AnswerRejected, load_quiz, submit_answer
+from session_store import active_sessions
+
+SESSIONS = 3
+CLIENTS = 4
+QUESTIONS = 5
+
+
+def _recorded_state(token):
+    """(الإجابات المسجلة حسب الترتيب، المؤشر، النتيجة، النسخة) من المخزن المهيأ."""
+    if active_sessions.enabled:
+        state = active_sessions.store.get(token)
+        recorded = {int(order): tuple(value) for order, value in state.answers.items()}
+        return recorded, state.current_index, state.score, state.version
+    quiz_session = QuizSession.query.filter_by(session_token=token).one()
+    rows = QuizSessionQuestion.query.filter_by(session_id=quiz_session.id).all()
+    recorded = {row.order: (row.user_answer, bool(row.is_correct)) for row in rows if row.is_answered}
+    data = quiz_session.session_data
+    return recorded, data['current_index'], data['score'], quiz_session.version
+
+
+def _answer_all(client, via, token, index, barrier, record):
+    """إرسال إجابات كل الأسئلة بالترتيب، مع إعادة المحاولة عند 503."""
+    barrier.wait()
+    for order in range(QUESTIONS):
+        answer = expected_answer(index, order)
+        while True:
+            if via == 'api':
+                response = client.put(f'/api/v1/quiz/sessions/{token}/answers/{order}', json={'answer': answer})
+            else:
+                response = client.post('/question', data={'answer': answer, 'order': order})
+            record(index, order, response)
+            if response.status_code != 503:
+                break
+
+
+@pytest.mark.parametrize('store, via', [('database', 'api'), ('database', 'html'), ('memory', 'api')])
+def test_concurrent_retries_record_each_answer_once(app, make_user, make_client, start_quiz, monkeypatch,
+                                                    store, via):
+    active_sessions.configure(store)
+    # الميزانيات تثبت المسار دون تزاحم، وإعادة المحاولة بعد تعارض النسخة تضيف جملًا عن قصد
+    monkeypatch.setitem(app.config, 'QUERY_BUDGET_MODE', 'warn')
+    sessions = []
+    for _ in range(SESSIONS):
+        user_id = make_user()
+        token = start_quiz(make_client(user_id), count=QUESTIONS)
+        sessions.append((user_id, token))
+
+    statuses = Counter()
+    responses = defaultdict(list)
+    errors = []
+    lock = threading.Lock()
+
+    def record(index, order, response):
+        body = response.get_json(silent=True) if via == 'api' else None
+        with lock:
+            statuses[response.status_code] += 1
+            if response.status_code == 200 and body:
+                responses[(index, order)].append(body['data'])
+
+    def run(*args):
+        try:
+            _answer_all(*args)
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+
+    # عدة عملاء لكل جلسة يرسلون الإجابات نفسها في اللحظة نفسها، كنقرات مزدوجة أو إعادة محاولات
+    barrier = threading.Barrier(SESSIONS * CLIENTS)
+    threads = []
+    for index, (user_id, token) in enumerate(sessions):
+        for _ in range(CLIENTS):
+            client = make_client(user_id)
+            with client.session_transaction() as flask_session:
+                flask_session['quiz_session'] = token
+            threads.append(threading.Thread(target=run, args=(client, via, token, index, barrier, record)))
+    # تفريغ التقدم المعلق أثناء الضغط يغير نسخة الجلسة فيُختبر مسار إعادة المحاولة
+    stop = threading.Event()
+    flushes = Counter()
+    flusher = threading.Thread(target=flush_loop, args=(app, sessions, stop, flushes))
+    if not active_sessions.enabled:
+        flusher.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    if flusher.is_alive():
+        flusher.join()
+
+    assert errors == []
+    assert set(statuses) <= {200, 302, 503}
+    with app.app_context():
+        for index, (user_id, token) in enumerate(sessions):
+            recorded, current_index, score, version = _recorded_state(token)
+            assert {order: answer for order, (answer, _) in recorded.items()} == {
+                order: expected_answer(index, order) for order in range(QUESTIONS)}
+            assert current_index == QUESTIONS
+            assert score == sum(is_correct for _, is_correct in recorded.values())
+            # نسخة لكل إجابة مسجلة ولكل تفريغ ناجح
+            assert version == QUESTIONS + 1 + flushes[index]
+
+            flushed = db.session.query(
+                db.func.coalesce(db.func.sum(UserProgress.total_count), 0)
+            ).filter_by(user_id=user_id, category=QUIZ_PATH[0]).scalar()
+            assert flushed + pending_progress(user_id, QUIZ_PATH[0])[1] == QUESTIONS
+
+    if via == 'api':
+        assert len(responses) == SESSIONS * QUESTIONS
+        for (index, order), bodies in responses.items():
+            assert sum(not body['replayed'] for body in bodies) == 1, (index, order)
+            assert len({(body['answer'], body['is_correct']) for body in bodies}) == 1, (index, order)
+
+
+# --- فروع submit_answer ---
+
+@pytest.fixture(params=['database', 'memory'])
+def quiz(request, app, make_user, make_client, start_quiz):
+    """(معرف المستخدم، رمز الجلسة) لاختبار من ثلاثة أسئلة على كل مخزن."""
+    active_sessions.configure(request.param)
+    user_id = make_user()
+    token = start_quiz(make_client(user_id), count=3)
+    return user_id, token
+
+
+def _correct_answer(token, user_id, order):
+    _, snapshot, _ = load_quiz(token, user_id)
+    return snapshot.items[order].question.correct_answer
+
+
+def test_resubmitting_the_same_answer_replays_the_recorded_outcome(app, quiz):
+    user_id, token = quiz
+    with app.app_context():
+        answer = _correct_answer(token, user_id, 0)
+        first = submit_answer(token, user_id, 0, answer)
+        again = submit_answer(token, user_id, 0, answer)
+
+        assert not first.replayed and again.replayed
+        assert (again.is_correct, again.score, again.next_order, again.version) == (
+            True, 1, 1, first.version)
+        assert _recorded_state(token)[1:] == (1, 1, first.version)
+
+
+def test_different_answer_to_an_answered_question_conflicts(app, quiz):
+    user_id, token = quiz
+    with app.app_context():
+        answer = _correct_answer(token, user_id, 0)
+        submit_answer(token, user_id, 0, answer)
+        other = next(letter for letter in ANSWER_LETTERS if letter != answer)
+
+        with pytest.raises(AnswerRejected) as rejected:
+            submit_answer(token, user_id, 0, other)
+
+        assert rejected.value.reason == 'conflict'
+        assert _recorded_state(token)[0][0] == (answer, True)
+
+
+def test_answer_ahead_of_the_cursor_is_out_of_order(app, quiz):
+    user_id, token = quiz
+    with app.app_context():
+        with pytest.raises(AnswerRejected) as rejected:
+            submit_answer(token, user_id, 2, 'أ')
+
+        assert rejected.value.reason == 'out_of_order'
+        assert rejected.value.expected_order == 0
+        assert _recorded_state(token)[:2] == ({}, 0)
+
+
+def test_unknown_order_or_session_is_not_found(app, quiz):
+    user_id, token = quiz
+    with app.app_context():
+        for args in ((token, user_id, 3), (token, user_id + 1, 0), ('missing', user_id, 0)):
+            with pytest.raises(AnswerRejected) as rejected:
+                submit_answer(*args, 'أ')
+            assert rejected.value.reason == 'not_found'
+
+
+def test_persistent_version_conflicts_end_busy_without_recording(app, quiz, monkeypatch):
+    user_id, token = quiz
+    if active_sessions.enabled:
+        monkeypatch.setattr(active_sessions.store, 'replace', lambda state: False)
+    else:
+        def stale_commit():
+            raise StaleDataError('نسخة قديمة')
+        monkeypatch.setattr(db.session, 'commit', stale_commit)
+    stale_before = QUIZ_ANSWERS.value(outcome='stale')
+
+    with app.app_context():
+        with pytest.raises(AnswerRejected) as rejected:
+            submit_answer(token, user_id, 0, 'أ')
+        monkeypatch.undo()
+
+        assert rejected.value.reason == 'busy'
+        assert QUIZ_ANSWERS.value(outcome='stale') - stale_before == ANSWER_ATTEMPTS
+        assert _recorded_state(token)[:3] == ({}, 0, 0)
+
+
+# --- رموز الحالة في واجهة JSON ---
+
+def test_api_maps_rejections_to_status_codes(app, make_user, make_client, start_quiz):
+    user_id = make_user()
+    client = make_client(user_id)
+    token = start_quiz(client, count=3)
+    url = f'/api/v1/quiz/sessions/{token}/answers/{{}}'
+
+    assert client.put(url.format(0), json={'answer': 'أ'}).status_code == 200
+
+    response = client.put(url.format(2), json={'answer': 'أ'})
+    assert response.status_code == 409
+    assert response.get_json()['reason'] == 'out_of_order'
+    assert response.get_json()['expected_order'] == 1
+
+    response = client.put(url.format(0), json={'answer': 'ب'})
+    assert (response.status_code, response.get_json()['reason']) == (409, 'conflict')
+
+    response = client.put(url.format(3), json={'answer': 'أ'})
+    assert (response.status_code, response.get_json()['reason']) == (404, 'not_found')
+
+    response = client.put('/api/v1/quiz/sessions/missing/answers/0', json={'answer': 'أ'})
+    assert response.status_code == 404
+
+
+def test_api_returns_503_when_the_session_stays_busy(app, auth_client, start_quiz, monkeypatch):
+    token = start_quiz(auth_client, count=3)
+
+    def busy(*args, **kwargs):
+        raise AnswerRejected('busy')
+    monkeypatch.setattr('api.quiz.submit_answer', busy)
+
+    response = auth_client.put(f'/api/v1/quiz/sessions/{token}/answers/0', json={'answer': 'أ'})
+
+    assert response.status_code == 503
+    assert response.get_json()['success'] is False
+    assert response.get_json()['reason'] == 'busy'
@@ -0,0 +1,73 @@
+# tests/test_session_snapshot.py
+import pytest
+
+from extensions import db
+from models import Question, QuizResult
+from quiz_service import AnswerRejected, load_quiz, submit_answer
+from session_snapshot import snapshot_cache
+from session_store import active_sessions
+
+
+def _reads_questions(log):
+    return [sql for sql in log.statements if 'quiz_session_question' in sql or 'FROM question' in sql]
+
+
+def test_cached_question_view_runs_at_most_two_statements(auth_client, start_quiz, query_budget):
+    start_quiz(auth_client, count=3)
+    # الطلب الأول يخزن المستخدم ولقطة الجلسة
+    assert auth_client.get('/question').status_code == 200
+
+    # تحميل المستخدم (مزامنة ذاكرته عند حلول موعدها) وصف الجلسة لحالة التقدم
+    with query_budget(2, label='GET /question') as log:
+        response = auth_client.get('/question')
+
+    assert response.status_code == 200
+    assert 'السؤال 1 من 3' in response.get_data(as_text=True)
+    assert _reads_questions(log) == []
+
+
+def test_evicted_snapshot_is_rebuilt_in_one_query(auth_client, start_quiz, query_budget):
+    token = start_quiz(auth_client, count=3)
+    assert auth_client.get('/question').status_code == 200
+    snapshot_cache.invalidate(token)
+
+    with query_budget(2, label='GET /question') as log:
+        response = auth_client.get('/question')
+
+    assert response.status_code == 200
+    # الجلسة وصفوف أسئلتها ونصوص الأسئلة في جملة واحدة
+    assert len(_reads_questions(log)) == 1
+    assert snapshot_cache.get(token) is not None
+
+
+def test_question_deleted_mid_quiz_keeps_its_position(app, auth_client, start_quiz):
+    active_sessions.configure('memory')
+    token = start_quiz(auth_client, count=3)
+    with app.app_context():
+        user_id = active_sessions.store.get(token).user_id
+        question_ids = active_sessions.store.get(token).question_ids
+        first = submit_answer(token, user_id, 0, 'أ')
+        db.session.delete(db.session.get(Question, question_ids[1]))
+        db.session.commit()
+    snapshot_cache.invalidate(token)
+
+    with app.app_context():
+        _, snapshot, current_index = load_quiz(token, user_id)
+        assert [item.missing for item in snapshot.items] == [False, True, False]
+        assert snapshot.items[2].question.id == question_ids[2]
+        # المؤشر يتخطى السؤال المحذوف، ولا إجابة له
+        assert current_index == 2
+        with pytest.raises(AnswerRejected) as rejected:
+            submit_answer(token, user_id, 1, 'أ')
+        assert rejected.value.reason == 'not_found'
+
+        answer = snapshot.items[2].question.correct_answer
+        last = submit_answer(token, user_id, 2, answer)
+        assert (last.question_id, last.is_correct, last.to_dict()['completed']) == (question_ids[2], True, True)
+        assert active_sessions.store.get(token).answers['0'][0] == 'أ'
+
+    response = auth_client.get('/submit')
+    assert response.status_code == 302
+    with app.app_context():
+        result = QuizResult.query.one()
+        assert (result.score, result.total_questions) == (first.score + 1, 2)
@@ -0,0 +1,142 @@
+# tests/test_session_store.py
+import os
+import sqlite3
+
+import pytest
+
+import session_store
+from session_store import ActiveSession, MemorySessionStore, SQLiteSessionStore
+
+TTL = 60.0
+
+# DELETE ... RETURNING في pop وpop_expired
+requires_returning = pytest.mark.skipif(sqlite3.sqlite_version_info < (3, 35), reason='SQLite < 3.35 بلا RETURNING')
+
+
+class FakeClock:
+    """بديل وحدة time داخل session_store لتقديم الوقت دون انتظار."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(session_store, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['memory', pytest.param('sqlite', marks=requires_returning)])
+def store(request, tmp_path, clock):
+    if request.param == 'memory':
+        store = MemorySessionStore(TTL)
+    else:
+        store = SQLiteSessionStore(str(tmp_path / 'active.db'), TTL)
+    yield store
+    store.close()
+
+
+def _state(token, user_id=1, **overrides):
+    return ActiveSession(session_token=token, user_id=user_id, question_ids=[3, 1, 2],
+                         subject_path=['العلوم', 'الأحياء'], started_at=0.0, **overrides)
+
+
+def test_replace_is_compare_and_swap_on_version(store):
+    store.create(_state('t1'))
+    first, second = store.get('t1'), store.get('t1')
+
+    first.current_index, first.answers = 1, {'0': ['أ', True]}
+    assert store.replace(first)
+    assert first.version == 2
+
+    # نسخة قُرئت قبل التحديث تتعارض ولا تتغير نسختها
+    second.current_index = 2
+    assert not store.replace(second)
+    assert second.version == 1
+
+    stored = store.get('t1')
+    assert (stored.version, stored.current_index, stored.answers) == (2, 1, {'0': ['أ', True]})
+    assert store.replace(stored) and store.get('t1').version == 3
+
+
+def test_pop_claims_a_session_once(store):
+    store.create(_state('t1', score=2))
+
+    claimed = store.pop('t1')
+
+    assert (claimed.session_token, claimed.score, claimed.version) == ('t1', 2, 1)
+    assert store.pop('t1') is None
+    assert store.get('t1') is None
+    assert not store.replace(claimed)
+    assert store.for_user(1) == []
+
+
+def test_pop_expired_returns_only_idle_sessions_up_to_the_limit(store, clock):
+    for token in ('old1', 'old2', 'old3'):
+        store.create(_state(token))
+    clock.now += TTL / 2
+    store.create(_state('fresh'))
+    # الكتابة تمدد المهلة
+    touched = store.get('old3')
+    assert store.replace(touched)
+    clock.now += TTL / 2 + 1
+
+    assert store.get('old1') is None
+    assert {state.session_token for state in store.for_user(1)} == {'fresh', 'old3'}
+
+    first = store.pop_expired(limit=1)
+    rest = store.pop_expired(limit=10)
+
+    assert len(first) == 1
+    assert {state.session_token for state in first + rest} == {'old1', 'old2'}
+    assert store.pop_expired(limit=10) == []
+    assert store.pop('old3') is not None and store.pop('fresh') is not None
+
+
+@requires_returning
+def test_sqlite_store_reopens_its_connection_after_fork(tmp_path, clock, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / 'active.db'), TTL)
+    store.create(_state('parent'))
+    parent_conn = store._local.conn
+
+    # عملية ابنة بمعرف مختلف: لا تستخدم اتصال الأب الموروث
+    child_pid = os.getpid() + 1
+    with monkeypatch.context() as patch:
+        patch.setattr(session_store.os, 'getpid', lambda: child_pid)
+        assert store.get('parent').session_token == 'parent'
+        assert store._local.conn is not parent_conn
+        store.create(_state('child', user_id=2))
+
+    assert store.get('child').user_id == 2
+    store.close()
+    parent_conn.close()
+
+
+@requires_returning
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='fork غير متاح')
+def test_sqlite_store_is_usable_from_a_forked_process(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / 'active.db'), TTL)
+    store.create(_state('parent'))
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            if store.get('parent') is not None and store.pop('parent') is not None:
+                store.create(_state('child', user_id=2))
+                status = 0
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.WEXITSTATUS(status) == 0
+    assert store.get('parent') is None
+    assert store.get('child').user_id == 2
+    store.close()
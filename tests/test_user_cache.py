@@ -0,0 +1,19 @@
+# tests/test_user_cache.py
+from extensions import db
+from models import User
+from user_cache import user_cache
+
+
+def test_profile_update_fits_budget_when_cache_sync_is_due(app, make_user, make_client):
+    user_id = make_user('before')
+    client = make_client(user_id)
+    # الطلب الأول يخزن المستخدم، فيمر طلب التعديل بمسار الإصابة مع مزامنة حان موعدها
+    assert client.get('/').status_code == 200
+    user_cache._next_sync = 0.0
+
+    response = client.post('/profile', data={'username': 'after', 'email': 'after@example.com'})
+
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(User, user_id).username == 'after'
+        assert user_cache.load(user_id).username == 'after'
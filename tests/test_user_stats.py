@@ -0,0 +1,55 @@
+# tests/test_user_stats.py
+import threading
+from datetime import datetime, timedelta, timezone
+
+from extensions import db
+from models import UserStats
+from user_stats import RECENT_WINDOW, record_quiz
+
+
+def test_record_quiz_keeps_best_score_and_latest_date(app, make_user):
+    user_id = make_user()
+    later = datetime(2026, 5, 2, tzinfo=timezone.utc)
+    with app.app_context():
+        record_quiz(user_id, 7, later)
+        db.session.commit()
+        # نتيجة أقدم تصل متأخرة لا تعيد آخر تاريخ ولا أفضل نتيجة إلى الوراء
+        record_quiz(user_id, 3, later - timedelta(days=1))
+        db.session.commit()
+
+        stats = db.session.get(UserStats, user_id)
+        assert (stats.total_quizzes, stats.score_sum, stats.best_score) == (2, 10, 7)
+        assert stats.last_taken.replace(tzinfo=None) == later.replace(tzinfo=None)
+        assert stats.recent_scores == [7, 3]
+
+
+def test_concurrent_submits_lose_no_update(app, make_user):
+    user_id = make_user()
+    threads_count, quizzes = 8, 5
+    barrier = threading.Barrier(threads_count)
+    errors = []
+
+    def submit(worker):
+        barrier.wait()
+        for index in range(quizzes):
+            try:
+                with app.app_context():
+                    record_quiz(user_id, worker * quizzes + index, datetime.now(timezone.utc))
+                    db.session.commit()
+            except Exception as e:  # noqa: BLE001 - يُجمع ليفشل الاختبار برسالة واضحة
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    scores = range(threads_count * quizzes)
+    with app.app_context():
+        stats = db.session.get(UserStats, user_id)
+        assert stats.total_quizzes == len(scores)
+        assert stats.score_sum == sum(scores)
+        assert stats.best_score == max(scores)
+        assert len(stats.recent_scores) == RECENT_WINDOW
@@ -0,0 +1,80 @@
+# tests/test_weak_topics.py
+from datetime import datetime, timedelta, timezone
+
+from extensions import db
+from models import UserProgress, UserProgressDay
+from progress_buffer import upsert_progress
+from weak_topics import get_weak_topics
+
+SEP = '\x1f'
+
+
+def _progress(app, user_id, topic, correct, total):
+    with app.app_context():
+        db.session.add(UserProgress(user_id=user_id, category='العلوم', topic=topic,
+                                    correct_count=correct, total_count=total))
+        db.session.commit()
+
+
+def _progress_on(app, user_id, topic, correct, total, days_ago):
+    with app.app_context():
+        day = datetime.now(timezone.utc).date() - timedelta(days=days_ago)
+        db.session.add(UserProgressDay(user_id=user_id, category='العلوم', topic=topic, day=day,
+                                       correct_count=correct, total_count=total))
+        db.session.commit()
+
+
+def test_weak_topics_read_completed_history(app, make_user):
+    user_id = make_user()
+    _progress(app, user_id, 'الخلية', 1, 5)
+    _progress(app, user_id, 'التكاثر', 2, 3)
+    _progress(app, user_id, 'الوراثة', 4, 4)
+
+    with app.app_context():
+        assert get_weak_topics(user_id) == [('الخلية', 4), ('التكاثر', 1)]
+        assert get_weak_topics(user_id, limit=1) == [('الخلية', 4)]
+
+
+def test_flushed_progress_is_dated_by_day(app, make_user):
+    user_id = make_user()
+    with app.app_context():
+        upsert_progress(user_id, {f'العلوم{SEP}الخلية': [1, 3]})
+        upsert_progress(user_id, {f'العلوم{SEP}الخلية': [0, 2], f'العلوم{SEP}الوراثة': [1, 1]})
+        db.session.commit()
+
+        rows = {(row.topic, row.correct_count, row.total_count) for row in UserProgressDay.query.all()}
+        assert rows == {('الخلية', 1, 5), ('الوراثة', 1, 1)}
+        assert get_weak_topics(user_id, days=1) == get_weak_topics(user_id) == [('الخلية', 4)]
+
+
+def test_weak_topics_within_a_time_window(app, make_user):
+    user_id = make_user()
+    _progress_on(app, user_id, 'الخلية', 0, 2, days_ago=0)
+    _progress_on(app, user_id, 'الخلية', 0, 1, days_ago=6)
+    _progress_on(app, user_id, 'التكاثر', 0, 5, days_ago=7)
+    _progress_on(app, user_id, 'الوراثة', 1, 1, days_ago=1)
+
+    with app.app_context():
+        assert get_weak_topics(user_id, days=1) == [('الخلية', 2)]
+        assert get_weak_topics(user_id, days=7) == [('الخلية', 3)]
+        assert get_weak_topics(user_id, days=8) == [('التكاثر', 5), ('الخلية', 3)]
+
+
+def test_weak_topics_api_filters_by_days(app, make_user, make_client):
+    user_id = make_user()
+    _progress(app, user_id, 'الخلية', 1, 3)
+    _progress_on(app, user_id, 'التكاثر', 0, 1, days_ago=2)
+    client = make_client(user_id)
+
+    response = client.get(f'/api/v1/users/{user_id}/weak-topics?limit=5')
+    assert response.status_code == 200
+    assert response.get_json()['data']['topics'] == [{'topic': 'الخلية', 'mistakes': 2}]
+
+    response = client.get(f'/api/v1/users/{user_id}/weak-topics?days=7')
+    assert response.status_code == 200
+    assert response.get_json()['data']['days'] == 7
+    assert response.get_json()['data']['topics'] == [{'topic': 'التكاثر', 'mistakes': 1}]
+
+    for query in ('days=0', 'days=abc', 'limit=0'):
+        response = client.get(f'/api/v1/users/{user_id}/weak-topics?{query}')
+        assert response.status_code == 400, query
@@ -0,0 +1,194 @@
+# user_cache.py
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask import Flask
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import metrics
+from extensions import db
+from generation_cache import TTLCache
+from models import User, UserInvalidation
+
+USER_CACHE_LOOKUPS = metrics.counter(
+    'quiz_user_cache_lookups_total', 'عمليات البحث في ذاكرة المستخدمين المؤقتة', ('result',)
+)
+USER_CACHE_INVALIDATIONS = metrics.counter(
+    'quiz_user_cache_invalidations_total', 'إسقاط مستخدمين من الذاكرة المؤقتة حسب المصدر', ('source',)
+)
+USER_CACHE_SIZE = metrics.gauge(
+    'quiz_user_cache_size', 'عدد المستخدمين المخزنين في ذاكرة هذه العملية'
+)
+
+# أحداث الإسقاط أقدم من هذا تُحذف؛ يجب أن تبقى أطول من USER_CACHE_TTL
+EVENT_RETENTION = timedelta(days=1)
+# المعرفات من معاملات متزامنة قد تظهر بغير ترتيبها، فيُعاد فحص آخرها
+SYNC_OVERLAP = 50
+
+
+class CachedUser(UserMixin):
+    """نسخة خفيفة للقراءة فقط من المستخدم تكفي current_user في القوالب والصلاحيات.
+
+    التعديل يتم على كائن User من الجلسة: db.session.get(User, current_user.id).
+    """
+
+    __slots__ = ('id', 'username', 'email', 'is_admin', 'created_at')
+
+    def __init__(self, id, username, email, is_admin, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = bool(is_admin)
+        self.created_at = created_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'is_admin': self.is_admin,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UserCache:
+    """ذاكرة TTL+LRU لمحمّل مستخدمي Flask-Login.
+
+    تُسقط النسخة بعد commit أي تعديل أو حذف للمستخدم في هذه العملية، ويُسجَّل
+    التعديل في جدول user_invalidation ضمن المعاملة نفسها لتقرأه العمليات
+    الأخرى كل USER_CACHE_SYNC_INTERVAL ثانية. أقصى تأخر بين العمليات إذن
+    فترة المزامنة، والـ TTL حد أمان للتعديلات التي لا تمر بأحداث ORM.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sync_interval = 1.0
+        self._cache = TTLCache()
+        self._last_event_id: Optional[int] = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        ttl = app.config.get('USER_CACHE_TTL', 300)
+        self.enabled = ttl > 0
+        self.sync_interval = app.config.get('USER_CACHE_SYNC_INTERVAL', 1.0)
+        self._cache = TTLCache(max_size=app.config.get('USER_CACHE_SIZE', 10000), ttl=ttl)
+
+    def load(self, user_id) -> Optional[CachedUser]:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        if not self.enabled:
+            return self._fetch(user_id)
+
+        user = self._cache.get(user_id)
+        if user is not None:
+            # المزامنة في مسار الإصابة فقط: التحميل من القاعدة حديث أصلًا
+            self._sync()
+            user = self._cache.get(user_id)
+        if user is not None:
+            USER_CACHE_LOOKUPS.inc(result='hit')
+            return user
+
+        USER_CACHE_LOOKUPS.inc(result='miss')
+        if self._last_event_id is None:
+            # تثبيت نقطة البداية قبل أول تخزين حتى لا يفوت حدث يقع بينهما
+            self._sync()
+        user = self._fetch(user_id)
+        if user is not None:
+            self._cache.put(user_id, user)
+        return user
+
+    @staticmethod
+    def _fetch(user_id: int) -> Optional[CachedUser]:
+        row = db.session.query(
+            User.id, User.username, User.email, User.is_admin, User.created_at
+        ).filter(User.id == user_id).first()
+        return CachedUser(*row) if row else None
+
+    def _sync(self) -> None:
+        """قراءة أحداث الإسقاط التي سجلتها العمليات الأخرى منذ آخر مزامنة."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+            last_id = self._last_event_id
+
+        table = UserInvalidation.__table__
+        if last_id is None:
+            # العملية بدأت للتو وذاكرتها لا تحوي ما سبق هذه اللحظة
+            latest = db.session.query(db.func.max(table.c.id)).scalar() or 0
+            with self._lock:
+                self._last_event_id = latest
+            return
+
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.user_id).where(table.c.id > last_id - SYNC_OVERLAP)
+        ).all()
+        for row in rows:
+            # أحداث نافذة التداخل التي عولجت سابقًا تُسقط مجددًا دون أن تُحسب
+            self._cache.invalidate(row.user_id)
+            if row.id > last_id:
+                USER_CACHE_INVALIDATIONS.inc(source='sync')
+        if rows:
+            with self._lock:
+                self._last_event_id = max(self._last_event_id or 0, max(row.id for row in rows))
+
+    def invalidate(self, user_id: Optional[int] = None, source: str = 'commit') -> None:
+        """إسقاط مستخدم من ذاكرة هذه العملية، أو الكل عند عدم تمرير معرف."""
+        self._cache.invalidate(user_id)
+        USER_CACHE_INVALIDATIONS.inc(source=source)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+user_cache = UserCache()
+
+
+def _collect_cache_metrics() -> None:
+    USER_CACHE_SIZE.set(len(user_cache))
+
+
+metrics.REGISTRY.add_collector(_collect_cache_metrics)
+
+
+# --- تسجيل تعديلات المستخدمين ---
+# حدث الإسقاط يُكتب في معاملة التعديل نفسها، والإسقاط المحلي بعد نجاح الـ commit
+
+def _record_change(connection, session: Optional[Session], user_id: int) -> None:
+    now = datetime.now(timezone.utc)
+    table = UserInvalidation.__table__
+    connection.execute(table.insert().values(user_id=user_id, created_at=now))
+    connection.execute(table.delete().where(table.c.created_at < now - EVENT_RETENTION))
+    if session is not None:
+        session.info.setdefault('user_cache_changes', set()).add(user_id)
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs):
+        _record_change(connection, state.session, target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _record_change(connection, inspect(target).session, target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_user_changes(session):
+    for user_id in session.info.pop('user_cache_changes', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('user_cache_changes', None)
@@ -0,0 +1,88 @@
+# user_stats.py
+from datetime import datetime
+from typing import Dict, Iterable
+
+from db_utils import upsert_rows
+from extensions import db
+from models import QuizResult, UserStats
+
+# عدد آخر النتائج المحفوظة لحساب المتوسطات المتحركة
+RECENT_WINDOW = 10
+
+
+def record_quiz(user_id: int, score: int, date_taken: datetime) -> UserStats:
+    """تحديث إحصاءات المستخدم بنتيجة جديدة ضمن المعاملة الحالية.
+
+    العدادات وأفضل نتيجة وآخر تاريخ تُحدَّث بـ upsert ذري، فلا يضيع تحديث
+    ولا يتعارض إدراج الصف الأول عند إنهاء اختبارين متزامنين. الـ upsert
+    يحجز الصف حتى نهاية المعاملة، فتُعدَّل قائمة آخر النتائج بعده دون سباق.
+    """
+    upsert_rows(
+        UserStats.__table__, [{
+            'user_id': user_id,
+            'total_quizzes': 1,
+            'score_sum': score,
+            'best_score': score,
+            'last_taken': date_taken,
+            'recent_scores': []
+        }],
+        key_columns=('user_id',),
+        increment_columns=('total_quizzes', 'score_sum'),
+        max_columns=('best_score', 'last_taken')
+    )
+    stats = db.session.get(UserStats, user_id, populate_existing=True)
+    # إسناد قائمة جديدة حتى يلتقط SQLAlchemy التغيير في عمود JSON
+    stats.recent_scores = ((stats.recent_scores or []) + [score])[-RECENT_WINDOW:]
+    return stats
+
+
+def get_user_stats_many(user_ids: Iterable[int]) -> Dict[int, dict]:
+    """جلب إحصاءات عدة مستخدمين في استعلام واحد."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    rows = UserStats.query.filter(UserStats.user_id.in_(user_ids)).all()
+    return {stats.user_id: stats.to_dict() for stats in rows}
+
+
+def backfill_user_stats(batch_size: int = 5000) -> int:
+    """إعادة حساب إحصاءات كل المستخدمين من QuizResult في تمريرة واحدة.
+
+    تُقرأ النتائج مرتبة حسب المستخدم والتاريخ على دفعات، وتُكتب الصفوف
+    المحسوبة بإدراج جماعي. يعيد عدد المستخدمين الذين تمت معالجتهم.
+    """
+    db.session.execute(UserStats.__table__.delete())
+    results = db.session.query(
+        QuizResult.user_id, QuizResult.score, QuizResult.date_taken
+    ).order_by(QuizResult.user_id, QuizResult.date_taken, QuizResult.id)\
+        .execution_options(yield_per=batch_size)
+
+    batch, current, written = [], None, 0
+    for user_id, score, date_taken in results:
+        if current is None or current['user_id'] != user_id:
+            if current is not None:
+                batch.append(current)
+            current = {
+                'user_id': user_id,
+                'total_quizzes': 0,
+                'score_sum': 0,
+                'best_score': 0,
+                'last_taken': None,
+                'recent_scores': []
+            }
+            if len(batch) >= batch_size:
+                db.session.execute(UserStats.__table__.insert(), batch)
+                written += len(batch)
+                batch = []
+        current['total_quizzes'] += 1
+        current['score_sum'] += score
+        current['best_score'] = max(current['best_score'], score)
+        current['last_taken'] = date_taken
+        current['recent_scores'] = (current['recent_scores'] + [score])[-RECENT_WINDOW:]
+    if current is not None:
+        batch.append(current)
+    if batch:
+        db.session.execute(UserStats.__table__.insert(), batch)
+        written += len(batch)
+    db.session.commit()
+    return written
@@ -0,0 +1,25 @@
+# weak_topics.py
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from extensions import db
+from models import UserProgress, UserProgressDay
+
+
+def get_weak_topics(user_id: int, limit: Optional[int] = None,
+                    days: Optional[int] = None) -> List[Tuple[str, int]]:
+    """المواضيع التي أخطأ فيها المستخدم مرتبة تنازليًا حسب عدد الأخطاء.
+
+    باستعلام GROUP BY واحد: على كل التاريخ من عدادات UserProgress الدائمة،
+    ومع days على أيام UserProgressDay منذ days يومًا (اليوم الحالي بتوقيت UTC
+    أولها). جلسات الاختبار تُحذف عند الإنهاء فلا تصلح مصدرًا للتاريخ.
+    """
+    model = UserProgressDay if days else UserProgress
+    mistakes = db.func.sum(model.total_count - model.correct_count)
+    query = db.session.query(model.topic, mistakes).filter(model.user_id == user_id)
+    if days:
+        query = query.filter(UserProgressDay.day > datetime.now(timezone.utc).date() - timedelta(days=days))
+    query = query.group_by(model.topic).having(mistakes > 0).order_by(mistakes.desc(), model.topic)
+    if limit:
+        query = query.limit(limit)
+    return [(name, int(count)) for name, count in query.all()]